@@ -1,11 +1,25 @@
 """
 Script para analisar o modelo Keras e identificar problemas na conversão/inferência
+
+Uso:
+    python analyze_model.py
+    python analyze_model.py assets/images/examples   # compara Keras vs TFLite nessas imagens
+    python analyze_model.py assets/images/examples --profile-tflite   # tempo por operador do TFLite
+    python analyze_model.py --cost-report --batch-size 16   # MACs, parâmetros e pico de ativações
 """
+import argparse
+import os
 import numpy as np
-import tensorflow as tf
-from PIL import Image
 import sys
 
+from generate_segmentation_crops import load_segmentation_model
+from lazy_runtime import import_tensorflow
+from model_cost import analyze_model_cost, print_cost_report, write_cost_csv
+from parity_check import compare_engines, iter_image_batches, summarize_parity
+from tflite_profile import (
+    DEFAULT_PROFILE_IMAGES, DEFAULT_PROFILE_RUNS, print_profile_report, profile_tflite_model,
+)
+
 # Configurar encoding UTF-8 para Windows
 if sys.platform == 'win32':
     import io
@@ -20,6 +34,7 @@ def analyze_model(model_path):
     
     # Carrega o modelo
     print(f"\n[1] Carregando modelo: {model_path}")
+    tf = import_tensorflow()
     model = tf.keras.models.load_model(model_path, compile=False)
     
     # Informações básicas
@@ -118,53 +133,130 @@ def analyze_model(model_path):
     
     return model
 
-def compare_with_tflite(keras_model, tflite_path=None):
-    """Compara modelo Keras com TFLite se disponível"""
-    if tflite_path and tf.io.gfile.exists(tflite_path):
+def compare_with_tflite(keras_model, tflite_path=None, images_dir=None):
+    """Compara modelo Keras com TFLite se disponível (harness de parity_check.py)"""
+    if tflite_path and os.path.exists(tflite_path):
         print(f"\n[11] Comparação Keras vs TFLite:")
         print(f"   Carregando TFLite: {tflite_path}")
         
-        interpreter = tf.lite.Interpreter(model_path=tflite_path)
-        interpreter.allocate_tensors()
-        
-        input_details = interpreter.get_input_details()
-        output_details = interpreter.get_output_details()
+        tflite_model = load_segmentation_model(tflite_path, 'tflite')
+        input_details = tflite_model.interpreter.get_input_details()
+        output_details = tflite_model.interpreter.get_output_details()
         
         print(f"   TFLite Input shape: {input_details[0]['shape']}")
         print(f"   TFLite Input dtype: {input_details[0]['dtype']}")
         print(f"   TFLite Output shape: {output_details[0]['shape']}")
         print(f"   TFLite Output dtype: {output_details[0]['dtype']}")
         
-        # Teste com mesma entrada
-        test_input = np.random.rand(1, 256, 256, 3).astype(np.float32)
-        
-        # Keras
-        keras_output = keras_model.predict(test_input, verbose=0)
-        
-        # TFLite
-        interpreter.set_tensor(input_details[0]['index'], test_input)
-        interpreter.invoke()
-        tflite_output = interpreter.get_tensor(output_details[0]['index'])
-        
-        # Compara
-        diff = np.abs(keras_output - tflite_output).mean()
-        max_diff = np.abs(keras_output - tflite_output).max()
+        _, height, width, _ = keras_model.input_shape
+        if images_dir:
+            print(f"   Imagens: {images_dir}")
+            batches = iter_image_batches(images_dir, height, width)
+        else:
+            # Sem diretório de imagens: um lote aleatório, como antes
+            print("   [DICA] Informe um diretório de imagens para comparar em dados reais")
+            batches = [(['entrada_aleatoria'], np.random.rand(1, height, width, 3).astype(np.float32))]
         
-        print(f"\n   Diferença média: {diff:.6f}")
-        print(f"   Diferença máxima: {max_diff:.6f}")
+        names, scores = compare_engines(keras_model, tflite_model, batches)
+        summary = summarize_parity(names, scores)
         
-        if diff > 0.01:
+        if summary['mean_abs_diff'] > 0.01:
             print(f"   [AVISO] Diferença significativa entre Keras e TFLite!")
             print(f"   Isso pode indicar problemas na conversão")
     else:
         print(f"\n[11] TFLite não encontrado para comparação")
 
+def cost_report(model_path, batch_size=1, csv_path=None):
+    """Custo estático do modelo Keras por camada (model_cost.py)"""
+    print("=" * 60)
+    print("CUSTO DO MODELO KERAS")
+    print("=" * 60)
+    
+    print(f"\n[1] Carregando modelo: {model_path}")
+    tf = import_tensorflow()
+    model = tf.keras.models.load_model(model_path, compile=False)
+    print(f"   Input shape: {model.input_shape}")
+    
+    print(f"\n[2] Custo por camada (MACs por imagem, ativações no lote {batch_size}):")
+    report = analyze_model_cost(model, batch_size)
+    print_cost_report(report)
+    if csv_path:
+        write_cost_csv(report, csv_path)
+        print(f"\n   Tabela completa salva em: {csv_path}")
+    return report
+
+def profile_tflite(tflite_path, images_dir=None, runs=DEFAULT_PROFILE_RUNS, num_threads=None,
+                   benchmark_binary=None, use_xnnpack=True):
+    """Perfil de latência por operador do modelo TFLite (tflite_profile.py)"""
+    print("=" * 60)
+    print("PERFIL DO MODELO TFLITE")
+    print("=" * 60)
+    
+    if not os.path.exists(tflite_path):
+        print(f"\n[ERRO] TFLite não encontrado: {tflite_path}")
+        sys.exit(1)
+    
+    print(f"\n[1] Modelo: {tflite_path}")
+    model = load_segmentation_model(tflite_path, 'tflite', num_threads=num_threads)
+    _, height, width, channels = model.input_shape
+    images = None
+    if images_dir:
+        print(f"   Entradas representativas: {images_dir}")
+        batches = [batch for _, batch in iter_image_batches(
+            images_dir, height, width, limit=DEFAULT_PROFILE_IMAGES
+        )]
+        if batches:
+            images = np.concatenate(batches, axis=0)
+    if images is None:
+        print("   [DICA] Informe um diretório de imagens para medir com fotos reais")
+        images = np.random.rand(1, height, width, channels).astype(np.float32)
+    
+    print(f"\n[2] Executando {runs} inferências ({len(images)} entradas)...")
+    result = profile_tflite_model(
+        tflite_path, images, runs, num_threads, benchmark_binary, use_xnnpack
+    )
+    print_profile_report(result['latency'], result['delegation'], result['op_profile'])
+    return result
+
 if __name__ == '__main__':
     model_path = 'melhor_modelo_unet_metricas_completas.keras'
     tflite_path = 'assets/model.tflite'
     
-    model = analyze_model(model_path)
-    compare_with_tflite(model, tflite_path)
+    parser = argparse.ArgumentParser(description='Analisa o modelo Keras e o modelo TFLite convertido')
+    parser.add_argument('images_dir', nargs='?', default=None,
+                        help='Diretório opcional de imagens reais (comparação e perfil)')
+    parser.add_argument('--model', default=model_path, help=f'Modelo Keras (padrão: {model_path})')
+    parser.add_argument('--tflite', default=tflite_path, help=f'Modelo TFLite (padrão: {tflite_path})')
+    parser.add_argument('--profile-tflite', action='store_true',
+                        help='Mede o tempo do TFLite por operador/camada e lista os nós fora do delegate')
+    parser.add_argument('--runs', type=int, default=DEFAULT_PROFILE_RUNS,
+                        help=f'Com --profile-tflite, execuções medidas (padrão: {DEFAULT_PROFILE_RUNS})')
+    parser.add_argument('--num-threads', type=int, default=None,
+                        help='Com --profile-tflite, threads do interpretador')
+    parser.add_argument('--benchmark-binary', default=None,
+                        help='Com --profile-tflite, caminho do benchmark_model do TFLite '
+                             '(padrão: PATH ou TFLITE_BENCHMARK_MODEL)')
+    parser.add_argument('--no-xnnpack', action='store_true',
+                        help='Com --profile-tflite, perfil do benchmark_model sem XNNPACK (tempo de cada camada)')
+    parser.add_argument('--cost-report', action='store_true',
+                        help='MACs/FLOPs e parâmetros por camada e pico de ativações do modelo Keras')
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help='Com --cost-report, lote usado no pico de ativações (padrão: 1)')
+    parser.add_argument('--cost-csv', default=None,
+                        help='Com --cost-report, CSV com uma linha por camada')
+    args = parser.parse_args()
+    
+    if args.batch_size < 1:
+        parser.error('--batch-size deve ser maior que zero')
+    
+    if args.cost_report:
+        cost_report(args.model, args.batch_size, args.cost_csv)
+    elif args.profile_tflite:
+        profile_tflite(args.tflite, args.images_dir, args.runs, args.num_threads,
+                       args.benchmark_binary, not args.no_xnnpack)
+    else:
+        model = analyze_model(args.model)
+        compare_with_tflite(model, args.tflite, args.images_dir)
     
     print("\n" + "=" * 60)
     print("ANÁLISE CONCLUÍDA")
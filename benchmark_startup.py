@@ -0,0 +1,166 @@
+"""
+Benchmark do tempo de inicialização dos scripts
+
+Mede, em processos novos, o tempo de parede e o pico de memória (RSS) de:
+- `import tensorflow` (referência do custo que os scripts evitam);
+- importar cada módulo e imprimir o `--help` de cada script;
+- opcionalmente, carregar um `.tflite` e executar uma inferência (cold start do
+  servidor / jobs curtos), informando se o TensorFlow chegou a ser importado.
+
+Uso:
+    python benchmark_startup.py
+    python benchmark_startup.py --repeat 5 --tflite-model assets/model.tflite --output startup.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+# Configurar encoding UTF-8 para Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Scripts com argparse (o --help é o caminho mais curto de cada CLI)
+CLI_SCRIPTS = (
+    'convert_model.py',
+    'generate_segmentation_crops.py',
+    'segment_and_classify.py',
+    'inference_server.py',
+    'image_decoding.py',
+    'analyze_model.py',
+)
+
+# Scripts sem argparse: mede apenas a importação do módulo
+IMPORT_MODULES = (
+    'test_tflite_usage',
+)
+
+TFLITE_COLD_START = """
+import sys
+import numpy as np
+from generate_segmentation_crops import load_segmentation_model
+model = load_segmentation_model(sys.argv[1], 'tflite')
+model.predict_on_batch(np.zeros((1, *model.input_shape[1:]), dtype=np.float32))
+print('tensorflow' in sys.modules)
+"""
+
+
+def run_timed(command):
+    """
+    Executa um comando em um processo novo
+
+    Returns:
+        tuple: (tempo de parede em s, pico de RSS em MB ou None, saída padrão)
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        command, cwd=SCRIPT_DIR, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    if hasattr(os, 'wait4'):
+        # wait4 devolve o uso de recursos apenas deste filho
+        stdout = process.stdout.read()
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        elapsed = time.perf_counter() - start
+        # ru_maxrss é KB no Linux e bytes no macOS
+        divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+        peak_rss_mb = usage.ru_maxrss / divisor
+    else:
+        stdout, _ = process.communicate()
+        elapsed = time.perf_counter() - start
+        peak_rss_mb = None
+    process.stdout.close()
+    if process.returncode != 0:
+        raise RuntimeError(f"Comando falhou ({process.returncode}): {' '.join(command)}")
+    return elapsed, peak_rss_mb, stdout.decode('utf-8', errors='replace')
+
+
+def benchmark_command(label, command, repeat):
+    """Executa o comando `repeat` vezes e resume tempo e memória"""
+    times, rss, output = [], [], ''
+    for _ in range(repeat):
+        elapsed, peak_rss_mb, output = run_timed(command)
+        times.append(elapsed)
+        if peak_rss_mb is not None:
+            rss.append(peak_rss_mb)
+    result = {
+        'label': label,
+        'median_s': float(np.median(times)),
+        'min_s': float(np.min(times)),
+        'peak_rss_mb': float(np.max(rss)) if rss else None,
+    }
+    return result, output
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Mede o tempo de inicialização e a memória dos scripts',
+    )
+    parser.add_argument('--repeat', '-r', type=int, default=3,
+                        help='Execuções por comando; reporta a mediana (padrão: 3)')
+    parser.add_argument('--tflite-model', type=str, default=None,
+                        help='Modelo .tflite para medir o cold start de uma inferência')
+    parser.add_argument('--skip-tensorflow', action='store_true',
+                        help='Não mede a referência `import tensorflow`')
+    parser.add_argument('--output', '-o', type=str, default=None,
+                        help='Arquivo JSON opcional com os resultados')
+    args = parser.parse_args()
+
+    if args.repeat < 1:
+        print("ERRO: --repeat deve ser maior que zero")
+        sys.exit(1)
+    if args.tflite_model and not os.path.exists(args.tflite_model):
+        print(f"ERRO: Arquivo do modelo não encontrado: {args.tflite_model}")
+        sys.exit(1)
+
+    commands = []
+    if not args.skip_tensorflow:
+        commands.append(('import tensorflow (referência)', [sys.executable, '-c', 'import tensorflow']))
+    commands.append(('python (vazio)', [sys.executable, '-c', 'pass']))
+    for script in CLI_SCRIPTS:
+        commands.append((f'{script} --help', [sys.executable, script, '--help']))
+    for module in IMPORT_MODULES:
+        commands.append((f'import {module}', [sys.executable, '-c', f'import {module}']))
+    if args.tflite_model:
+        commands.append((
+            'cold start TFLite (1 inferência)',
+            [sys.executable, '-c', TFLITE_COLD_START, os.path.abspath(args.tflite_model)],
+        ))
+
+    print(f"{'Comando':<42} {'Mediana(s)':>10} {'Mín(s)':>8} {'RSS(MB)':>8}")
+    results = []
+    for label, command in commands:
+        try:
+            result, output = benchmark_command(label, command, args.repeat)
+        except RuntimeError as e:
+            print(f"{label:<42} [ERRO] {e}")
+            continue
+        if label.startswith('cold start'):
+            result['tensorflow_imported'] = output.strip().endswith('True')
+        results.append(result)
+        rss = f"{result['peak_rss_mb']:>8.0f}" if result['peak_rss_mb'] is not None else f"{'-':>8}"
+        print(f"{label:<42} {result['median_s']:>10.3f} {result['min_s']:>8.3f} {rss}")
+
+    cold_start = [r for r in results if 'tensorflow_imported' in r]
+    if cold_start:
+        print(f"\nTensorFlow importado no cold start TFLite: {'sim' if cold_start[0]['tensorflow_imported'] else 'não'}")
+        if cold_start[0]['tensorflow_imported']:
+            print("   [DICA] Instale `ai-edge-litert` (ou `tflite-runtime`) para o runtime leve")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'repeat': args.repeat, 'results': results}, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados salvos em: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+Benchmark do custo por imagem do TFLite em função do tamanho do lote
+
+Executa o modelo com `TFLiteSegmentationModel` (um interpretador por tamanho
+de lote, N imagens por `invoke()`) para lotes de 1 a 32 e compara com a
+execução imagem a imagem. O modelo precisa ter batch dinâmico (padrão do
+convert_model.py ou `--batch-size dynamic`).
+
+Uso:
+    python benchmark_tflite_batch.py --model assets/model.tflite
+    python benchmark_tflite_batch.py --model assets/model.tflite --sizes 1,4,16 --num-threads 4 --input assets/images/examples
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from generate_segmentation_crops import TFLiteSegmentationModel
+
+# Configurar encoding UTF-8 para Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+DEFAULT_SIZES = (1, 2, 4, 8, 16, 32)
+DEFAULT_RUNS = 5
+
+
+def load_benchmark_images(input_dir, count, height, width):
+    """Carrega até `count` imagens reais (/255) ou None se o diretório não for informado"""
+    if not input_dir:
+        return None
+    from parity_check import iter_image_batches
+    batches = [batch for _, batch in iter_image_batches(input_dir, height, width, limit=count)]
+    if not batches:
+        return None
+    images = np.concatenate(batches, axis=0)
+    # Repete as imagens se o diretório tiver menos que o maior lote
+    repeats = -(-count // len(images))
+    return np.concatenate([images] * repeats, axis=0)[:count]
+
+
+def benchmark_batch_sizes(model_path, sizes=DEFAULT_SIZES, runs=DEFAULT_RUNS,
+                          num_threads=None, input_dir=None):
+    """
+    Mede latência por lote e custo por imagem para cada tamanho de lote
+
+    Args:
+        model_path: Modelo .tflite
+        sizes: Tamanhos de lote a medir
+        runs: Repetições por tamanho (reporta a mediana)
+        num_threads: Threads do interpretador
+        input_dir: Diretório opcional de imagens reais (padrão: entrada aleatória)
+
+    Returns:
+        list: Um dict por tamanho de lote
+    """
+    model = TFLiteSegmentationModel(model_path, num_threads=num_threads)
+    if not model.dynamic_batch:
+        print(f"[AVISO] Modelo com batch fixo {model.input_shape[0]}; "
+              "lotes serão executados em blocos (exporte com --batch-size dynamic)")
+
+    _, height, width, channels = model.input_shape
+    max_size = max(sizes)
+    images = load_benchmark_images(input_dir, max_size, height, width)
+    if images is None:
+        images = np.random.rand(max_size, height, width, channels).astype(np.float32)
+
+    results = []
+    per_image_baseline = None
+    for size in sizes:
+        batch = images[:size]
+        model.predict_on_batch(batch)  # cria/aloca o interpretador deste tamanho
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            model.predict_on_batch(batch)
+            times.append(time.perf_counter() - start)
+        batch_ms = float(np.median(times) * 1000)
+        per_image_ms = batch_ms / size
+        if per_image_baseline is None:
+            per_image_baseline = per_image_ms if size == 1 else None
+        results.append({
+            'batch_size': size,
+            'batch_ms': batch_ms,
+            'per_image_ms': per_image_ms,
+            'images_per_sec': 1000.0 / per_image_ms,
+        })
+
+    if per_image_baseline is None:
+        # Referência imagem a imagem (um invoke por imagem no interpretador de batch 1)
+        single = images[:1]
+        model.predict_on_batch(single)
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            model.predict_on_batch(single)
+            times.append(time.perf_counter() - start)
+        per_image_baseline = float(np.median(times) * 1000)
+    for result in results:
+        result['speedup_vs_single'] = per_image_baseline / result['per_image_ms']
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Mede o custo por imagem do TFLite para lotes de 1 a 32',
+    )
+    parser.add_argument('--model', '-m', type=str, required=True, help='Modelo .tflite')
+    parser.add_argument('--sizes', type=str, default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help='Tamanhos de lote separados por vírgula (padrão: 1,2,4,8,16,32)')
+    parser.add_argument('--runs', '-r', type=int, default=DEFAULT_RUNS,
+                        help=f'Repetições por tamanho (padrão: {DEFAULT_RUNS})')
+    parser.add_argument('--num-threads', type=int, default=None,
+                        help='Threads do interpretador (padrão: definido pelo runtime)')
+    parser.add_argument('--input', '-i', type=str, default=None,
+                        help='Diretório opcional de imagens reais (padrão: entrada aleatória)')
+    parser.add_argument('--output', '-o', type=str, default=None,
+                        help='Arquivo JSON opcional com os resultados')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"ERRO: Arquivo do modelo não encontrado: {args.model}")
+        sys.exit(1)
+    try:
+        sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    except ValueError:
+        print(f"ERRO: --sizes inválido: {args.sizes}")
+        sys.exit(1)
+    if not sizes or min(sizes) < 1 or args.runs < 1:
+        print("ERRO: --sizes e --runs devem ser maiores que zero")
+        sys.exit(1)
+
+    results = benchmark_batch_sizes(args.model, sizes, args.runs, args.num_threads, args.input)
+
+    print(f"\n{'Lote':>5} {'ms/lote':>10} {'ms/imagem':>10} {'imagens/s':>10} {'vs 1 a 1':>9}")
+    for r in results:
+        print(f"{r['batch_size']:>5} {r['batch_ms']:>10.2f} {r['per_image_ms']:>10.2f}"
+              f" {r['images_per_sec']:>10.2f} {r['speedup_vs_single']:>8.2f}x")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'model': args.model, 'results': results}, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados salvos em: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""
+Benchmark do tempo por época: ImageDataGenerator vs pipeline tf.data da U-Net
+
+Compara o gerador do notebook (dois ImageDataGenerator.flow sincronizados pela
+semente + `combined_generator`, aumento de dados imagem a imagem em
+NumPy/SciPy/PIL numa única thread) com `unet_model.make_train_dataset`
+(mesmo aumento de dados no grafo, por lote, com AUTOTUNE e prefetch).
+
+Mede duas coisas:
+- entrada: tempo para produzir os lotes de uma época, sem o modelo;
+- treino (--fit): tempo por época do `model.fit` da etapa 1 (encoder
+  congelado), que mostra quanto o modelo espera pela entrada.
+
+A primeira época de cada pipeline inclui aquecimento (rastreamento do grafo,
+alocação) e é reportada à parte; a tabela usa a mediana das seguintes.
+
+Uso:
+    python benchmark_unet_input.py --images dataset/imagens --masks dataset/mascaras
+    python benchmark_unet_input.py --images dataset/imagens --masks dataset/mascaras --fit --epochs 3
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from lazy_runtime import import_tensorflow
+
+# Configurar encoding UTF-8 para Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Configuração do notebook (BATCH_SIZE e seed do ImageDataGenerator)
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_SIZE = 256
+DEFAULT_EPOCHS = 3
+GENERATOR_SEED = 1
+
+
+def make_generator(X_train, y_train, batch_size, seed=GENERATOR_SEED):
+    """Gerador do notebook: dois ImageDataGenerator.flow sincronizados pela semente"""
+    from unet_model import AUGMENTATION
+
+    tf = import_tensorflow()
+    data_gen_args = dict(AUGMENTATION, brightness_range=list(AUGMENTATION['brightness_range']),
+                         fill_mode='nearest')
+    image_datagen = tf.keras.preprocessing.image.ImageDataGenerator(**data_gen_args)
+    mask_datagen = tf.keras.preprocessing.image.ImageDataGenerator(**data_gen_args)
+    image_generator = image_datagen.flow(X_train, batch_size=batch_size, seed=seed)
+    mask_generator = mask_datagen.flow(y_train, batch_size=batch_size, seed=seed)
+
+    def combined_generator(img_gen, msk_gen):
+        while True:
+            yield (next(img_gen), next(msk_gen))
+    return combined_generator(image_generator, mask_generator)
+
+
+def time_input_epochs(batches, steps, epochs):
+    """Tempo (s) para produzir `steps` lotes, por época"""
+    iterator = iter(batches)
+    times = []
+    for _ in range(epochs):
+        start = time.perf_counter()
+        for _ in range(steps):
+            next(iterator)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def time_fit_epochs(batches, steps, epochs, size, weights):
+    """Tempo (s) por época do model.fit da etapa 1 (encoder congelado)"""
+    from unet_model import build_unet_with_transfer_learning, dice_coefficient, focal_dice_loss
+
+    tf = import_tensorflow()
+    model, base_model = build_unet_with_transfer_learning((size, size, 3), weights=weights)
+    base_model.trainable = False
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=1e-4),
+                  loss=focal_dice_loss, metrics=[dice_coefficient])
+
+    times = []
+
+    class EpochTimer(tf.keras.callbacks.Callback):
+        def on_epoch_begin(self, epoch, logs=None):
+            self.start = time.perf_counter()
+
+        def on_epoch_end(self, epoch, logs=None):
+            times.append(time.perf_counter() - self.start)
+
+    model.fit(batches, steps_per_epoch=steps, epochs=epochs, callbacks=[EpochTimer()], verbose=0)
+    return times
+
+
+def summarize(name, mode, times):
+    """Primeira época (aquecimento) e mediana das demais"""
+    steady = times[1:] or times
+    return {
+        'pipeline': name,
+        'mode': mode,
+        'first_epoch_s': round(times[0], 3),
+        'epoch_s': round(float(np.median(steady)), 3),
+        'epochs': [round(t, 3) for t in times],
+    }
+
+
+def run_benchmark(images_dir, masks_dir, size=DEFAULT_SIZE, batch_size=DEFAULT_BATCH_SIZE,
+                  epochs=DEFAULT_EPOCHS, fit=False, weights='imagenet'):
+    """
+    Mede as duas pipelines na divisão de treino do notebook
+
+    Returns:
+        list[dict]: Um resultado por pipeline e modo ('entrada' e, com fit, 'treino')
+    """
+    from unet_model import load_raw_segmentation_dataset, make_train_dataset, split_indices
+
+    tf = import_tensorflow()
+    X_raw, y_raw, _ = load_raw_segmentation_dataset(images_dir, masks_dir, size, size)
+    train_idx, _ = split_indices(len(X_raw))
+    X_raw, y_raw = X_raw[train_idx], y_raw[train_idx]
+    steps = len(X_raw) // batch_size
+    if steps == 0:
+        raise ValueError(f"Imagens de treino insuficientes para um lote de {batch_size}: {len(X_raw)}")
+    print(f"{len(X_raw)} imagens de treino {size}x{size}, lote {batch_size}, {steps} passos por época")
+
+    # Entrada do gerador exatamente como no notebook (já normalizada)
+    X_train = tf.keras.applications.mobilenet_v2.preprocess_input(X_raw.astype(np.float32))
+    y_train = y_raw.astype(np.float32) / 255.0
+    pipelines = [
+        ('ImageDataGenerator', lambda: make_generator(X_train, y_train, batch_size)),
+        ('tf.data', lambda: make_train_dataset(X_raw, y_raw, batch_size)),
+    ]
+
+    results = []
+    for name, build in pipelines:
+        try:
+            print(f"\nEntrada: {name}...")
+            results.append(summarize(name, 'entrada', time_input_epochs(build(), steps, epochs)))
+            if fit:
+                print(f"Treino: {name}...")
+                results.append(summarize(name, 'treino', time_fit_epochs(build(), steps, epochs, size, weights)))
+        except ImportError as e:
+            # O ImageDataGenerator requer SciPy (transformações) e Pillow (brilho)
+            print(f"[AVISO] {name} indisponível neste ambiente: {e}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compara o tempo por época do ImageDataGenerator e do tf.data no treino da U-Net',
+    )
+    parser.add_argument('--images', type=str, required=True, help='Diretório das imagens de treino')
+    parser.add_argument('--masks', type=str, required=True, help='Diretório das máscaras (.png)')
+    parser.add_argument('--size', type=int, default=DEFAULT_SIZE,
+                        help=f'Resolução de entrada (padrão: {DEFAULT_SIZE})')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'Tamanho do lote (padrão: {DEFAULT_BATCH_SIZE}, como no notebook)')
+    parser.add_argument('--epochs', type=int, default=DEFAULT_EPOCHS,
+                        help=f'Épocas medidas por pipeline, incluindo o aquecimento (padrão: {DEFAULT_EPOCHS})')
+    parser.add_argument('--fit', action='store_true',
+                        help='Mede também o model.fit da etapa 1 com cada pipeline')
+    parser.add_argument('--no-pretrained', action='store_true',
+                        help='Com --fit, encoder sem pesos da ImageNet (não requer download)')
+    parser.add_argument('--output', '-o', type=str, default=None,
+                        help='Arquivo JSON opcional com os resultados')
+    args = parser.parse_args()
+
+    for path in (args.images, args.masks):
+        if not os.path.isdir(path):
+            print(f"ERRO: Diretório não encontrado: {path}")
+            sys.exit(1)
+    if args.size % 32 != 0 or args.batch_size < 1 or args.epochs < 1:
+        print("ERRO: --size deve ser múltiplo de 32; --batch-size e --epochs maiores que zero")
+        sys.exit(1)
+
+    try:
+        results = run_benchmark(args.images, args.masks, args.size, args.batch_size, args.epochs,
+                                args.fit, None if args.no_pretrained else 'imagenet')
+    except ValueError as e:
+        print(f"ERRO: {e}")
+        sys.exit(1)
+
+    print(f"\n{'Pipeline':<20} {'Modo':<8} {'1a época (s)':>13} {'s/época':>9} {'vs gerador':>11}")
+    baseline = {r['mode']: r['epoch_s'] for r in results if r['pipeline'] == 'ImageDataGenerator'}
+    for r in results:
+        speedup = baseline.get(r['mode'])
+        speedup = f"{speedup / r['epoch_s']:.2f}x" if speedup and r['epoch_s'] else '-'
+        print(f"{r['pipeline']:<20} {r['mode']:<8} {r['first_epoch_s']:>13.3f} {r['epoch_s']:>9.3f} {speedup:>11}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'images': args.images, 'size': args.size, 'batch_size': args.batch_size,
+                       'results': results}, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados salvos em: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
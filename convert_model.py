@@ -14,11 +14,16 @@ Uso:
     python convert_model.py --input model.keras --output assets/model.tflite
     python convert_model.py --input model.keras --output assets/model.tflite --no-optimize
     python convert_model.py --input model.keras --output assets/model.tflite --validate-precision
+    python convert_model.py --input model.keras --output assets/model_int8.tflite --int8 --calibration-dir dataset/images
+    python convert_model.py --input model.keras --sweep --images-dir dataset/images
 """
 
 import argparse
+import hashlib
+import importlib.metadata
 import os
 import sys
+import time
 import numpy as np
 
 # Configurar encoding UTF-8 para Windows
@@ -27,54 +32,515 @@ if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
-import tensorflow as tf
+# TensorFlow é importado apenas na conversão (o --help não precisa dele)
+from lazy_runtime import import_tensorflow
+from model_registry import (
+    DEFAULT_REGISTRY_DIR, ArtifactRegistry, artifact_key, embed_tflite_metadata,
+    read_tflite_metadata,
+)
+from parity_check import score_outputs
 
 
-def validate_model_precision(keras_model, tflite_model_path, input_shape):
+# Threshold de binarização usado pelo app e por generate_segmentation_crops.py
+SEGMENTATION_THRESHOLD = 0.3
+
+# Pré-processamentos usados no treinamento de cada modelo:
+# - 'mobilenet_v2': U-Net (projeto_tc_segmentacao.py), entrada em [-1, 1]
+# - 'rescale': classificador (projeto_tc_coloração.py), ImageDataGenerator(rescale=1/255)
+PREPROCESSING_MODES = ('mobilenet_v2', 'rescale')
+
+DEFAULT_CALIBRATION_LIMIT = 200
+DEFAULT_BENCHMARK_RUNS = 20
+DEFAULT_PARITY_BATCH_SIZE = 16
+
+# Saídas do modelo com pré-processamento embutido (--embed-preprocessing):
+# - 'probabilities': saída original do modelo (float32)
+# - 'mask': máscara binária uint8 (0/1) com o threshold de postprocess_prediction
+# - 'coverage': porcentagem de cobertura da máscara, um float32 por imagem
+EMBEDDED_OUTPUT_MODES = ('probabilities', 'mask', 'coverage')
+
+# Variantes geradas pelo --sweep
+TFLITE_VARIANTS = ('no-opt', 'dynamic-range', 'float16', 'int8')
+DEFAULT_SWEEP_THREADS = (1, 2, 4)
+
+
+def default_preprocessing(model):
+    """Pré-processamento de treinamento conforme o tipo de modelo (segmentação ou classificação)"""
+    return 'mobilenet_v2' if len(model.output_shape) == 4 else 'rescale'
+
+
+def load_raw_images(images_dir, height, width, preprocessing, limit=DEFAULT_CALIBRATION_LIMIT):
+    """
+    Carrega imagens reais redimensionadas como no treinamento, sem normalizar
+    
+    - 'mobilenet_v2': cv2.imread -> RGB -> cv2.resize (bilinear)
+      (mesmo caminho do carregamento de dados em projeto_tc_segmentacao.py)
+    - 'rescale': RGB -> resize 'nearest' (padrão do flow_from_dataframe)
+    
+    Args:
+        images_dir: Diretório com fotos reais da conjuntiva
+        height: Altura de entrada do modelo
+        width: Largura de entrada do modelo
+        preprocessing: Um de PREPROCESSING_MODES
+        limit: Número máximo de imagens (amostradas de forma espaçada)
+    
+    Returns:
+        np.ndarray: Array uint8 [N, height, width, 3] em RGB
+    """
+    import cv2
+    
+    image_extensions = ('.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif')
+    image_files = sorted(
+        f for f in os.listdir(images_dir)
+        if f.lower().endswith(image_extensions) and os.path.isfile(os.path.join(images_dir, f))
+    )
+    if limit and len(image_files) > limit:
+        # Amostragem espaçada para cobrir o diretório inteiro (iluminação, aparelhos)
+        step = len(image_files) / limit
+        image_files = [image_files[int(i * step)] for i in range(limit)]
+    
+    interpolation = cv2.INTER_LINEAR if preprocessing == 'mobilenet_v2' else cv2.INTER_NEAREST
+    images = []
+    for filename in image_files:
+        img = cv2.imread(os.path.join(images_dir, filename))
+        if img is None:
+            print(f"   [AVISO] Nao foi possivel ler a imagem de calibracao: {filename}")
+            continue
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        images.append(cv2.resize(img, (width, height), interpolation=interpolation))
+    
+    if not images:
+        return np.zeros((0, height, width, 3), dtype=np.uint8)
+    return np.array(images, dtype=np.uint8)
+
+
+def load_calibration_images(calibration_dir, height, width, preprocessing, limit=DEFAULT_CALIBRATION_LIMIT):
+    """
+    Carrega imagens reais aplicando exatamente o pré-processamento do treinamento
+    
+    Redimensiona com `load_raw_images` e normaliza:
+    - 'mobilenet_v2': preprocess_input (entrada em [-1, 1])
+    - 'rescale': /255
+    
+    Args:
+        calibration_dir: Diretório com fotos reais da conjuntiva
+        height: Altura de entrada do modelo
+        width: Largura de entrada do modelo
+        preprocessing: Um de PREPROCESSING_MODES
+        limit: Número máximo de imagens (amostradas de forma espaçada)
+    
+    Returns:
+        np.ndarray: Array float32 [N, height, width, 3]
+    """
+    images = load_raw_images(calibration_dir, height, width, preprocessing, limit).astype(np.float32)
+    if len(images) == 0:
+        return images
+    if preprocessing == 'mobilenet_v2':
+        tf = import_tensorflow()
+        return tf.keras.applications.mobilenet_v2.preprocess_input(images)
+    return images / 255.0
+
+
+def embed_preprocessing(model, preprocessing, output_mode='probabilities',
+                        threshold=SEGMENTATION_THRESHOLD):
+    """
+    Envolve o modelo com entrada uint8 e a normalização do treinamento no grafo
+    
+    O modelo exportado recebe os pixels RGB redimensionados (uint8, 4x menor
+    que float32) e, para segmentação, pode devolver a máscara já binarizada
+    ou apenas a cobertura; os consumidores deixam de converter para float e
+    de binarizar pixel a pixel. A binarização repete `postprocess_prediction`
+    (threshold adaptativo de 30% do máximo quando o máximo é menor que 0.1).
+    
+    Args:
+        model: Modelo Keras original (entrada float)
+        preprocessing: Um de PREPROCESSING_MODES
+        output_mode: Um de EMBEDDED_OUTPUT_MODES
+        threshold: Threshold de binarização ('mask' e 'coverage')
+    
+    Returns:
+        Modelo Keras com entrada uint8 [N, H, W, 3]
+    """
+    tf = import_tensorflow()
+    if output_mode != 'probabilities' and len(model.output_shape) != 4:
+        raise ValueError(f"Saida '{output_mode}' requer um modelo de segmentacao")
+    
+    inputs = tf.keras.Input(shape=model.input_shape[1:], dtype='uint8', name='image_uint8')
+    if preprocessing == 'mobilenet_v2':
+        # x / 127.5 - 1, igual a mobilenet_v2.preprocess_input
+        x = tf.keras.layers.Rescaling(1.0 / 127.5, offset=-1.0, name='mobilenet_v2_preprocess')(inputs)
+    elif preprocessing == 'rescale':
+        x = tf.keras.layers.Rescaling(1.0 / 255.0, name='rescale_preprocess')(inputs)
+    else:
+        raise ValueError(f"Pre-processamento desconhecido: {preprocessing}")
+    outputs = model(x, training=False)
+    
+    def binarize(probabilities):
+        pred_max = tf.reduce_max(probabilities, axis=[1, 2, 3], keepdims=True)
+        actual_threshold = tf.where(pred_max < 0.1, pred_max * 0.3, threshold)
+        return probabilities > actual_threshold
+    
+    if output_mode == 'mask':
+        outputs = tf.keras.layers.Lambda(
+            lambda p: tf.cast(binarize(p), tf.uint8), name='binary_mask'
+        )(outputs)
+    elif output_mode == 'coverage':
+        outputs = tf.keras.layers.Lambda(
+            lambda p: tf.reduce_mean(tf.cast(binarize(p), tf.float32), axis=[1, 2, 3]) * 100.0,
+            name='coverage'
+        )(outputs)
+    elif output_mode != 'probabilities':
+        raise ValueError(f"Saida desconhecida: {output_mode}")
+    return tf.keras.Model(inputs, outputs, name=f"{model.name}_uint8")
+
+
+def make_converter(model, export_batch=None):
+    """
+    Cria o conversor TFLite, opcionalmente com uma dimensão de batch específica
+    
+    Args:
+        model: Modelo Keras
+        export_batch: None mantém o padrão do conversor (shape [1, ...] com
+            assinatura dinâmica [-1, ...]); 'dynamic' exporta a assinatura
+            [-1, ...] explicitamente; um inteiro N fixa o batch em N
+    
+    Returns:
+        tf.lite.TFLiteConverter
+    """
+    tf = import_tensorflow()
+    if export_batch is None:
+        return tf.lite.TFLiteConverter.from_keras_model(model)
+    
+    # Reenvolve o modelo com uma entrada de batch explícito; os pesos são compartilhados
+    batch = None if export_batch == 'dynamic' else int(export_batch)
+    inputs = tf.keras.Input(batch_shape=(batch, *model.input_shape[1:]), dtype=model.inputs[0].dtype)
+    wrapped = tf.keras.Model(inputs, model(inputs, training=False), name=model.name)
+    return tf.lite.TFLiteConverter.from_keras_model(wrapped)
+
+
+def parse_export_batch(value):
+    """Converte o valor de --batch-size ('dynamic' ou inteiro positivo)"""
+    if value is None or value == 'dynamic':
+        return value
+    batch = int(value)
+    if batch < 1:
+        raise ValueError(f"batch deve ser maior que zero: {value}")
+    return batch
+
+
+def calibration_fingerprint(images_dir):
+    """Hash da lista de imagens de calibração (nomes e tamanhos) para a chave do registro"""
+    digest = hashlib.sha256()
+    for filename in sorted(os.listdir(images_dir)):
+        path = os.path.join(images_dir, filename)
+        if os.path.isfile(path):
+            digest.update(f'{filename}:{os.path.getsize(path)}\n'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def conversion_options(optimize=True, int8=False, calibration_dir=None, uint8_io=False,
+                       preprocessing=None, calibration_limit=DEFAULT_CALIBRATION_LIMIT,
+                       export_batch=None, embed=False, output_mode='probabilities',
+                       threshold=SEGMENTATION_THRESHOLD, classes=None):
+    """
+    Opções que alteram o .tflite gerado (chave do registro de artefatos)
+
+    Inclui a versão do TensorFlow: conversores diferentes geram grafos
+    diferentes para o mesmo modelo.
+    """
+    try:
+        tf_version = importlib.metadata.version('tensorflow')
+    except importlib.metadata.PackageNotFoundError:
+        tf_version = None
+    options = {
+        'variant': 'int8' if int8 else ('float16' if optimize else 'no-opt'),
+        'preprocessing': preprocessing,
+        'export_batch': export_batch,
+        'classes': list(classes) if classes else None,
+        'tensorflow': tf_version,
+    }
+    if int8:
+        options['uint8_io'] = uint8_io
+        options['calibration'] = calibration_fingerprint(calibration_dir)
+        options['calibration_limit'] = calibration_limit
+    if embed:
+        options['embed'] = {
+            'output_mode': output_mode,
+            'threshold': threshold if output_mode != 'probabilities' else None,
+        }
+    return options
+
+
+def build_artifact_metadata(model, source_hash, source_path, options, preprocessing,
+                            embed=False, output_mode='probabilities', uint8_io=False,
+                            threshold=SEGMENTATION_THRESHOLD, classes=None):
+    """
+    Metadados gravados no .tflite (ver model_registry.read_tflite_metadata)
+
+    Descrevem como usar o modelo sem carregar o Keras: tamanho e tipo da
+    entrada, normalização (e se já está no grafo), saída, threshold da
+    segmentação e nomes das classes do classificador.
+    """
+    _, height, width, channels = model.input_shape
+    segmentation = len(model.output_shape) == 4
+    if not segmentation and not classes:
+        # Ordem das classes do notebook de classificação (CLASSES)
+        from segment_and_classify import FAMACHA_CLASSES
+        if model.output_shape[-1] == len(FAMACHA_CLASSES):
+            classes = FAMACHA_CLASSES
+    return {
+        'task': 'segmentation' if segmentation else 'classification',
+        'source_sha256': source_hash,
+        'source_name': os.path.basename(source_path),
+        'input_size': [int(height), int(width)],
+        'input_channels': int(channels),
+        'input_dtype': 'uint8' if embed or uint8_io else 'float32',
+        'normalization': preprocessing or default_preprocessing(model),
+        'normalization_embedded': bool(embed),
+        'output_mode': output_mode if embed else 'probabilities',
+        'threshold': threshold if segmentation else None,
+        'classes': list(classes) if classes and not segmentation else None,
+        'variant': options['variant'],
+        'export_batch': options['export_batch'],
+        'tensorflow': options['tensorflow'],
+    }
+
+
+def print_artifact_metadata(metadata):
+    """Resumo dos metadados embutidos em um artefato"""
+    print("   Metadados embutidos:")
+    print(f"     - Tarefa: {metadata.get('task')}")
+    height, width = metadata.get('input_size', (None, None))
+    print(f"     - Entrada: {width}x{height} {metadata.get('input_dtype')}, normalizacao "
+          f"'{metadata.get('normalization')}'" + (' (no grafo)' if metadata.get('normalization_embedded') else ''))
+    if metadata.get('threshold') is not None:
+        print(f"     - Threshold: {metadata['threshold']} (saida: {metadata.get('output_mode')})")
+    if metadata.get('classes'):
+        print(f"     - Classes: {', '.join(metadata['classes'])}")
+    print(f"     - Origem: {metadata.get('source_name')} (sha256 {str(metadata.get('source_sha256'))[:12]}...)")
+
+
+def fixed_size_batches(images, batch_size):
+    """
+    Divide as imagens em lotes de exatamente `batch_size` (modelos com batch fixo)
+
+    O último lote é completado repetindo as suas próprias imagens.
+
+    Yields:
+        tuple: (lote [batch_size, ...], quantidade de imagens válidas no lote)
+    """
+    for start in range(0, len(images), batch_size):
+        chunk = images[start:start + batch_size]
+        count = len(chunk)
+        if count < batch_size:
+            chunk = chunk[np.arange(batch_size) % count]
+        yield chunk, count
+
+
+def configure_converter(converter, variant, calibration_images=None, uint8_io=False, batch_size=1):
+    """
+    Configura o conversor para uma das variantes de TFLITE_VARIANTS
+    
+    - 'no-opt': float32, sem otimizações
+    - 'dynamic-range': pesos int8, ativações float (Optimize.DEFAULT sem dataset)
+    - 'float16': pesos float16
+    - 'int8': inteiro completo, calibrado com `calibration_images`
+    
+    Args:
+        converter: tf.lite.TFLiteConverter
+        variant: Nome da variante
+        calibration_images: Imagens pré-processadas (obrigatório para 'int8')
+        uint8_io: Com 'int8', entrada e saída em uint8
+        batch_size: Batch da entrada exportada (lotes de calibração do mesmo tamanho)
+    """
+    tf = import_tensorflow()
+    if variant == 'no-opt':
+        return
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if variant == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif variant == 'int8':
+        def representative_dataset():
+            for batch, _ in fixed_size_batches(calibration_images, batch_size):
+                yield [batch]
+        
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        if uint8_io:
+            converter.inference_input_type = tf.uint8
+            converter.inference_output_type = tf.uint8
+    elif variant != 'dynamic-range':
+        raise ValueError(f"Variante desconhecida: {variant}")
+
+
+def tflite_predict(model_content, images, num_threads=None):
+    """
+    Executa um modelo TFLite no batch da sua entrada (1 ou o batch fixo exportado;
+    entrada float, I/O inteiro é convertido)
+    
+    Returns:
+        np.ndarray: Saídas float32 [N, ...]
+    """
+    tf = import_tensorflow()
+    interpreter = tf.lite.Interpreter(model_content=model_content, num_threads=num_threads)
+    interpreter.allocate_tensors()
+    batch_size = int(interpreter.get_input_details()[0]['shape'][0])
+    return np.concatenate([
+        run_tflite(interpreter, batch)[:count]
+        for batch, count in fixed_size_batches(images, batch_size)
+    ], axis=0)
+
+
+def run_tflite(interpreter, batch):
+    """
+    Executa um interpretador já alocado com entrada float, quantizando a entrada
+    e desquantizando a saída quando o modelo usa I/O inteiro (int8/uint8)
+    
+    Args:
+        interpreter: Interpretador TFLite com tensores alocados
+        batch: Array float32 com o batch esperado pelo modelo
+    
+    Returns:
+        np.ndarray: Saída em float32
+    """
+    input_details = interpreter.get_input_details()[0]
+    output_details = interpreter.get_output_details()[0]
+    
+    # Escala 0: entrada uint8 sem quantização (pré-processamento embutido)
+    if np.issubdtype(input_details['dtype'], np.integer) and input_details['quantization'][0]:
+        scale, zero_point = input_details['quantization']
+        info = np.iinfo(input_details['dtype'])
+        batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max)
+    interpreter.set_tensor(input_details['index'], batch.astype(input_details['dtype']))
+    interpreter.invoke()
+    output = interpreter.get_tensor(output_details['index'])
+    
+    if np.issubdtype(output_details['dtype'], np.integer) and output_details['quantization'][0]:
+        scale, zero_point = output_details['quantization']
+        output = (output.astype(np.float32) - zero_point) * scale
+    return output.astype(np.float32)
+
+
+def benchmark_tflite(model_content, sample, runs=DEFAULT_BENCHMARK_RUNS, num_threads=None):
+    """
+    Mede a latência de inferência de um modelo TFLite (uma chamada do interpretador;
+    com batch fixo, `sample` é repetida até o batch do modelo)
+    
+    Returns:
+        float: Latência mediana em ms
+    """
+    tf = import_tensorflow()
+    interpreter = tf.lite.Interpreter(model_content=model_content, num_threads=num_threads)
+    interpreter.allocate_tensors()
+    sample, _ = next(fixed_size_batches(sample, int(interpreter.get_input_details()[0]['shape'][0])))
+    run_tflite(interpreter, sample)  # aquecimento
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run_tflite(interpreter, sample)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times) * 1000)
+
+
+def compare_quantized_model(float_model_content, quantized_model_content, images,
+                            threshold=SEGMENTATION_THRESHOLD):
+    """
+    Compara o modelo quantizado com o modelo float no conjunto de calibração
+    
+    Para segmentação, calcula a IoU das máscaras binarizadas por imagem; para
+    classificação, a concordância do top-1.
+    
+    Returns:
+        dict: Tamanhos, latências e métricas de concordância
+    """
+    scores = score_outputs(
+        tflite_predict(float_model_content, images),
+        tflite_predict(quantized_model_content, images),
+        threshold,
+    )
+    
+    sample = images[:1]
+    tf = import_tensorflow()
+    interpreter = tf.lite.Interpreter(model_content=quantized_model_content)
+    report = {
+        'images': len(images),
+        'batch_size': int(interpreter.get_input_details()[0]['shape'][0]),
+        'float_size_bytes': len(float_model_content),
+        'quantized_size_bytes': len(quantized_model_content),
+        'float_latency_ms': benchmark_tflite(float_model_content, sample),
+        'quantized_latency_ms': benchmark_tflite(quantized_model_content, sample),
+        'mean_abs_diff': float(np.mean(scores['mean_abs_diff'])),
+    }
+    if 'iou' in scores:
+        report['mask_iou_mean'] = float(np.mean(scores['iou']))
+        report['mask_iou_min'] = float(np.min(scores['iou']))
+    if 'top1_agree' in scores:
+        report['top1_agreement'] = float(np.mean(scores['top1_agree']))
+    return report
+
+
+def print_quantization_report(report):
+    """Exibe o relatório de compare_quantized_model"""
+    print(f"\n[INT8] Comparacao com o modelo float ({report['images']} imagens de calibracao):")
+    print(f"   Tamanho: {report['float_size_bytes'] / (1024 * 1024):.2f} MB -> "
+          f"{report['quantized_size_bytes'] / (1024 * 1024):.2f} MB "
+          f"({report['quantized_size_bytes'] / report['float_size_bytes'] * 100:.0f}%)")
+    batch_label = '1 imagem' if report['batch_size'] == 1 else f"lote de {report['batch_size']}"
+    print(f"   Latencia ({batch_label}, mediana): {report['float_latency_ms']:.2f} ms -> "
+          f"{report['quantized_latency_ms']:.2f} ms "
+          f"({report['float_latency_ms'] / max(report['quantized_latency_ms'], 1e-9):.2f}x)")
+    print(f"   Diferenca media da saida: {report['mean_abs_diff']:.6f}")
+    if 'mask_iou_mean' in report:
+        print(f"   IoU das mascaras (threshold {SEGMENTATION_THRESHOLD}): "
+              f"media {report['mask_iou_mean']:.4f}, minima {report['mask_iou_min']:.4f}")
+        if report['mask_iou_mean'] < 0.95:
+            print("   [AVISO] IoU media abaixo de 0.95; revise o conjunto de calibracao")
+    if 'top1_agreement' in report:
+        print(f"   Concordancia top-1: {report['top1_agreement'] * 100:.1f}%")
+
+
+def validate_model_precision(keras_model, tflite_model_path, input_shape, images=None):
     """
     Valida se o modelo TFLite produz resultados similares ao Keras
     
+    Usa o harness de parity_check.py: com `images`, compara imagem a imagem em
+    lotes (IoU/Dice das máscaras ou top-1); sem elas, usa um lote aleatório
+    com o pré-processamento do treinamento (MobileNetV2).
+    
     Args:
         keras_model: Modelo Keras original
         tflite_model_path: Caminho para o modelo TFLite convertido
         input_shape: Shape de entrada do modelo (sem batch dimension)
+        images: Imagens reais já pré-processadas [N, H, W, 3] (opcional)
     
     Returns:
         float: Diferença média entre predições Keras e TFLite
     """
+    from generate_segmentation_crops import load_segmentation_model
+    from parity_check import compare_engines, summarize_parity
+    
     try:
         print("\n[VALIDACAO] Testando precisao do modelo convertido...")
         
-        # --- AJUSTE CRÍTICO ---
-        # 1. Gerar dados de imagem aleatórios no intervalo [0, 255]
-        test_image_data = np.random.rand(1, *input_shape) * 255.0
-        test_image_data = test_image_data.astype(np.float32)
-        
-        # 2. Aplicar o MESMO pré-processamento usado no treinamento (MobileNetV2)
-        # Isso garante que a entrada de teste esteja no formato que o modelo espera [-1, 1]
-        test_input = tf.keras.applications.mobilenet_v2.preprocess_input(test_image_data)
-        # --- FIM DO AJUSTE ---
-        
-        # Predição com Keras
-        keras_output = keras_model.predict(test_input, verbose=0)
-        
-        # Predição com TFLite
-        interpreter = tf.lite.Interpreter(model_path=tflite_model_path)
-        interpreter.allocate_tensors()
-        
-        input_details = interpreter.get_input_details()
-        output_details = interpreter.get_output_details()
-        
-        interpreter.set_tensor(input_details[0]['index'], test_input)
-        interpreter.invoke()
-        tflite_output = interpreter.get_tensor(output_details[0]['index'])
-        
-        # Calcula diferença média
-        diff = np.abs(keras_output - tflite_output).mean()
-        max_diff = np.abs(keras_output - tflite_output).max()
+        if images is None or len(images) == 0:
+            # Dados aleatórios em [0, 255] com o MESMO pré-processamento do
+            # treinamento (MobileNetV2), para a entrada ficar em [-1, 1]
+            tf = import_tensorflow()
+            test_image_data = (np.random.rand(8, *input_shape) * 255.0).astype(np.float32)
+            images = tf.keras.applications.mobilenet_v2.preprocess_input(test_image_data)
+            names = [f'aleatoria_{i}' for i in range(len(images))]
+        else:
+            names = [f'calibracao_{i}' for i in range(len(images))]
         
-        print(f"   Diferença média: {diff:.6f}")
-        print(f"   Diferença máxima: {max_diff:.6f}")
+        tflite_model = load_segmentation_model(tflite_model_path, 'tflite')
+        batch_size = DEFAULT_PARITY_BATCH_SIZE
+        batches = (
+            (names[i:i + batch_size], images[i:i + batch_size])
+            for i in range(0, len(images), batch_size)
+        )
+        names, scores = compare_engines(keras_model, tflite_model, batches, SEGMENTATION_THRESHOLD)
+        summary = summarize_parity(names, scores, worst_k=5, title='Validacao Keras vs TFLite')
+        diff = summary['mean_abs_diff']
         
         # Threshold de 1% (0.01) para considerar aceitável
         if diff > 0.01:
@@ -90,28 +556,141 @@ def validate_model_precision(keras_model, tflite_model_path, input_shape):
         return None
 
 
+def validate_embedded_model(keras_model, tflite_model_path, raw_images, preprocessing,
+                            output_mode, threshold=SEGMENTATION_THRESHOLD):
+    """
+    Compara o modelo com pré-processamento embutido com o caminho Python atual
+    
+    A referência é o Keras com a normalização feita em numpy e, para 'mask' e
+    'coverage', binarizada por `postprocess_prediction`.
+    
+    Args:
+        keras_model: Modelo Keras original (entrada float)
+        tflite_model_path: Modelo TFLite exportado com `embed_preprocessing`
+        raw_images: Imagens RGB uint8 [N, H, W, 3] já redimensionadas
+        preprocessing: Normalização embutida (PREPROCESSING_MODES)
+        output_mode: Saída embutida (EMBEDDED_OUTPUT_MODES)
+        threshold: Threshold de binarização
+    
+    Returns:
+        dict: Métricas de concordância
+    """
+    from generate_segmentation_crops import load_segmentation_model, postprocess_prediction
+    
+    print(f"\n[VALIDACAO] Entrada uint8 + '{preprocessing}' embutido ({len(raw_images)} imagens)...")
+    images = raw_images.astype(np.float32)
+    if preprocessing == 'mobilenet_v2':
+        images = images / 127.5 - 1.0
+    else:
+        images = images / 255.0
+    reference = np.asarray(keras_model.predict(images, batch_size=DEFAULT_PARITY_BATCH_SIZE, verbose=0))
+    tflite_model = load_segmentation_model(tflite_model_path, 'tflite')
+    outputs = np.concatenate([
+        np.asarray(tflite_model.predict_on_batch(raw_images[i:i + DEFAULT_PARITY_BATCH_SIZE]))
+        for i in range(0, len(raw_images), DEFAULT_PARITY_BATCH_SIZE)
+    ], axis=0)
+    
+    if output_mode == 'probabilities':
+        scores = score_outputs(reference, outputs, threshold)
+        report = {'mean_abs_diff': float(np.mean(scores['mean_abs_diff']))}
+        print(f"   Diferenca media da saida: {report['mean_abs_diff']:.6f}")
+        return report
+    
+    masks, coverages = zip(*(
+        postprocess_prediction(pred, '', threshold, verbose=False) for pred in reference
+    ))
+    if output_mode == 'mask':
+        outputs = outputs.reshape(len(outputs), *masks[0].shape)
+        mask_diff = np.mean(outputs != np.array(masks), axis=(1, 2)) * 100
+        report = {'mask_diff_pct_mean': float(np.mean(mask_diff)),
+                  'mask_diff_pct_max': float(np.max(mask_diff))}
+        print(f"   Pixels divergentes na mascara: media {report['mask_diff_pct_mean']:.4f}%, "
+              f"maximo {report['mask_diff_pct_max']:.4f}%")
+    else:
+        coverage_diff = np.abs(outputs.reshape(-1) - np.array(coverages))
+        report = {'coverage_diff_mean': float(np.mean(coverage_diff)),
+                  'coverage_diff_max': float(np.max(coverage_diff))}
+        print(f"   Diferenca de cobertura (pontos percentuais): media {report['coverage_diff_mean']:.4f}, "
+              f"maxima {report['coverage_diff_max']:.4f}")
+    return report
+
+
 def convert_keras_to_tflite(
     input_path: str, 
     output_path: str, 
     optimize: bool = True,
-    validate_precision: bool = False
+    validate_precision: bool = False,
+    int8: bool = False,
+    calibration_dir: str = None,
+    uint8_io: bool = False,
+    preprocessing: str = None,
+    calibration_limit: int = DEFAULT_CALIBRATION_LIMIT,
+    export_batch=None,
+    embed: bool = False,
+    output_mode: str = 'probabilities',
+    threshold: float = SEGMENTATION_THRESHOLD,
+    classes=None,
+    registry_dir: str = DEFAULT_REGISTRY_DIR,
+    use_cache: bool = True
 ):
     """
     Converte um modelo Keras (.keras) para TensorFlow Lite (.tflite)
     
+    O resultado é guardado no registro de artefatos (model_registry.py),
+    indexado pelo hash do .keras e pelas opções de conversão; repetir a mesma
+    conversão copia o artefato do registro sem carregar o Keras. O .tflite
+    leva metadados embutidos (ver `build_artifact_metadata`).
+    
     Args:
         input_path: Caminho para o arquivo .keras
         output_path: Caminho onde salvar o arquivo .tflite
         optimize: Se True, aplica otimizações (quantização float16)
         validate_precision: Se True, valida precisão comparando com modelo Keras
+        int8: Se True, gera um modelo totalmente inteiro (INT8) calibrado com
+            as imagens de `calibration_dir` (ignora `optimize`)
+        calibration_dir: Diretório com fotos reais para o dataset representativo
+        uint8_io: Se True (com int8), entrada e saída do modelo em uint8
+        preprocessing: Pré-processamento de treinamento (PREPROCESSING_MODES);
+            None detecta pelo tipo de modelo
+        calibration_limit: Número máximo de imagens de calibração
+        export_batch: Dimensão de batch exportada (ver `make_converter`)
+        embed: Se True, exporta com entrada uint8 e a normalização no grafo
+            (ver `embed_preprocessing`; incompatível com int8)
+        output_mode: Com `embed`, um de EMBEDDED_OUTPUT_MODES
+        threshold: Com `embed`, threshold da máscara/cobertura embutida
+        classes: Nomes das classes do classificador gravados nos metadados
+            (None usa FAMACHA_CLASSES quando o número de saídas coincide)
+        registry_dir: Diretório do registro de artefatos (None desativa)
+        use_cache: Se False, converte de novo mesmo com o artefato em cache
+            (o registro é atualizado); --validate-precision também reconverte
     """
-    print(f"[INFO] Carregando modelo Keras: {input_path}")
-    
     # Verifica se o arquivo existe
     if not os.path.exists(input_path):
         print(f"[ERRO] Arquivo nao encontrado: {input_path}")
         sys.exit(1)
     
+    from generate_segmentation_crops import hash_file
+    source_hash = hash_file(input_path)
+    options = conversion_options(
+        optimize, int8, calibration_dir, uint8_io, preprocessing, calibration_limit,
+        export_batch, embed, output_mode, threshold, classes
+    )
+    registry = ArtifactRegistry(registry_dir) if registry_dir else None
+    key = artifact_key(source_hash, options)
+    if registry is not None and use_cache and not validate_precision and registry.lookup(key):
+        registry.export(key, output_path)
+        file_size = os.path.getsize(output_path)
+        print(f"[OK] Artefato em cache no registro (chave {key}), conversao ignorada")
+        print(f"   Arquivo salvo em: {output_path}")
+        print(f"   Tamanho do arquivo: {file_size / (1024 * 1024):.2f} MB ({file_size:,} bytes)")
+        metadata = read_tflite_metadata(output_path)
+        if metadata:
+            print_artifact_metadata(metadata)
+        return output_path
+    
+    print(f"[INFO] Carregando modelo Keras: {input_path}")
+    tf = import_tensorflow()
+    
     try:
         # Tenta carregar o modelo sem compilar primeiro (evita problemas com loss customizada)
         # A loss customizada não é necessária para inferência, apenas para treinamento
@@ -169,7 +748,15 @@ def convert_keras_to_tflite(
         print("\n[INFO] Convertendo para TensorFlow Lite...")
         
         # Cria o conversor
-        converter = tf.lite.TFLiteConverter.from_keras_model(model)
+        if export_batch is not None:
+            print(f"   Dimensao de batch exportada: {export_batch}")
+        export_model = model
+        if embed:
+            preprocessing = preprocessing or default_preprocessing(model)
+            print(f"   Pre-processamento embutido: entrada uint8, normalizacao '{preprocessing}', "
+                  f"saida '{output_mode}'" + (f" (threshold {threshold})" if output_mode != 'probabilities' else ''))
+            export_model = embed_preprocessing(model, preprocessing, output_mode, threshold)
+        converter = make_converter(export_model, export_batch)
         
         # Configura operações suportadas
         # Tenta primeiro com ops básicas do TFLite, depois com ops do TensorFlow se necessário
@@ -177,12 +764,29 @@ def convert_keras_to_tflite(
             tf.lite.OpsSet.TFLITE_BUILTINS,  # Ops básicas do TFLite (mais otimizadas)
         ]
         
+        calibration_images = None
+        if int8:
+            preprocessing = preprocessing or default_preprocessing(model)
+            _, height, width, _ = model.input_shape
+            print(f"   Carregando imagens de calibracao: {calibration_dir} (pre-processamento: {preprocessing})")
+            calibration_images = load_calibration_images(
+                calibration_dir, height, width, preprocessing, calibration_limit
+            )
+            if len(calibration_images) == 0:
+                print(f"[ERRO] Nenhuma imagem de calibracao encontrada em: {calibration_dir}")
+                sys.exit(1)
+            print(f"   {len(calibration_images)} imagens de calibracao carregadas")
+            
+            print("   Aplicando quantizacao inteira completa (INT8)...")
+            if uint8_io:
+                print("   Entrada e saida em uint8")
+            configure_converter(converter, 'int8', calibration_images, uint8_io,
+                                export_batch if isinstance(export_batch, int) else 1)
         # Aplica otimizações se solicitado (por padrão, sim)
-        if optimize:
+        elif optimize:
             print("   Aplicando otimizacoes (quantizacao float16)...")
             # Quantização float16 (reduz tamanho em ~50% mantendo boa precisão)
-            converter.optimizations = [tf.lite.Optimize.DEFAULT]
-            converter.target_spec.supported_types = [tf.float16]
+            configure_converter(converter, 'float16')
         else:
             print("   Convertendo sem otimizacoes (modelo maior, mas mais preciso)...")
         
@@ -192,6 +796,10 @@ def convert_keras_to_tflite(
             tflite_model = converter.convert()
         except Exception as convert_error:
             error_str = str(convert_error).lower()
+            if int8:
+                # Ops do TensorFlow não têm versão inteira: não há fallback
+                print("   [ERRO] O modelo tem operacoes sem implementacao INT8 no TFLite")
+                raise
             if "not supported" in error_str or "not implemented" in error_str:
                 print(f"   [AVISO] Algumas operacoes nao sao suportadas pelas ops basicas do TFLite")
                 print("   [INFO] Tentando com suporte a ops do TensorFlow...")
@@ -212,6 +820,12 @@ def convert_keras_to_tflite(
             else:
                 raise
         
+        metadata = build_artifact_metadata(
+            model, source_hash, input_path, options, preprocessing, embed,
+            output_mode, uint8_io, threshold, classes
+        )
+        tflite_model = embed_tflite_metadata(tflite_model, metadata)
+        
         # Cria o diretório de saída se não existir
         output_dir = os.path.dirname(output_path)
         if output_dir and not os.path.exists(output_dir):
@@ -229,6 +843,10 @@ def convert_keras_to_tflite(
         print(f"\n[OK] Conversao concluida com sucesso!")
         print(f"   Arquivo salvo em: {output_path}")
         print(f"   Tamanho do arquivo: {file_size_mb:.2f} MB ({file_size:,} bytes)")
+        print_artifact_metadata(metadata)
+        if registry is not None:
+            registry.store(key, tflite_model, input_path, options, metadata)
+            print(f"   Registrado em: {registry.artifact_path(key)}")
         
         # Verifica se o modelo pode ser carregado
         print("\n[INFO] Verificando integridade do modelo TFLite...")
@@ -244,15 +862,37 @@ def convert_keras_to_tflite(
             print(f"\n[INFO] Detalhes do Modelo TFLite:")
             print(f"   Input:")
             print(f"     - Shape: {input_details[0]['shape']}")
+            print(f"     - Assinatura: {input_details[0].get('shape_signature', input_details[0]['shape'])}")
             print(f"     - Tipo: {input_details[0]['dtype']}")
             print(f"   Output:")
             print(f"     - Shape: {output_details[0]['shape']}")
             print(f"     - Tipo: {output_details[0]['dtype']}")
             
+            # Comparação do modelo INT8 com o float nas imagens de calibração
+            if int8:
+                float_converter = make_converter(model, export_batch)
+                report = compare_quantized_model(
+                    float_converter.convert(), tflite_model, calibration_images
+                )
+                print_quantization_report(report)
+            elif embed and validate_precision:
+                _, height, width, _ = model.input_shape
+                raw_images = None
+                if calibration_dir:
+                    raw_images = load_raw_images(calibration_dir, height, width, preprocessing, calibration_limit)
+                if raw_images is None or len(raw_images) == 0:
+                    raw_images = np.random.randint(0, 256, (8, height, width, 3), dtype=np.uint8)
+                validate_embedded_model(model, output_path, raw_images, preprocessing, output_mode, threshold)
             # Validação de precisão (se solicitado)
-            if validate_precision:
+            elif validate_precision:
                 input_shape = model.input_shape[1:]  # Remove batch dimension
-                validate_model_precision(model, output_path, input_shape)
+                images = None
+                if calibration_dir:
+                    images = load_calibration_images(
+                        calibration_dir, input_shape[0], input_shape[1],
+                        preprocessing or default_preprocessing(model), calibration_limit
+                    )
+                validate_model_precision(model, output_path, input_shape, images)
             
         except Exception as e:
             print(f"   [AVISO] Erro ao verificar modelo: {e}")
@@ -262,6 +902,129 @@ def convert_keras_to_tflite(
         import traceback
         traceback.print_exc()
         sys.exit(1)
+    
+    return output_path
+
+
+def sweep_variants(
+    input_path: str,
+    images_dir: str,
+    output_dir: str,
+    calibration_dir: str = None,
+    threads=DEFAULT_SWEEP_THREADS,
+    preprocessing: str = None,
+    limit: int = DEFAULT_CALIBRATION_LIMIT,
+    runs: int = DEFAULT_BENCHMARK_RUNS
+):
+    """
+    Gera todas as variantes TFLite de um modelo e compara tamanho, latência e precisão
+    
+    Cada variante é salva em `output_dir`, medida com o interpretador TFLite em
+    cada número de threads e avaliada contra as saídas do Keras nas imagens
+    reais de `images_dir`. A tabela é gravada em `sweep.csv` e `sweep.md`.
+    
+    Args:
+        input_path: Caminho para o arquivo .keras
+        images_dir: Diretório com fotos reais para a avaliação
+        output_dir: Diretório para os .tflite e as tabelas
+        calibration_dir: Fotos para calibrar o INT8 (padrão: `images_dir`)
+        threads: Números de threads a medir
+        preprocessing: Pré-processamento de treinamento (None detecta pelo modelo)
+        limit: Número máximo de imagens de avaliação/calibração
+        runs: Repetições por medida de latência
+    
+    Returns:
+        list: Uma linha (dict) por variante
+    """
+    import csv
+    
+    tf = import_tensorflow()
+    print(f"[INFO] Carregando modelo Keras: {input_path}")
+    model = tf.keras.models.load_model(input_path, compile=False)
+    preprocessing = preprocessing or default_preprocessing(model)
+    _, height, width, _ = model.input_shape
+    is_segmentation = len(model.output_shape) == 4
+    
+    print(f"[INFO] Carregando imagens de avaliacao: {images_dir} (pre-processamento: {preprocessing})")
+    images = load_calibration_images(images_dir, height, width, preprocessing, limit)
+    if len(images) == 0:
+        print(f"[ERRO] Nenhuma imagem encontrada em: {images_dir}")
+        sys.exit(1)
+    if calibration_dir and os.path.abspath(calibration_dir) != os.path.abspath(images_dir):
+        calibration_images = load_calibration_images(calibration_dir, height, width, preprocessing, limit)
+    else:
+        calibration_images = images
+        print("   [AVISO] INT8 calibrado nas mesmas imagens da avaliacao (resultado otimista)")
+    
+    print(f"[INFO] Saidas de referencia do Keras ({len(images)} imagens)...")
+    reference = np.asarray(model.predict(images, batch_size=16, verbose=0), dtype=np.float32)
+    
+    os.makedirs(output_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    rows = []
+    for variant in TFLITE_VARIANTS:
+        print(f"\n[SWEEP] Variante: {variant}")
+        converter = tf.lite.TFLiteConverter.from_keras_model(model)
+        configure_converter(converter, variant, calibration_images)
+        try:
+            content = converter.convert()
+        except Exception as e:
+            print(f"   [ERRO] Falha na conversao: {e}")
+            rows.append({'variant': variant, 'error': str(e).splitlines()[0]})
+            continue
+        
+        path = os.path.join(output_dir, f"{stem}_{variant}.tflite")
+        with open(path, 'wb') as f:
+            f.write(content)
+        
+        row = {'variant': variant, 'file': path, 'size_mb': len(content) / (1024 * 1024)}
+        for num_threads in threads:
+            row[f'latency_ms_{num_threads}t'] = benchmark_tflite(content, images[:1], runs, num_threads)
+        
+        scores = score_outputs(reference, tflite_predict(content, images), SEGMENTATION_THRESHOLD)
+        row['mean_abs_diff'] = float(np.mean(scores['mean_abs_diff']))
+        row['max_abs_diff'] = float(np.max(scores['max_abs_diff']))
+        if is_segmentation:
+            row['iou_mean'] = float(np.mean(scores['iou']))
+            row['iou_min'] = float(np.min(scores['iou']))
+        else:
+            row['top1_agreement'] = float(np.mean(scores['top1_agree']))
+        rows.append(row)
+        print(f"   {row['size_mb']:.2f} MB | " + " | ".join(
+            f"{t}t: {row[f'latency_ms_{t}t']:.2f} ms" for t in threads
+        ) + f" | dif. media: {row['mean_abs_diff']:.6f}")
+    
+    columns = ['variant', 'size_mb'] + [f'latency_ms_{t}t' for t in threads] + ['mean_abs_diff', 'max_abs_diff']
+    columns += ['iou_mean', 'iou_min'] if is_segmentation else ['top1_agreement']
+    columns += ['file', 'error']
+    
+    csv_path = os.path.join(output_dir, 'sweep.csv')
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    
+    def cell(value):
+        if value is None:
+            return '-'
+        return f"{value:.4g}" if isinstance(value, float) else str(value)
+    
+    md_columns = [c for c in columns if c not in ('file', 'error')]
+    md_path = os.path.join(output_dir, 'sweep.md')
+    with open(md_path, 'w', encoding='utf-8') as f:
+        f.write(f"# Variantes TFLite de `{os.path.basename(input_path)}`\n\n")
+        f.write(f"{len(images)} imagens de `{images_dir}`; referencia: Keras; "
+                f"threshold das mascaras: {SEGMENTATION_THRESHOLD}; latencia: mediana de {runs} execucoes (1 imagem).\n\n")
+        f.write("| " + " | ".join(md_columns) + " |\n")
+        f.write("|" + "---|" * len(md_columns) + "\n")
+        for row in rows:
+            if 'error' in row:
+                f.write(f"| {row['variant']} | falhou: {row['error']} |" + " |" * (len(md_columns) - 2) + "\n")
+            else:
+                f.write("| " + " | ".join(cell(row.get(c)) for c in md_columns) + " |\n")
+    
+    print(f"\n[OK] Tabelas salvas em: {csv_path} e {md_path}")
+    return rows
 
 
 def main():
@@ -278,6 +1041,25 @@ Exemplos:
   
   # Conversão com validação de precisão
   python convert_model.py --input model.keras --output assets/model.tflite --validate-precision
+  
+  # Quantização inteira completa (INT8) calibrada com fotos reais
+  python convert_model.py --input model.keras --output assets/model_int8.tflite --int8 --calibration-dir dataset/images
+  
+  # INT8 com entrada e saída uint8
+  python convert_model.py --input model.keras --output assets/model_int8.tflite --int8 --calibration-dir dataset/images --uint8-io
+  
+  # Batch fixo de 8 imagens por invoke() (ou 'dynamic' para qualquer tamanho)
+  python convert_model.py --input model.keras --output assets/model_b8.tflite --batch-size 8
+  
+  # Entrada uint8 com a normalizacao do treinamento e mascara binaria uint8 na saida
+  python convert_model.py --input model.keras --output assets/model_u8_mask.tflite --embed-preprocessing --output-mode mask
+  
+  # Repetir a mesma conversao copia o artefato do registro (tflite_registry/);
+  # --no-cache forca a reconversao
+  python convert_model.py --input model.keras --output assets/model.tflite --no-cache
+  
+  # Compara todas as variantes (tamanho, latencia em 1/2/4 threads, precisao vs Keras)
+  python convert_model.py --input model.keras --sweep --images-dir dataset/images --sweep-output conversion_sweep
         """
     )
     
@@ -307,8 +1089,166 @@ Exemplos:
         help='Valida precisão comparando predições Keras vs TFLite (opcional)'
     )
     
+    parser.add_argument(
+        '--int8',
+        action='store_true',
+        help='Quantizacao inteira completa (INT8) com dataset representativo (requer --calibration-dir)'
+    )
+    
+    parser.add_argument(
+        '--calibration-dir',
+        type=str,
+        default=None,
+        help='Diretorio com fotos reais da conjuntiva para calibracao INT8 '
+             '(tambem usado por --validate-precision)'
+    )
+    
+    parser.add_argument(
+        '--calibration-limit',
+        type=int,
+        default=DEFAULT_CALIBRATION_LIMIT,
+        help=f'Numero maximo de imagens de calibracao (padrao: {DEFAULT_CALIBRATION_LIMIT})'
+    )
+    
+    parser.add_argument(
+        '--uint8-io',
+        action='store_true',
+        help='Com --int8, usa entrada e saida uint8 em vez de float32'
+    )
+    
+    parser.add_argument(
+        '--preprocessing',
+        type=str,
+        choices=PREPROCESSING_MODES,
+        default=None,
+        help='Pre-processamento de treinamento para a calibracao '
+             '(padrao: mobilenet_v2 para segmentacao, rescale para classificacao)'
+    )
+    
+    parser.add_argument(
+        '--batch-size',
+        type=str,
+        default=None,
+        help="Dimensao de batch exportada: 'dynamic' ou um inteiro N (padrao: assinatura do conversor)"
+    )
+    
+    parser.add_argument(
+        '--embed-preprocessing',
+        action='store_true',
+        help='Exporta com entrada uint8 e a normalizacao do treinamento no grafo '
+             '(--preprocessing; padrao: mobilenet_v2 para segmentacao, rescale para classificacao)'
+    )
+    
+    parser.add_argument(
+        '--output-mode',
+        type=str,
+        choices=EMBEDDED_OUTPUT_MODES,
+        default='probabilities',
+        help='Com --embed-preprocessing, saida do modelo: probabilidades, mascara uint8 (0/1) '
+             'ou cobertura em %% (padrao: probabilities)'
+    )
+    
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=SEGMENTATION_THRESHOLD,
+        help=f'Com --output-mode mask/coverage, threshold de binarizacao (padrao: {SEGMENTATION_THRESHOLD})'
+    )
+    
+    parser.add_argument(
+        '--classes',
+        type=str,
+        default=None,
+        help='Nomes das classes do classificador, separados por virgula, gravados nos metadados '
+             '(padrao: Normal,Leve,Moderada,Grave para 4 saidas)'
+    )
+    
+    parser.add_argument(
+        '--registry',
+        type=str,
+        default=DEFAULT_REGISTRY_DIR,
+        help=f'Diretorio do registro de artefatos convertidos (padrao: {DEFAULT_REGISTRY_DIR})'
+    )
+    
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Converte de novo mesmo se o registro ja tem o artefato (e o substitui)'
+    )
+    
+    parser.add_argument(
+        '--no-registry',
+        action='store_true',
+        help='Nao consulta nem grava o registro de artefatos'
+    )
+    
+    parser.add_argument(
+        '--sweep',
+        action='store_true',
+        help='Gera e compara todas as variantes (no-opt, dynamic-range, float16, int8); requer --images-dir'
+    )
+    
+    parser.add_argument(
+        '--images-dir',
+        type=str,
+        default=None,
+        help='Com --sweep, diretorio de fotos reais para avaliar as variantes contra o Keras'
+    )
+    
+    parser.add_argument(
+        '--sweep-output',
+        type=str,
+        default='conversion_sweep',
+        help='Com --sweep, diretorio para os modelos e as tabelas (padrao: conversion_sweep)'
+    )
+    
+    parser.add_argument(
+        '--threads',
+        type=str,
+        default=','.join(str(t) for t in DEFAULT_SWEEP_THREADS),
+        help='Com --sweep, numeros de threads medidos, separados por virgula (padrao: 1,2,4)'
+    )
+    
     args = parser.parse_args()
     
+    if args.sweep:
+        if not args.images_dir or not os.path.isdir(args.images_dir):
+            parser.error('--sweep requer --images-dir com um diretorio existente')
+        if not os.path.exists(args.input):
+            print(f"[ERRO] Arquivo nao encontrado: {args.input}")
+            sys.exit(1)
+        try:
+            threads = [int(t) for t in args.threads.split(',') if t.strip()]
+        except ValueError:
+            parser.error(f'--threads invalido: {args.threads}')
+        sweep_variants(
+            args.input,
+            args.images_dir,
+            args.sweep_output,
+            calibration_dir=args.calibration_dir,
+            threads=threads,
+            preprocessing=args.preprocessing,
+            limit=args.calibration_limit
+        )
+        return
+    
+    try:
+        export_batch = parse_export_batch(args.batch_size)
+    except ValueError:
+        parser.error(f"--batch-size invalido: {args.batch_size} (use 'dynamic' ou um inteiro positivo)")
+    
+    if args.int8 and not args.calibration_dir:
+        parser.error('--int8 requer --calibration-dir')
+    if args.calibration_dir and not os.path.isdir(args.calibration_dir):
+        print(f"[ERRO] Diretorio de calibracao nao encontrado: {args.calibration_dir}")
+        sys.exit(1)
+    if args.uint8_io and not args.int8:
+        parser.error('--uint8-io requer --int8')
+    if args.embed_preprocessing and args.int8:
+        parser.error('--embed-preprocessing nao e compativel com --int8 (use --int8 --uint8-io)')
+    if args.output_mode != 'probabilities' and not args.embed_preprocessing:
+        parser.error('--output-mode requer --embed-preprocessing')
+    
     print("=" * 60)
     print("Conversor Keras -> TensorFlow Lite (Melhorado)")
     print("=" * 60)
@@ -317,7 +1257,9 @@ Exemplos:
     # Por padrão, otimizações estão habilitadas (melhor para produção)
     optimize = not args.no_optimize
     
-    if optimize:
+    if args.int8:
+        print("[INFO] Quantizacao INT8 habilitada")
+    elif optimize:
         print("[INFO] Otimizacoes habilitadas (padrao)")
     else:
         print("[INFO] Otimizacoes desabilitadas")
@@ -331,7 +1273,19 @@ Exemplos:
         args.input, 
         args.output, 
         optimize=optimize,
-        validate_precision=args.validate_precision
+        validate_precision=args.validate_precision,
+        int8=args.int8,
+        calibration_dir=args.calibration_dir,
+        uint8_io=args.uint8_io,
+        preprocessing=args.preprocessing,
+        calibration_limit=args.calibration_limit,
+        export_batch=export_batch,
+        embed=args.embed_preprocessing,
+        output_mode=args.output_mode,
+        threshold=args.threshold,
+        classes=[c.strip() for c in args.classes.split(',') if c.strip()] if args.classes else None,
+        registry_dir=None if args.no_registry else args.registry,
+        use_cache=not args.no_cache
     )
     
     print("\n" + "=" * 60)
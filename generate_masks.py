@@ -0,0 +1,337 @@
+"""
+Gera as máscaras de treinamento a partir das anotações do VIA (VGG Image Annotator)
+
+Substitui a Célula 2 de projeto_tc_segmentacao.py, que decodificava cada foto
+inteira só para descobrir altura e largura, preenchia os polígonos em
+resolução completa e regravava todos os PNGs a cada execução. Aqui:
+
+- as dimensões vêm do cabeçalho JPEG/PNG (com a orientação EXIF, como o
+  cv2.imread), sem decodificar os pixels;
+- os polígonos são rasterizados direto na resolução de saída: completa
+  (--output, igual à Célula 2) e/ou reduzida (--resized-output, 256x256 por
+  padrão, a entrada da U-Net);
+- as imagens são distribuídas entre processos (--workers);
+- um manifesto em cada diretório de saída pula as máscaras cuja anotação e
+  imagem de origem não mudaram.
+
+Uso:
+    python generate_masks.py --annotations FiltroManual.json --images imagens --output mascaras
+    python generate_masks.py --annotations FiltroManual.json --images imagens --resized-output mascaras_256 --size 256
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import cv2
+
+from generate_segmentation_crops import hash_file
+from image_decoding import read_display_size
+
+# Configurar encoding UTF-8 para Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+MANIFEST_FILENAME = 'masks_manifest.jsonl'  # No diretório de cada saída
+DEFAULT_SIZE = 256
+DEFAULT_WORKERS = os.cpu_count() or 1
+# Saída reduzida: vértices com bits fracionários no cv2.fillPoly, em uma grade
+# SUPERSAMPLE vezes maior reduzida por área. O fillPoly inclui os pixels da
+# borda; sem a supersamostragem a máscara cresce ~0.5 px em 256x256 (IoU 0.97
+# contra rasterizar na resolução original e aplicar cv2.resize; 0.996 com 8x)
+SUBPIXEL_BITS = 4
+SUPERSAMPLE = 8
+
+
+def load_via_annotations(json_path):
+    """
+    Lê as anotações de um projeto do VIA
+
+    Aceita o projeto completo (chave `_via_img_metadata`) ou a exportação
+    "annotations as json" (o próprio dicionário de imagens).
+
+    Returns:
+        dict: id da imagem -> {'filename', 'regions', ...}
+    """
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return data.get('_via_img_metadata', data)
+
+
+def annotation_hash(ann):
+    """SHA-256 das regiões anotadas de uma imagem (ordem de chaves normalizada)"""
+    payload = json.dumps(ann.get('regions', []), sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def polygons_from_regions(regions):
+    """Vértices (x, y) de cada região 'polygon' (as demais formas são ignoradas, como no notebook)"""
+    polygons = []
+    for region in regions:
+        shape = region.get('shape_attributes', {})
+        if shape.get('name') == 'polygon':
+            polygons.append(np.array(list(zip(shape['all_points_x'], shape['all_points_y'])), dtype=np.float64))
+    return polygons
+
+
+def rasterize_polygons(polygons, source_height, source_width, size=None):
+    """
+    Preenche os polígonos em uma máscara uint8 (0/255)
+
+    Args:
+        polygons: Vértices em coordenadas da imagem original
+        source_height: Altura da imagem original (orientada)
+        source_width: Largura da imagem original (orientada)
+        size: None para a resolução original (mesmo resultado da Célula 2) ou
+            (altura, largura) para rasterizar direto na resolução reduzida
+
+    Returns:
+        np.ndarray: Máscara [altura, largura]
+    """
+    if size is None:
+        mask = np.zeros((source_height, source_width), dtype=np.uint8)
+        for points in polygons:
+            cv2.fillPoly(mask, [points.astype(np.int32)], 255)
+        return mask
+
+    height, width = size
+    grid = np.zeros((height * SUPERSAMPLE, width * SUPERSAMPLE), dtype=np.uint8)
+    # Mesmo mapeamento de coordenadas do cv2.resize (centros de pixel alinhados),
+    # com vértices em ponto fixo para não arredondar para o pixel inteiro
+    scale = np.array([grid.shape[1] / source_width, grid.shape[0] / source_height])
+    for points in polygons:
+        scaled = (points + 0.5) * scale - 0.5
+        fixed = np.round(scaled * (1 << SUBPIXEL_BITS)).astype(np.int32)
+        cv2.fillPoly(grid, [fixed], 255, shift=SUBPIXEL_BITS)
+    coverage = cv2.resize(grid, (width, height), interpolation=cv2.INTER_AREA)
+    return np.where(coverage > 127, 255, 0).astype(np.uint8)
+
+
+def rasterize_job(job):
+    """
+    Gera as máscaras de uma imagem (executado nos processos do pool)
+
+    Args:
+        job: (nome da imagem, caminho da imagem, regiões, [(caminho de saída, size)])
+
+    Returns:
+        tuple: (nome, status, sha256 da imagem) com status 'ok', 'missing' ou 'unreadable'
+    """
+    filename, image_path, regions, targets = job
+    if not os.path.exists(image_path):
+        return filename, 'missing', None
+
+    dimensions = read_display_size(image_path)
+    if dimensions is None:
+        # Formato sem leitor de cabeçalho (ex.: BMP, TIFF): decodifica
+        image = cv2.imread(image_path)
+        if image is None:
+            return filename, 'unreadable', None
+        dimensions = image.shape[:2]
+
+    polygons = polygons_from_regions(regions)
+    for output_path, size in targets:
+        mask = rasterize_polygons(polygons, dimensions[0], dimensions[1], size)
+        if not cv2.imwrite(output_path, mask):
+            return filename, 'unreadable', None
+    return filename, 'ok', hash_file(image_path)
+
+
+class MaskManifest:
+    """
+    Manifesto das máscaras geradas em um diretório de saída
+
+    Mesmo formato do CropManifest (generate_segmentation_crops.py): uma linha
+    JSON por imagem, a última prevalece, compactado no `close`. Uma máscara é
+    válida enquanto a anotação, a imagem de origem (tamanho/mtime ou, se
+    tocada, conteúdo) e a resolução de saída forem as mesmas.
+    """
+
+    def __init__(self, output_dir, size):
+        self.output_dir = output_dir
+        self.size = list(size) if size else None
+        self.path = os.path.join(output_dir, MANIFEST_FILENAME)
+        self.entries = self._load()
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _load(self):
+        entries = {}
+        if not os.path.exists(self.path):
+            return entries
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    entries[entry['file']] = entry
+                except (ValueError, KeyError, TypeError):
+                    # Linha truncada por uma execução interrompida
+                    continue
+        return entries
+
+    def is_up_to_date(self, filename, image_path, ann_hash, mask_filename):
+        entry = self.entries.get(filename)
+        if entry is None or entry.get('annotation_sha256') != ann_hash or entry.get('mask_size') != self.size:
+            return False
+        if not os.path.isfile(os.path.join(self.output_dir, mask_filename)):
+            return False
+        stat = os.stat(image_path)
+        if entry.get('size') != stat.st_size or entry.get('mtime_ns') != stat.st_mtime_ns:
+            if entry.get('sha256') != hash_file(image_path):
+                return False
+            entry['size'] = stat.st_size
+            entry['mtime_ns'] = stat.st_mtime_ns
+        return True
+
+    def record(self, filename, image_path, content_hash, ann_hash, mask_filename):
+        stat = os.stat(image_path)
+        entry = {
+            'file': filename,
+            'sha256': content_hash,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'annotation_sha256': ann_hash,
+            'mask': mask_filename,
+            'mask_size': self.size,
+        }
+        self.entries[filename] = entry
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def close(self):
+        """Compacta o manifesto (uma linha por imagem) de forma atômica"""
+        self._file.close()
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for filename in sorted(self.entries):
+                f.write(json.dumps(self.entries[filename], ensure_ascii=False) + '\n')
+        os.replace(tmp_path, self.path)
+
+
+def generate_masks(annotations_path, images_dir, output_dir=None, resized_output_dir=None,
+                   size=DEFAULT_SIZE, workers=DEFAULT_WORKERS, force=False):
+    """
+    Gera as máscaras das imagens anotadas, pulando as que não mudaram
+
+    Args:
+        annotations_path: JSON do projeto VIA
+        images_dir: Diretório das fotos anotadas
+        output_dir: Diretório das máscaras em resolução original (opcional)
+        resized_output_dir: Diretório das máscaras size x size (opcional)
+        size: Lado das máscaras reduzidas
+        workers: Processos de rasterização (0 executa no processo atual)
+        force: Se True, regera todas as máscaras
+
+    Returns:
+        dict: Contagens (generated, skipped, missing, unreadable)
+    """
+    outputs = []
+    if output_dir:
+        outputs.append((output_dir, None))
+    if resized_output_dir:
+        outputs.append((resized_output_dir, (size, size)))
+    if not outputs:
+        raise ValueError("Informe ao menos um diretório de saída")
+    manifests = []
+    for directory, target_size in outputs:
+        os.makedirs(directory, exist_ok=True)
+        manifests.append(MaskManifest(directory, target_size))
+
+    annotations = load_via_annotations(annotations_path)
+    print(f"Encontradas anotações para {len(annotations)} imagens no arquivo JSON.")
+
+    counts = {'generated': 0, 'skipped': 0, 'missing': 0, 'unreadable': 0}
+    jobs, job_info = [], {}
+    for ann in annotations.values():
+        filename = ann['filename']
+        image_path = os.path.join(images_dir, filename)
+        if not os.path.exists(image_path):
+            print(f"AVISO: Imagem {filename} não encontrada. Pulando.")
+            counts['missing'] += 1
+            continue
+        mask_filename = os.path.splitext(filename)[0] + '.png'
+        ann_hash = annotation_hash(ann)
+        stale = [
+            manifest for manifest in manifests
+            if force or not manifest.is_up_to_date(filename, image_path, ann_hash, mask_filename)
+        ]
+        if not stale:
+            counts['skipped'] += 1
+            continue
+        targets = [
+            (os.path.join(manifest.output_dir, mask_filename), tuple(manifest.size) if manifest.size else None)
+            for manifest in stale
+        ]
+        jobs.append((filename, image_path, ann.get('regions', []), targets))
+        job_info[filename] = (image_path, ann_hash, mask_filename, stale)
+
+    print(f"{len(jobs)} máscaras a gerar, {counts['skipped']} inalteradas")
+    try:
+        if workers and workers > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunksize = max(1, len(jobs) // (workers * 4))
+                results = list(executor.map(rasterize_job, jobs, chunksize=chunksize))
+        else:
+            results = [rasterize_job(job) for job in jobs]
+
+        for filename, status, content_hash in results:
+            if status != 'ok':
+                print(f"AVISO: Imagem {filename} {'não encontrada' if status == 'missing' else 'corrompida ou ilegível'}. Pulando.")
+                counts[status] += 1
+                continue
+            image_path, ann_hash, mask_filename, stale = job_info[filename]
+            for manifest in stale:
+                manifest.record(filename, image_path, content_hash, ann_hash, mask_filename)
+            counts['generated'] += 1
+    finally:
+        for manifest in manifests:
+            manifest.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Gera máscaras de segmentação a partir das anotações de polígonos do VIA',
+    )
+    parser.add_argument('--annotations', '-a', type=str, required=True,
+                        help='JSON do projeto VIA (com _via_img_metadata)')
+    parser.add_argument('--images', '-i', type=str, required=True, help='Diretório das fotos anotadas')
+    parser.add_argument('--output', '-o', type=str, default=None,
+                        help='Diretório das máscaras em resolução original')
+    parser.add_argument('--resized-output', type=str, default=None,
+                        help='Diretório das máscaras rasterizadas direto em --size x --size')
+    parser.add_argument('--size', type=int, default=DEFAULT_SIZE,
+                        help=f'Lado das máscaras de --resized-output (padrão: {DEFAULT_SIZE})')
+    parser.add_argument('--workers', '-w', type=int, default=DEFAULT_WORKERS,
+                        help=f'Processos de rasterização (padrão: {DEFAULT_WORKERS}; 0 ou 1 = sem pool)')
+    parser.add_argument('--force', action='store_true', help='Regera todas as máscaras')
+    args = parser.parse_args()
+
+    if not args.output and not args.resized_output:
+        parser.error('informe --output e/ou --resized-output')
+    if not os.path.isfile(args.annotations):
+        print(f"ERRO: Arquivo JSON não encontrado em: {args.annotations}")
+        sys.exit(1)
+    if not os.path.isdir(args.images):
+        print(f"ERRO: Diretório não encontrado: {args.images}")
+        sys.exit(1)
+    if args.size < 1:
+        print("ERRO: --size deve ser maior que zero")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    counts = generate_masks(args.annotations, args.images, args.output, args.resized_output,
+                            args.size, args.workers, args.force)
+    print(f"\nProcesso de geração de máscaras concluído em {time.perf_counter() - start:.1f}s: "
+          f"{counts['generated']} geradas, {counts['skipped']} inalteradas, "
+          f"{counts['missing']} não encontradas, {counts['unreadable']} ilegíveis")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,34 @@
 """
-Script para gerar recortes de imagens usando segmentação com modelo Keras
+Script para gerar recortes de imagens usando segmentação com modelo Keras ou TFLite
 
-Este script carrega um modelo .keras de segmentação, processa imagens de um diretório,
-e gera máscaras binárias e recortes das regiões segmentadas.
+Este script carrega um modelo de segmentação (.keras ou .tflite), processa imagens
+de um diretório, e gera máscaras binárias e recortes das regiões segmentadas.
 
 Uso:
     python generate_segmentation_crops.py --model melhor_modelo_unet_metricas_completas.keras --input assets/images/examples --output results
     python generate_segmentation_crops.py --model melhor_modelo_unet_metricas_completas.keras --input assets/images/examples --output results --threshold 0.3
+    python generate_segmentation_crops.py --model melhor_modelo_unet_metricas_completas.keras --input assets/images/examples --output results --batch-size 32
+    python generate_segmentation_crops.py --model assets/model.tflite --backend tflite --num-threads 4 --input assets/images/examples --output results
 """
 
 import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing
 import os
 import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import numpy as np
 import cv2
-import tensorflow as tf
+
+from image_decoding import imread_for_model
+from lazy_runtime import create_tflite_interpreter, import_tensorflow
+from model_registry import read_tflite_metadata
+from perf_report import StageTimer
 
 # Configurar encoding UTF-8 para Windows
 if sys.platform == 'win32':
@@ -27,9 +41,36 @@ IMG_HEIGHT = 256
 IMG_WIDTH = 256
 SEGMENTATION_THRESHOLD = 0.3  # Threshold padrão para binarização
 MIN_COVERAGE_PERCENTAGE = 0.1  # Porcentagem mínima de cobertura
+DEFAULT_BATCH_SIZE = 16  # Imagens por passada do modelo
+DEFAULT_PREFETCH = 32  # Imagens decodificadas à frente do modelo
+DEFAULT_IO_WORKERS = min(4, os.cpu_count() or 1)  # Threads de decodificação
+BACKENDS = ('keras', 'tflite')
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif')
+DEFAULT_WRITE_WORKERS = 2  # Threads de codificação/gravação (0 = síncrono)
+DEFAULT_WRITE_QUEUE = 64  # Gravações pendentes antes de bloquear o loop principal
+MANIFEST_FILENAME = 'manifest.jsonl'  # Registro das saídas já geradas (no diretório de saída)
+SHARD_BATCHES = 4  # Lotes por fatia entregue a cada processo (--workers)
+
+
+def list_image_files(input_dir):
+    """
+    Lista, em ordem alfabética, as imagens de um diretório
+    
+    Args:
+        input_dir: Diretório com imagens de entrada
+    
+    Returns:
+        list: Nomes dos arquivos de imagem
+    """
+    return sorted([
+        f for f in os.listdir(input_dir)
+        if f.lower().endswith(IMAGE_EXTENSIONS)
+        and os.path.isfile(os.path.join(input_dir, f))
+    ])
 
 
-def preprocess_inference_image(image_path, target_height, target_width):
+def preprocess_inference_image(image_path, target_height, target_width, fast_decode=True,
+                               timer=None):
     """
     Pré-processa uma imagem para inferência
     
@@ -37,16 +78,46 @@ def preprocess_inference_image(image_path, target_height, target_width):
         image_path: Caminho para a imagem
         target_height: Altura alvo
         target_width: Largura alvo
+        fast_decode: Se True, decodifica JPEGs grandes em resolução reduzida
+            (ver `image_decoding.imread_for_model`)
+        timer: StageTimer opcional (etapas 'decode' e 'preprocess')
     
     Returns:
         tuple: (imagem pré-processada, imagem original redimensionada)
     """
-    img = cv2.imread(image_path)
+    if timer is not None:
+        start = time.perf_counter()
+    
+    img = imread_for_model(image_path, target_height, target_width, fast_decode)
     if img is None:
         raise IOError(f"Não foi possível ler a imagem: {image_path}")
     
+    if timer is not None:
+        decoded = time.perf_counter()
+        timer.record('decode', decoded - start)
+    
+    img_float, img_resized_original = prepare_model_input(img, target_height, target_width)
+    
+    if timer is not None:
+        timer.record('preprocess', time.perf_counter() - decoded)
+    
+    return img_float, img_resized_original
+
+
+def prepare_model_input(img_bgr, target_height, target_width):
+    """
+    Converte uma imagem BGR já decodificada na entrada do modelo
+    
+    Args:
+        img_bgr: Imagem BGR (como retornada pelo OpenCV)
+        target_height: Altura alvo
+        target_width: Largura alvo
+    
+    Returns:
+        tuple: (imagem pré-processada, imagem original redimensionada)
+    """
     # Converte BGR para RGB
-    img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
     
     # Redimensiona para o tamanho do modelo
     img_resized_original = cv2.resize(img_rgb, (target_width, target_height))
@@ -57,16 +128,841 @@ def preprocess_inference_image(image_path, target_height, target_width):
     return img_float, img_resized_original
 
 
-def process_images(model_path, input_dir, output_dir, threshold=SEGMENTATION_THRESHOLD):
+def select_model_input(model_inference, processed_img, resized_original_img):
+    """
+    Escolhe a entrada do modelo para uma imagem
+    
+    Modelos com pré-processamento embutido (`uint8_input`) recebem a imagem
+    RGB redimensionada em uint8; os demais, a imagem normalizada.
+    """
+    if getattr(model_inference, 'uint8_input', False):
+        return resized_original_img
+    return processed_img
+
+
+class TFLiteSegmentationModel:
+    """
+    Executa um modelo .tflite com a mesma interface de predição do Keras
+    
+    Modelos com batch dinâmico (shape_signature[0] == -1, padrão do
+    convert_model.py) executam o lote inteiro em um único `invoke()`. Cada
+    tamanho de lote tem seu próprio interpretador, criado na primeira vez com
+    `resize_tensor_input` + `allocate_tensors` e reutilizado depois; assim,
+    alternar entre tamanhos (ex.: último lote menor, micro-batching do
+    servidor) não realoca tensores a cada chamada. Modelos com batch fixo B
+    (convert_model.py --batch-size B) recebem o lote em blocos de B imagens,
+    com o último bloco completado com zeros.
+    """
+    
+    def __init__(self, model_path, num_threads=None):
+        self.model_path = model_path
+        self.num_threads = num_threads
+        self.interpreter = create_tflite_interpreter(model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        
+        input_details = self.interpreter.get_input_details()[0]
+        output_details = self.interpreter.get_output_details()[0]
+        self._input_index = input_details['index']
+        self._output_index = output_details['index']
+        self._input_dtype = input_details['dtype']
+        self._output_dtype = output_details['dtype']
+        # Modelos INT8 com I/O inteiro (convert_model.py --int8 --uint8-io)
+        self._input_quantization = input_details['quantization']
+        self._output_quantization = output_details['quantization']
+        # Entrada uint8 sem quantização: normalização embutida no grafo
+        # (convert_model.py --embed-preprocessing), recebe os pixels RGB
+        self.uint8_input = (
+            np.dtype(self._input_dtype) == np.uint8 and not self._input_quantization[0]
+        )
+        # Metadados gravados pelo convert_model.py (classes, normalização,
+        # threshold, hash de origem); None em modelos convertidos antes do registro
+        self.metadata = read_tflite_metadata(model_path)
+        
+        self.input_shape = tuple(int(d) for d in input_details['shape'])
+        self.output_shape = tuple(int(d) for d in output_details['shape'])
+        # Saída exportada (convert_model.py --output-mode): 'probabilities',
+        # 'mask' (uint8 0/1, threshold no grafo) ou 'coverage' (um valor por
+        # imagem); sem metadados, deduzida do tipo e da forma da saída
+        self.output_mode = (self.metadata or {}).get('output_mode')
+        if self.output_mode is None:
+            if len(self.output_shape) == 1:
+                self.output_mode = 'coverage'
+            elif (len(self.output_shape) == 4 and np.dtype(self._output_dtype) == np.uint8
+                  and not self._output_quantization[0]):
+                self.output_mode = 'mask'
+            else:
+                self.output_mode = 'probabilities'
+        signature = input_details.get('shape_signature', input_details['shape'])
+        self.dynamic_batch = int(signature[0]) == -1
+        self._fixed_batch = self.input_shape[0]
+        self._interpreters = {self.input_shape[0]: self.interpreter}
+    
+    def _get_interpreter(self, batch_size):
+        interpreter = self._interpreters.get(batch_size)
+        if interpreter is None:
+            interpreter = create_tflite_interpreter(self.model_path, num_threads=self.num_threads)
+            interpreter.resize_tensor_input(
+                self._input_index, [batch_size, *self.input_shape[1:]]
+            )
+            interpreter.allocate_tensors()
+            self._interpreters[batch_size] = interpreter
+        return interpreter
+    
+    def _invoke(self, interpreter, batch):
+        if np.issubdtype(self._input_dtype, np.integer) and self._input_quantization[0]:
+            scale, zero_point = self._input_quantization
+            info = np.iinfo(self._input_dtype)
+            batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max)
+        interpreter.set_tensor(self._input_index, batch.astype(self._input_dtype, copy=False))
+        interpreter.invoke()
+        output = interpreter.get_tensor(self._output_index)
+        if np.issubdtype(self._output_dtype, np.integer) and self._output_quantization[0]:
+            scale, zero_point = self._output_quantization
+            output = (output.astype(np.float32) - zero_point) * scale
+        return output
+    
+    def _predict_fixed(self, batch):
+        size = self._fixed_batch
+        outputs = []
+        for start in range(0, len(batch), size):
+            chunk = batch[start:start + size]
+            n = len(chunk)
+            if n < size:
+                chunk = np.concatenate(
+                    [chunk, np.zeros((size - n, *chunk.shape[1:]), dtype=chunk.dtype)], axis=0
+                )
+            # get_tensor devolve uma cópia, então o próximo invoke não a sobrescreve
+            outputs.append(self._invoke(self.interpreter, chunk)[:n])
+        return np.concatenate(outputs, axis=0)
+    
+    def predict_on_batch(self, batch):
+        """
+        Executa a inferência em um lote [N, H, W, C]
+        
+        Args:
+            batch: Array float32 com as imagens pré-processadas
+        
+        Returns:
+            np.ndarray: Saída do modelo com N na primeira dimensão
+        """
+        if self.dynamic_batch:
+            try:
+                return self._invoke(self._get_interpreter(len(batch)), batch)
+            except (RuntimeError, ValueError) as e:
+                print(f"   [AVISO] Modelo TFLite não aceita batch {len(batch)} ({e}); "
+                      f"executando em blocos de {self._fixed_batch}")
+                self.dynamic_batch = False
+        return self._predict_fixed(batch)
+
+
+def resolve_backend(model_path, backend=None):
+    """
+    Define o backend de inferência a partir da extensão do modelo quando não informado
+    
+    Args:
+        model_path: Caminho para o arquivo do modelo
+        backend: 'keras', 'tflite' ou None (detecta pela extensão)
+    
+    Returns:
+        str: Backend a ser usado
+    """
+    if backend:
+        return backend
+    return 'tflite' if model_path.lower().endswith('.tflite') else 'keras'
+
+
+def load_segmentation_model(model_path, backend='keras', num_threads=None, require_mask=False):
+    """
+    Carrega o modelo de segmentação no backend escolhido
+    
+    Args:
+        model_path: Caminho para o arquivo .keras ou .tflite
+        backend: 'keras' ou 'tflite'
+        num_threads: Número de threads de inferência (None usa o padrão do runtime)
+        require_mask: Se True, rejeita modelos sem saída por pixel (ver
+            `require_mask_output`); False para classificadores
+    
+    Returns:
+        Objeto com `predict_on_batch`, `input_shape` e `output_shape`
+    """
+    if backend == 'tflite':
+        model = TFLiteSegmentationModel(model_path, num_threads=num_threads)
+    else:
+        tf = import_tensorflow()
+        if num_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+            tf.config.threading.set_inter_op_parallelism_threads(1)
+        # Para inferência, podemos usar compile=False
+        model = tf.keras.models.load_model(model_path, compile=False)
+    if require_mask:
+        require_mask_output(model, model_path)
+    return model
+
+
+def model_output_mode(model_inference):
+    """'probabilities', 'mask' ou 'coverage' (modelos Keras: 'probabilities')"""
+    return getattr(model_inference, 'output_mode', 'probabilities')
+
+
+def require_mask_output(model_inference, model_path=''):
+    """
+    Garante que o modelo devolve uma máscara por pixel [N, H, W, 1]
+    
+    Exportações com `--output-mode coverage` devolvem só a porcentagem de
+    cobertura e não servem para gerar máscaras e recortes.
+    
+    Raises:
+        ValueError: Se a saída não for uma máscara
+    """
+    output_shape = tuple(model_inference.output_shape)
+    if model_output_mode(model_inference) == 'coverage' or len(output_shape) != 4:
+        raise ValueError(
+            f"O modelo {model_path} não produz uma máscara por pixel "
+            f"(saída {output_shape}, modo '{model_output_mode(model_inference)}'); "
+            f"exporte com --output-mode probabilities ou mask"
+        )
+
+
+def model_input_size(model_inference):
+    """(altura, largura) da entrada do modelo; o padrão 256x256 se não for fixa"""
+    shape = tuple(model_inference.input_shape)
+    if len(shape) == 4 and shape[1] and shape[2]:
+        return int(shape[1]), int(shape[2])
+    return IMG_HEIGHT, IMG_WIDTH
+
+
+def iter_preprocessed_images(input_dir, image_files, io_workers=DEFAULT_IO_WORKERS,
+                             prefetch=DEFAULT_PREFETCH, hash_inputs=False, fast_decode=True,
+                             timer=None, target_size=(IMG_HEIGHT, IMG_WIDTH)):
+    """
+    Decodifica e redimensiona imagens em paralelo, à frente do consumidor
+    
+    Um pool de threads executa `preprocess_inference_image` enquanto o modelo
+    processa o lote anterior (cv2 libera o GIL na decodificação e no resize).
+    No máximo `prefetch` imagens ficam em voo ao mesmo tempo, então a memória
+    é limitada independentemente do tamanho do diretório. A ordem de saída é
+    a mesma de `image_files`.
+    
+    Args:
+        input_dir: Diretório com imagens de entrada
+        image_files: Lista ordenada de nomes de arquivos
+        io_workers: Número de threads de decodificação
+        prefetch: Número máximo de imagens pré-carregadas
+        hash_inputs: Se True, calcula também o SHA-256 de cada arquivo
+        fast_decode: Se True, decodifica JPEGs grandes em resolução reduzida
+        timer: StageTimer opcional (etapas 'hash', 'decode' e 'preprocess')
+        target_size: (altura, largura) da entrada do modelo
+    
+    Yields:
+        tuple: (nome do arquivo, imagem pré-processada, imagem original
+            redimensionada, hash do conteúdo ou None, exceção ou None)
+    """
+    def load(filename):
+        image_path = os.path.join(input_dir, filename)
+        try:
+            content_hash = None
+            if hash_inputs:
+                if timer is None:
+                    content_hash = hash_file(image_path)
+                else:
+                    with timer.time('hash'):
+                        content_hash = hash_file(image_path)
+            processed_img, resized_original_img = preprocess_inference_image(
+                image_path, target_size[0], target_size[1], fast_decode, timer
+            )
+            return filename, processed_img, resized_original_img, content_hash, None
+        except Exception as e:
+            return filename, None, None, None, e
+    
+    files_iter = iter(image_files)
+    with ThreadPoolExecutor(max_workers=io_workers) as executor:
+        pending = deque(
+            executor.submit(load, filename)
+            for filename in itertools.islice(files_iter, prefetch)
+        )
+        while pending:
+            result = pending.popleft().result()
+            # Repõe a fila antes de entregar o resultado ao consumidor
+            next_file = next(files_iter, None)
+            if next_file is not None:
+                pending.append(executor.submit(load, next_file))
+            yield result
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """
+    Calcula o SHA-256 do conteúdo de um arquivo
+    
+    Args:
+        path: Caminho do arquivo
+        chunk_size: Tamanho dos blocos lidos
+    
+    Returns:
+        str: Hash em hexadecimal
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CropManifest:
+    """
+    Manifesto das saídas geradas, usado para retomar e tornar incrementais as execuções
+    
+    Cada linha de `manifest.jsonl` registra, para uma imagem de entrada, o hash
+    do conteúdo, o hash do modelo, o threshold, o modo de decodificação
+    (reduzida ou completa), os caminhos de saída (relativos ao diretório de
+    saída) e a cobertura. As linhas são acrescentadas assim que
+    as saídas de uma imagem são gravadas, então uma execução interrompida pode
+    ser retomada; a última linha de cada arquivo prevalece. Tamanho e mtime são
+    guardados para evitar recalcular o hash de arquivos que não mudaram.
+    """
+    
+    def __init__(self, output_dir, model_hash, threshold, fast_decode=True):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_FILENAME)
+        self.model_hash = model_hash
+        self.threshold = threshold
+        self.fast_decode = fast_decode
+        self.entries = self._load()
+        self._file = open(self.path, 'a', encoding='utf-8')
+    
+    def _load(self):
+        entries = {}
+        if not os.path.exists(self.path):
+            return entries
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    entries[entry['file']] = entry
+                except (ValueError, KeyError, TypeError):
+                    # Linha truncada por uma execução interrompida
+                    continue
+        return entries
+    
+    def is_up_to_date(self, filename, image_path):
+        """
+        Verifica se as saídas registradas para a imagem continuam válidas
+        
+        Args:
+            filename: Nome do arquivo de entrada
+            image_path: Caminho completo do arquivo de entrada
+        
+        Returns:
+            bool: True se a imagem pode ser pulada
+        """
+        entry = self.entries.get(filename)
+        if entry is None:
+            return False
+        if entry.get('model_sha256') != self.model_hash or entry.get('threshold') != self.threshold:
+            return False
+        # Decodificações reduzida e completa geram recortes ligeiramente diferentes
+        if entry.get('fast_decode') != self.fast_decode:
+            return False
+        
+        stat = os.stat(image_path)
+        if entry.get('size') != stat.st_size or entry.get('mtime_ns') != stat.st_mtime_ns:
+            # Arquivo tocado: só é considerado igual se o conteúdo não mudou
+            if entry.get('sha256') != hash_file(image_path):
+                return False
+            entry['size'] = stat.st_size
+            entry['mtime_ns'] = stat.st_mtime_ns
+        
+        return all(
+            os.path.isfile(os.path.join(self.output_dir, entry[key]))
+            for key in ('mask', 'crop')
+        )
+    
+    def record(self, filename, image_path, content_hash, mask_save_path, overlay_save_path, coverage):
+        """Registra as saídas de uma imagem processada com sucesso"""
+        stat = os.stat(image_path)
+        entry = {
+            'file': filename,
+            'sha256': content_hash,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'model_sha256': self.model_hash,
+            'threshold': self.threshold,
+            'fast_decode': self.fast_decode,
+            'mask': os.path.relpath(mask_save_path, self.output_dir),
+            'crop': os.path.relpath(overlay_save_path, self.output_dir),
+            'coverage': round(float(coverage), 4),
+        }
+        self.entries[filename] = entry
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._file.flush()
+    
+    def close(self):
+        """Compacta o manifesto (uma linha por imagem) de forma atômica"""
+        self._file.close()
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for filename in sorted(self.entries):
+                f.write(json.dumps(self.entries[filename], ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+def postprocess_prediction(predicted_mask_raw, filename, threshold, verbose=True,
+                           output_mode='probabilities'):
+    """
+    Binariza a predição de uma imagem e calcula a cobertura da máscara
+    
+    Args:
+        predicted_mask_raw: Saída do modelo para uma imagem ([H, W, 1] ou [H, W])
+        filename: Nome do arquivo (usado apenas no log)
+        threshold: Threshold para binarização da máscara
+        verbose: Se False, não imprime o log por imagem
+        output_mode: 'mask' para modelos que já devolvem a máscara 0/1
+            (threshold embutido no grafo; `threshold` é ignorado)
+    
+    Returns:
+        tuple: (máscara binária uint8 [H, W], porcentagem de cobertura)
+    """
+    # Remove dimensão extra se necessário (pode ser [256, 256, 1] ou [256, 256])
+    if len(predicted_mask_raw.shape) == 3:
+        if predicted_mask_raw.shape[2] == 1:
+            predicted_mask_raw = predicted_mask_raw[:, :, 0]
+    
+    if output_mode == 'mask':
+        binary_mask = predicted_mask_raw.astype(np.uint8, copy=False)
+        coverage_percentage = (np.count_nonzero(binary_mask) / binary_mask.size) * 100
+        if verbose:
+            print(f"\n   - Processando '{filename}': cobertura {coverage_percentage:.2f}% (máscara do modelo)")
+        return binary_mask, coverage_percentage
+    
+    # Estatísticas da predição
+    pred_max = np.max(predicted_mask_raw)
+    pred_min = np.min(predicted_mask_raw)
+    pred_mean = np.mean(predicted_mask_raw)
+    
+    if verbose:
+        print(f"\n   - Processando '{filename}':")
+        print(f"     Valor Máximo da Predição: {pred_max:.4f}")
+        print(f"     Valor Mínimo da Predição: {pred_min:.4f}")
+        print(f"     Valor Médio da Predição: {pred_mean:.4f}")
+    
+    # Threshold adaptativo: se o valor máximo for muito baixo (< 0.1),
+    # usa uma porcentagem do valor máximo como threshold
+    if pred_max < 0.1:
+        adaptive_threshold = pred_max * 0.3  # 30% do valor máximo
+        if verbose:
+            print(f"     -> Usando threshold adaptativo: {adaptive_threshold:.6f} (30% do máximo)")
+        actual_threshold = adaptive_threshold
+    else:
+        actual_threshold = threshold
+    
+    # Binariza a máscara usando o threshold (fixo ou adaptativo)
+    binary_mask = (predicted_mask_raw > actual_threshold).astype(np.uint8)
+    
+    # Verifica cobertura
+    coverage_percentage = (np.sum(binary_mask) / binary_mask.size) * 100
+    
+    if verbose and coverage_percentage < MIN_COVERAGE_PERCENTAGE:
+        print(f"     -> AVISO: Cobertura muito baixa ({coverage_percentage:.2f}%)")
+        print(f"        Nenhuma mucosa foi segmentada em '{filename}'.")
+    elif verbose:
+        print(f"     -> Cobertura: {coverage_percentage:.2f}%")
+    
+    return binary_mask, coverage_percentage
+
+
+def write_image_file(path, image, fsync=False):
+    """
+    Codifica uma imagem no formato indicado pela extensão e grava em disco
+    
+    Args:
+        path: Caminho de saída
+        image: Imagem no formato do OpenCV (BGR ou escala de cinza)
+        fsync: Se True, força a gravação física do arquivo antes de retornar
+    """
+    ok, encoded = cv2.imencode(os.path.splitext(path)[1], image)
+    if not ok:
+        raise IOError(f"Não foi possível codificar a imagem: {path}")
+    
+    with open(path, 'wb') as f:
+        f.write(encoded.tobytes())
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def save_segmentation_outputs(binary_mask, resized_original_img, mask_save_path, overlay_save_path,
+                              fsync=False):
+    """
+    Salva a máscara binária e o recorte correspondente
+    
+    Args:
+        binary_mask: Máscara binária uint8 [H, W] (valores 0/1)
+        resized_original_img: Imagem RGB redimensionada para o tamanho do modelo
+        mask_save_path: Caminho de saída da máscara
+        overlay_save_path: Caminho de saída do recorte
+        fsync: Se True, força a gravação física de cada arquivo
+    """
+    # Salva a máscara binária
+    write_image_file(mask_save_path, binary_mask * 255, fsync)
+    
+    # Gera o recorte aplicando a máscara na imagem original
+    # Aplica a máscara na imagem redimensionada
+    overlay_img = cv2.bitwise_and(
+        resized_original_img,
+        resized_original_img,
+        mask=binary_mask
+    )
+    
+    # Salva o recorte (converte RGB para BGR para OpenCV)
+    write_image_file(overlay_save_path, cv2.cvtColor(overlay_img, cv2.COLOR_RGB2BGR), fsync)
+
+
+def _fsync_path(path):
+    """Força a gravação física de um arquivo já escrito"""
+    # No Windows, os.fsync exige um descritor aberto para escrita
+    fd = os.open(path, os.O_RDWR if sys.platform == 'win32' else os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class AsyncOutputWriter:
+    """
+    Grava máscaras e recortes em segundo plano (write-behind)
+    
+    A codificação JPEG/PNG e a escrita em disco rodam em um pool de threads,
+    fora do caminho crítico da inferência. O número de gravações pendentes é
+    limitado por `max_pending`: quando a fila enche, `submit` bloqueia até uma
+    gravação terminar. Os resultados são devolvidos em ordem de submissão por
+    `drain`, para que as falhas entrem no contador do loop principal.
+    
+    Por padrão os arquivos não são sincronizados um a um: `close` força a
+    gravação física de todos eles (e dos diretórios) ao final. Com
+    `fsync_each=True`, cada arquivo é sincronizado assim que é gravado.
+    """
+    
+    def __init__(self, workers=DEFAULT_WRITE_WORKERS, max_pending=DEFAULT_WRITE_QUEUE, timer=None,
+                 fsync_each=False):
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pending = deque()
+        self._directories = set()
+        self._written = []
+        self._timer = timer
+        self._fsync_each = fsync_each
+    
+    def _save(self, binary_mask, resized_original_img, mask_save_path, overlay_save_path):
+        if self._timer is None:
+            save_segmentation_outputs(binary_mask, resized_original_img, mask_save_path,
+                                      overlay_save_path, self._fsync_each)
+        else:
+            with self._timer.time('write'):
+                save_segmentation_outputs(binary_mask, resized_original_img, mask_save_path,
+                                          overlay_save_path, self._fsync_each)
+        if not self._fsync_each:
+            # Sincronizados em close()
+            self._written.extend((mask_save_path, overlay_save_path))
+    
+    def submit(self, filename, binary_mask, resized_original_img, mask_save_path, overlay_save_path):
+        """Agenda a gravação das saídas de uma imagem"""
+        if self._timer is None:
+            self._slots.acquire()
+        else:
+            # Tempo em que o loop principal ficou bloqueado pela fila cheia
+            with self._timer.time('write_wait'):
+                self._slots.acquire()
+        try:
+            future = self._executor.submit(
+                self._save,
+                binary_mask, resized_original_img, mask_save_path, overlay_save_path,
+            )
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        self._pending.append((filename, future))
+        self._directories.add(os.path.dirname(mask_save_path))
+        self._directories.add(os.path.dirname(overlay_save_path))
+    
+    def drain(self, wait=False):
+        """
+        Coleta as gravações concluídas, na ordem em que foram submetidas
+        
+        Args:
+            wait: Se True, aguarda todas as gravações pendentes
+        
+        Returns:
+            list: Pares (nome do arquivo, exceção ou None)
+        """
+        results = []
+        while self._pending and (wait or self._pending[0][1].done()):
+            filename, future = self._pending.popleft()
+            results.append((filename, future.exception()))
+        return results
+    
+    def close(self):
+        """
+        Aguarda todas as gravações, sincroniza os arquivos e diretórios de saída e encerra o pool
+        
+        Returns:
+            list: Pares (nome do arquivo, exceção ou None) ainda não coletados
+        """
+        results = self.drain(wait=True)
+        # Uma única passada de fsync no pool, fora do caminho da inferência
+        list(self._executor.map(_fsync_path, self._written))
+        self._written = []
+        self._executor.shutdown(wait=True)
+        
+        # Garante que as entradas de diretório dos novos arquivos estejam em disco
+        if sys.platform != 'win32':
+            for directory in self._directories:
+                fd = os.open(directory or '.', os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+        return results
+
+
+def segment_files(model_inference, input_dir, image_files, results_masks_path,
+                  results_overlays_path, threshold=SEGMENTATION_THRESHOLD,
+                  batch_size=DEFAULT_BATCH_SIZE, prefetch=DEFAULT_PREFETCH,
+                  io_workers=DEFAULT_IO_WORKERS, write_workers=DEFAULT_WRITE_WORKERS,
+                  write_queue=DEFAULT_WRITE_QUEUE, hash_inputs=False, on_success=None,
+                  fast_decode=True, timer=None, fsync_each=False):
+    """
+    Segmenta uma lista de imagens com um modelo já carregado e grava as saídas
+    
+    As imagens são pré-processadas no tamanho de entrada do modelo (256x256
+    no modelo padrão) e agrupadas em lotes de até `batch_size` tensores; cada lote passa pelo modelo em uma única chamada e as
+    saídas são separadas novamente para binarização e gravação por imagem.
+    A decodificação roda em um pool de threads (`iter_preprocessed_images`),
+    sobrepondo-se à inferência, e a gravação das saídas é feita em segundo
+    plano por `AsyncOutputWriter`.
+    
+    Args:
+        model_inference: Modelo com `predict_on_batch` (Keras ou TFLiteSegmentationModel)
+        input_dir: Diretório com imagens de entrada
+        image_files: Lista ordenada de nomes de arquivos a processar
+        results_masks_path: Diretório de saída das máscaras
+        results_overlays_path: Diretório de saída dos recortes
+        threshold: Threshold para binarização da máscara
+        batch_size: Número de imagens por chamada ao modelo
+        prefetch: Número máximo de imagens decodificadas à frente do modelo
+        io_workers: Número de threads de decodificação
+        write_workers: Threads de gravação (0 grava de forma síncrona)
+        write_queue: Número máximo de gravações pendentes
+        hash_inputs: Se True, calcula o SHA-256 de cada imagem (para o manifesto)
+        on_success: Função chamada como `on_success(filename, content_hash,
+            mask_save_path, overlay_save_path, coverage)` quando as saídas de
+            uma imagem terminam de ser gravadas
+        fast_decode: Se True, decodifica JPEGs grandes em resolução reduzida
+        timer: StageTimer opcional; quando None, nenhuma medição é feita
+        fsync_each: Se True, sincroniza cada arquivo assim que é gravado (por
+            padrão, a gravação em segundo plano sincroniza todos ao final)
+    
+    Returns:
+        tuple: (número de sucessos, número de falhas)
+    """
+    successful = 0
+    failed = 0
+    
+    writer = (
+        AsyncOutputWriter(write_workers, write_queue, timer, fsync_each)
+        if write_workers > 0 else None
+    )
+    # Dados para o manifesto das imagens com gravação pendente
+    pending_records = {}
+    
+    def finish_output(filename, error):
+        """Registra o resultado da gravação de uma imagem; retorna True em caso de sucesso"""
+        record = pending_records.pop(filename, None)
+        if error is not None:
+            print(f"   - ERRO CRÍTICO ao gravar '{filename}': {error}")
+            return False
+        if on_success is not None and record is not None:
+            on_success(filename, *record)
+        return True
+    
+    preprocessed_images = iter_preprocessed_images(
+        input_dir, image_files, io_workers, prefetch,
+        hash_inputs=hash_inputs, fast_decode=fast_decode, timer=timer,
+        target_size=model_input_size(model_inference),
+    )
+    while True:
+        if timer is None:
+            batch_items = list(itertools.islice(preprocessed_images, batch_size))
+        else:
+            # Tempo em que o modelo ficou esperando a decodificação
+            with timer.time('input_wait'):
+                batch_items = list(itertools.islice(preprocessed_images, batch_size))
+        if not batch_items:
+            break
+        
+        # Separa as imagens válidas do lote (falhas de leitura contam por arquivo)
+        batch_names = []
+        batch_inputs = []
+        batch_originals = []
+        batch_hashes = []
+        for filename, processed_img, resized_original_img, content_hash, error in batch_items:
+            if error is not None:
+                print(f"   - ERRO CRÍTICO ao processar '{filename}': {error}")
+                failed += 1
+                continue
+            batch_names.append(filename)
+            batch_inputs.append(select_model_input(model_inference, processed_img, resized_original_img))
+            batch_originals.append(resized_original_img)
+            batch_hashes.append(content_hash)
+        
+        if not batch_names:
+            continue
+        
+        # Faz a predição do lote inteiro em uma única passada
+        try:
+            if timer is not None:
+                inference_start = time.perf_counter()
+            predicted_masks_raw = np.asarray(
+                model_inference.predict_on_batch(np.stack(batch_inputs, axis=0))
+            )
+            if timer is not None:
+                timer.record('inference', time.perf_counter() - inference_start, len(batch_names))
+        except Exception as e:
+            for filename in batch_names:
+                print(f"   - ERRO CRÍTICO ao processar '{filename}': {e}")
+            failed += len(batch_names)
+            continue
+        
+        for filename, predicted_mask_raw, resized_original_img, content_hash in zip(
+            batch_names, predicted_masks_raw, batch_originals, batch_hashes
+        ):
+            try:
+                if timer is not None:
+                    threshold_start = time.perf_counter()
+                binary_mask, coverage_percentage = postprocess_prediction(
+                    predicted_mask_raw, filename, threshold,
+                    output_mode=model_output_mode(model_inference)
+                )
+                if timer is not None:
+                    timer.record('threshold', time.perf_counter() - threshold_start)
+                
+                output_paths = (
+                    os.path.join(results_masks_path, f"mascara_{filename}"),
+                    os.path.join(results_overlays_path, f"recorte_{filename}"),
+                )
+                pending_records[filename] = (content_hash, *output_paths, coverage_percentage)
+                if writer is not None:
+                    # Sucesso/falha é contabilizado quando a gravação terminar
+                    writer.submit(filename, binary_mask, resized_original_img, *output_paths)
+                    continue
+                
+                if timer is None:
+                    save_segmentation_outputs(binary_mask, resized_original_img, *output_paths,
+                                              fsync_each)
+                else:
+                    with timer.time('write'):
+                        save_segmentation_outputs(binary_mask, resized_original_img, *output_paths,
+                                                  fsync_each)
+                finish_output(filename, None)
+                successful += 1
+                
+            except Exception as e:
+                pending_records.pop(filename, None)
+                print(f"   - ERRO CRÍTICO ao processar '{filename}': {e}")
+                failed += 1
+        
+        if writer is not None:
+            for filename, error in writer.drain():
+                if finish_output(filename, error):
+                    successful += 1
+                else:
+                    failed += 1
+    
+    if writer is not None:
+        for filename, error in writer.close():
+            if finish_output(filename, error):
+                successful += 1
+            else:
+                failed += 1
+    
+    return successful, failed
+
+
+# Estado de cada processo do pool (--workers): modelo carregado uma única vez
+_shard_worker_state = {}
+
+
+def _init_shard_worker(model_path, backend, num_threads, segment_kwargs, collect_timings=False):
+    """Inicializa um processo do pool carregando o modelo com seu orçamento de threads"""
+    _shard_worker_state['model'] = load_segmentation_model(model_path, backend, num_threads, require_mask=True)
+    _shard_worker_state['segment_kwargs'] = segment_kwargs
+    _shard_worker_state['collect_timings'] = collect_timings
+
+
+def _process_shard(image_files):
+    """
+    Processa uma fatia de imagens dentro de um processo do pool
+    
+    Returns:
+        tuple: (sucessos, falhas, registros para o manifesto na ordem da fatia,
+            amostras de tempo exportadas ou None)
+    """
+    records = []
+    timer = StageTimer() if _shard_worker_state['collect_timings'] else None
+    successful, failed = segment_files(
+        _shard_worker_state['model'],
+        image_files=image_files,
+        on_success=lambda *record: records.append(record),
+        timer=timer,
+        **_shard_worker_state['segment_kwargs'],
+    )
+    return successful, failed, records, timer.export() if timer is not None else None
+
+
+def process_images(model_path, input_dir, output_dir, threshold=SEGMENTATION_THRESHOLD,
+                   batch_size=DEFAULT_BATCH_SIZE, prefetch=DEFAULT_PREFETCH,
+                   io_workers=DEFAULT_IO_WORKERS, backend='keras', num_threads=None,
+                   write_workers=DEFAULT_WRITE_WORKERS, write_queue=DEFAULT_WRITE_QUEUE,
+                   use_manifest=True, force=False, workers=1, fast_decode=True,
+                   perf_report=None, fsync_each=False):
     """
     Processa imagens usando o modelo de segmentação
     
+    O trabalho por lote é feito por `segment_files`. Com o manifesto
+    habilitado, imagens cujo conteúdo, modelo e threshold não mudaram desde a
+    última execução são puladas, então reexecuções processam apenas fotos
+    novas ou alteradas. Com `workers > 1`, a lista ordenada de imagens é
+    dividida em fatias contíguas distribuídas entre processos, cada um com o
+    modelo carregado uma vez; os resultados são combinados na ordem das
+    fatias, então o manifesto e os nomes de saída são determinísticos.
+    
     Args:
-        model_path: Caminho para o arquivo .keras
+        model_path: Caminho para o arquivo .keras ou .tflite
         input_dir: Diretório com imagens de entrada
         output_dir: Diretório base para salvar resultados
         threshold: Threshold para binarização da máscara
+        batch_size: Número de imagens por chamada ao modelo
+        prefetch: Número máximo de imagens decodificadas à frente do modelo
+        io_workers: Número de threads de decodificação
+        backend: 'keras' ou 'tflite'
+        num_threads: Número de threads de inferência por processo (None usa o
+            padrão do runtime, ou os núcleos divididos entre os processos)
+        write_workers: Threads de gravação (0 grava de forma síncrona)
+        write_queue: Número máximo de gravações pendentes
+        use_manifest: Se True, mantém o manifesto no diretório de saída
+        force: Se True, reprocessa todas as imagens mesmo sem alterações
+        workers: Número de processos de inferência
+        fast_decode: Se True, decodifica JPEGs grandes em resolução reduzida
+        perf_report: Caminho opcional de um relatório JSON com o tempo de cada
+            etapa (decode, preprocess, inference, threshold, write...),
+            percentis p50/p95/p99 e imagens/s. Sem ele, nada é medido.
+        fsync_each: Se True, sincroniza cada máscara/recorte assim que é
+            gravado, em vez de uma única vez ao final
     """
+    run_start = time.perf_counter()
+    timer = StageTimer() if perf_report else None
+    
     # Cria diretórios de saída
     results_masks_path = os.path.join(output_dir, 'masks')
     results_overlays_path = os.path.join(output_dir, 'crops')
@@ -75,122 +971,172 @@ def process_images(model_path, input_dir, output_dir, threshold=SEGMENTATION_THR
     os.makedirs(results_overlays_path, exist_ok=True)
     
     # --- Carregar o Modelo de Segmentação ---
-    print(f"Carregando modelo treinado de: {model_path}")
-    try:
-        # Para inferência, podemos usar compile=False
-        model_inference = tf.keras.models.load_model(model_path, compile=False)
-        print("Modelo de inferência carregado com sucesso.")
-        print(f"   Input shape: {model_inference.input_shape}")
-        print(f"   Output shape: {model_inference.output_shape}")
-    except Exception as e:
-        print(f"ERRO CRÍTICO ao carregar o modelo: {e}")
-        return
+    # Com vários processos, cada um carrega o seu modelo no inicializador do pool
+    model_inference = None
+    if workers <= 1:
+        print(f"Carregando modelo treinado de: {model_path} (backend: {backend})")
+        try:
+            load_start = time.perf_counter()
+            model_inference = load_segmentation_model(model_path, backend, num_threads, require_mask=True)
+            if timer is not None:
+                timer.record('model_load', time.perf_counter() - load_start)
+            print("Modelo de inferência carregado com sucesso.")
+            print(f"   Input shape: {model_inference.input_shape}")
+            print(f"   Output shape: {model_inference.output_shape}")
+        except Exception as e:
+            print(f"ERRO CRÍTICO ao carregar o modelo: {e}")
+            return
+    elif backend == 'tflite':
+        # Os processos do pool carregam e validam o próprio modelo; um
+        # interpretador TFLite é barato e evita abrir o pool para um modelo
+        # sem saída por pixel
+        try:
+            require_mask_output(TFLiteSegmentationModel(model_path), model_path)
+        except Exception as e:
+            print(f"ERRO CRÍTICO ao carregar o modelo: {e}")
+            return
     
     # --- Processamento em Lote das Imagens ---
-    image_extensions = ('.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif')
-    image_files = sorted([
-        f for f in os.listdir(input_dir)
-        if f.lower().endswith(image_extensions)
-        and os.path.isfile(os.path.join(input_dir, f))
-    ])
+    image_files = list_image_files(input_dir)
     
     if not image_files:
         print(f"AVISO: Nenhuma imagem encontrada no diretório: {input_dir}")
         return
     
-    print(f"\nIniciando predição para {len(image_files)} imagens...")
+    # --- Execução Incremental (Manifesto) ---
+    manifest = None
+    skipped = 0
+    files_to_process = image_files
+    if use_manifest:
+        manifest = CropManifest(output_dir, hash_file(model_path), threshold, fast_decode)
+        if not force:
+            files_to_process = [
+                f for f in image_files
+                if not manifest.is_up_to_date(f, os.path.join(input_dir, f))
+            ]
+            skipped = len(image_files) - len(files_to_process)
+            if skipped:
+                print(f"\n{skipped} imagens sem alterações desde a última execução serão puladas.")
+    
+    print(f"\nIniciando predição para {len(files_to_process)} imagens...")
     print(f"Threshold de segmentação: {threshold}")
-    print(f"Tamanho de entrada do modelo: {IMG_WIDTH}x{IMG_HEIGHT}")
+    if model_inference is not None:
+        input_height, input_width = model_input_size(model_inference)
+        print(f"Tamanho de entrada do modelo: {input_width}x{input_height}")
+    print(f"Tamanho do lote: {batch_size}")
+    print(f"Pré-carregamento: {prefetch} imagens ({io_workers} threads de leitura)")
+    print(f"Decodificação: {'reduzida (JPEG)' if fast_decode else 'completa'}")
     
-    successful = 0
-    failed = 0
+    def record_success(filename, content_hash, mask_save_path, overlay_save_path, coverage):
+        if manifest is not None:
+            manifest.record(
+                filename, os.path.join(input_dir, filename), content_hash,
+                mask_save_path, overlay_save_path, coverage,
+            )
     
-    for filename in image_files:
-        image_path = os.path.join(input_dir, filename)
+    segment_kwargs = dict(
+        input_dir=input_dir,
+        results_masks_path=results_masks_path,
+        results_overlays_path=results_overlays_path,
+        threshold=threshold,
+        batch_size=batch_size,
+        prefetch=prefetch,
+        io_workers=io_workers,
+        write_workers=write_workers,
+        write_queue=write_queue,
+        hash_inputs=manifest is not None,
+        fast_decode=fast_decode,
+        fsync_each=fsync_each,
+    )
+    
+    if workers <= 1:
+        successful, failed = segment_files(
+            model_inference, image_files=files_to_process, on_success=record_success,
+            timer=timer, **segment_kwargs,
+        )
+    else:
+        worker_threads = num_threads or max(1, (os.cpu_count() or 1) // workers)
+        shard_size = batch_size * SHARD_BATCHES
+        shards = [
+            files_to_process[i:i + shard_size]
+            for i in range(0, len(files_to_process), shard_size)
+        ]
+        print(f"Processos de inferência: {workers} ({worker_threads} threads cada, {len(shards)} fatias)")
+        
+        successful = 0
+        failed = 0
+        done_files = 0
         try:
-            # Pré-processa a imagem
-            processed_img, resized_original_img = preprocess_inference_image(
-                image_path, IMG_HEIGHT, IMG_WIDTH
-            )
-            
-            # Faz a predição
-            predicted_mask_raw = model_inference.predict(
-                np.expand_dims(processed_img, axis=0),
-                verbose=0
-            )[0]
-            
-            # Remove dimensão extra se necessário (pode ser [256, 256, 1] ou [256, 256])
-            if len(predicted_mask_raw.shape) == 3:
-                if predicted_mask_raw.shape[2] == 1:
-                    predicted_mask_raw = predicted_mask_raw[:, :, 0]
-            
-            # Estatísticas da predição
-            pred_max = np.max(predicted_mask_raw)
-            pred_min = np.min(predicted_mask_raw)
-            pred_mean = np.mean(predicted_mask_raw)
-            
-            print(f"\n   - Processando '{filename}':")
-            print(f"     Valor Máximo da Predição: {pred_max:.4f}")
-            print(f"     Valor Mínimo da Predição: {pred_min:.4f}")
-            print(f"     Valor Médio da Predição: {pred_mean:.4f}")
-            
-            # Threshold adaptativo: se o valor máximo for muito baixo (< 0.1),
-            # usa uma porcentagem do valor máximo como threshold
-            if pred_max < 0.1:
-                adaptive_threshold = pred_max * 0.3  # 30% do valor máximo
-                print(f"     -> Usando threshold adaptativo: {adaptive_threshold:.6f} (30% do máximo)")
-                actual_threshold = adaptive_threshold
-            else:
-                actual_threshold = threshold
-            
-            # Binariza a máscara usando o threshold (fixo ou adaptativo)
-            binary_mask = (predicted_mask_raw > actual_threshold).astype(np.uint8)
-            
-            # Verifica cobertura
-            coverage_percentage = (np.sum(binary_mask) / binary_mask.size) * 100
-            
-            if coverage_percentage < MIN_COVERAGE_PERCENTAGE:
-                print(f"     -> AVISO: Cobertura muito baixa ({coverage_percentage:.2f}%)")
-                print(f"        Nenhuma mucosa foi segmentada em '{filename}'.")
-            else:
-                print(f"     -> Cobertura: {coverage_percentage:.2f}%")
-            
-            # Salva a máscara binária
-            mask_save_path = os.path.join(results_masks_path, f"mascara_{filename}")
-            cv2.imwrite(mask_save_path, binary_mask * 255)
-            
-            # Gera o recorte aplicando a máscara na imagem original
-            # Aplica a máscara na imagem redimensionada
-            overlay_img = cv2.bitwise_and(
-                resized_original_img,
-                resized_original_img,
-                mask=binary_mask
-            )
-            
-            # Salva o recorte (converte RGB para BGR para OpenCV)
-            overlay_save_path = os.path.join(results_overlays_path, f"recorte_{filename}")
-            cv2.imwrite(overlay_save_path, cv2.cvtColor(overlay_img, cv2.COLOR_RGB2BGR))
-            
-            successful += 1
-            
+            # 'spawn' evita herdar o estado do runtime do TensorFlow via fork
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_shard_worker,
+                initargs=(model_path, backend, worker_threads, segment_kwargs, timer is not None),
+            ) as executor:
+                # map() devolve as fatias na ordem de envio
+                for shard, (shard_successful, shard_failed, records, timings) in zip(
+                    shards, executor.map(_process_shard, shards)
+                ):
+                    successful += shard_successful
+                    failed += shard_failed
+                    if timer is not None and timings is not None:
+                        timer.merge(timings)
+                    done_files += len(shard)
+                    for record in records:
+                        record_success(*record)
         except Exception as e:
-            print(f"   - ERRO CRÍTICO ao processar '{filename}': {e}")
-            failed += 1
+            # Ex.: falha ao carregar o modelo em um processo (BrokenProcessPool)
+            remaining = len(files_to_process) - done_files
+            print(f"ERRO CRÍTICO no pool de processos: {e}")
+            failed += remaining
+    
+    if manifest is not None:
+        manifest.close()
     
     print("\n" + "=" * 60)
     print("Análise de imagens concluída!")
     print(f"   Sucesso: {successful}")
     print(f"   Falhas: {failed}")
+    if manifest is not None:
+        print(f"   Puladas (sem alterações): {skipped}")
     print(f"   Total: {len(image_files)}")
     print(f"\nVerifique os resultados em:")
     print(f"   - Máscaras: {results_masks_path}")
     print(f"   - Recortes: {results_overlays_path}")
+    
+    if timer is not None:
+        report = timer.write_report(
+            perf_report,
+            wall_time_s=time.perf_counter() - run_start,
+            images=successful + failed,
+            extra={
+                'successful': successful,
+                'failed': failed,
+                'skipped': skipped,
+                'config': {
+                    'model': model_path,
+                    'backend': backend,
+                    'batch_size': batch_size,
+                    'prefetch': prefetch,
+                    'io_workers': io_workers,
+                    'write_workers': write_workers,
+                    'workers': workers,
+                    'num_threads': num_threads,
+                    'fast_decode': fast_decode,
+                },
+            },
+        )
+        print(f"\nRelatório de performance: {perf_report}")
+        print(f"   Imagens/s: {report['images_per_sec']:.2f}")
+        for stage, stats in report['stages'].items():
+            print(f"   {stage:<12} total {stats['total_s']:8.2f}s  p50 {stats.get('p50_ms', 0):8.2f}ms  p95 {stats.get('p95_ms', 0):8.2f}ms")
     print("=" * 60)
 
 
 def main():
     parser = argparse.ArgumentParser(
-        description='Gera recortes de imagens usando segmentação com modelo Keras',
+        description='Gera recortes de imagens usando segmentação com modelo Keras ou TFLite',
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
 Exemplos:
@@ -202,6 +1148,24 @@ Exemplos:
   
   # Ajustando threshold
   python generate_segmentation_crops.py --model melhor_modelo_unet_metricas_completas.keras --input assets/images/examples --threshold 0.5
+  
+  # Inferência em lotes maiores (mais throughput em CPU)
+  python generate_segmentation_crops.py --model melhor_modelo_unet_metricas_completas.keras --input assets/images/examples --batch-size 32
+  
+  # Mais threads de leitura e fila de pré-carregamento maior
+  python generate_segmentation_crops.py --model melhor_modelo_unet_metricas_completas.keras --input assets/images/examples --io-workers 8 --prefetch 64
+  
+  # Usando o mesmo modelo .tflite do aplicativo (interpretador TFLite/XNNPACK)
+  python generate_segmentation_crops.py --model assets/model.tflite --backend tflite --num-threads 4 --input assets/images/examples
+  
+  # Reexecuções processam apenas fotos novas/alteradas; --force reprocessa tudo
+  python generate_segmentation_crops.py --model melhor_modelo_unet_metricas_completas.keras --input assets/images/examples --force
+  
+  # Vários processos de inferência (ex.: 8 processos x 4 threads em 32 núcleos)
+  python generate_segmentation_crops.py --model assets/model.tflite --input assets/images/examples --workers 8 --num-threads 4
+  
+  # Relatório de performance por etapa (decode, inferência, gravação...)
+  python generate_segmentation_crops.py --model assets/model.tflite --input assets/images/examples --perf-report results/perf.json
         """
     )
     
@@ -209,7 +1173,7 @@ Exemplos:
         '--model', '-m',
         type=str,
         required=True,
-        help='Caminho para o arquivo .keras do modelo'
+        help='Caminho para o arquivo .keras ou .tflite do modelo'
     )
     
     parser.add_argument(
@@ -233,6 +1197,95 @@ Exemplos:
         help=f'Threshold para binarização da máscara (padrão: {SEGMENTATION_THRESHOLD})'
     )
     
+    parser.add_argument(
+        '--batch-size', '-b',
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f'Número de imagens por passada do modelo (padrão: {DEFAULT_BATCH_SIZE})'
+    )
+    
+    parser.add_argument(
+        '--prefetch',
+        type=int,
+        default=DEFAULT_PREFETCH,
+        help=f'Número máximo de imagens decodificadas à frente do modelo (padrão: {DEFAULT_PREFETCH})'
+    )
+    
+    parser.add_argument(
+        '--io-workers',
+        type=int,
+        default=DEFAULT_IO_WORKERS,
+        help=f'Threads de leitura/redimensionamento das imagens (padrão: {DEFAULT_IO_WORKERS})'
+    )
+    
+    parser.add_argument(
+        '--backend',
+        type=str,
+        choices=BACKENDS,
+        default=None,
+        help='Backend de inferência (padrão: detectado pela extensão do modelo)'
+    )
+    
+    parser.add_argument(
+        '--num-threads',
+        type=int,
+        default=None,
+        help='Threads de inferência do modelo (padrão: definido pelo runtime)'
+    )
+    
+    parser.add_argument(
+        '--write-workers',
+        type=int,
+        default=DEFAULT_WRITE_WORKERS,
+        help=f'Threads de codificação/gravação das saídas, 0 para gravar de forma síncrona (padrão: {DEFAULT_WRITE_WORKERS})'
+    )
+    
+    parser.add_argument(
+        '--write-queue',
+        type=int,
+        default=DEFAULT_WRITE_QUEUE,
+        help=f'Número máximo de gravações pendentes (padrão: {DEFAULT_WRITE_QUEUE})'
+    )
+    
+    parser.add_argument(
+        '--fsync-each',
+        action='store_true',
+        help='Força a gravação física de cada máscara/recorte assim que é gravado '
+             '(mais lento; por padrão os arquivos são sincronizados uma vez ao final)'
+    )
+    
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help=f'Reprocessa todas as imagens, ignorando o {MANIFEST_FILENAME} do diretório de saída'
+    )
+    
+    parser.add_argument(
+        '--no-manifest',
+        action='store_true',
+        help=f'Não lê nem atualiza o {MANIFEST_FILENAME} (processa tudo, sem registro)'
+    )
+    
+    parser.add_argument(
+        '--workers', '-w',
+        type=int,
+        default=1,
+        help='Processos de inferência, cada um com o modelo carregado (padrão: 1)'
+    )
+    
+    parser.add_argument(
+        '--full-decode',
+        action='store_true',
+        help='Decodifica os JPEGs em resolução completa (padrão: resolução reduzida pela IDCT)'
+    )
+    
+    parser.add_argument(
+        '--perf-report',
+        type=str,
+        default=None,
+        help='Grava um relatório JSON com tempo por etapa, p50/p95/p99 e imagens/s'
+    )
+    
     args = parser.parse_args()
     
     # Validações
@@ -252,8 +1305,53 @@ Exemplos:
         print(f"ERRO: Threshold deve estar entre 0.0 e 1.0 (recebido: {args.threshold})")
         sys.exit(1)
     
+    if args.batch_size < 1:
+        print(f"ERRO: Tamanho do lote deve ser maior que zero (recebido: {args.batch_size})")
+        sys.exit(1)
+    
+    if args.prefetch < 1:
+        print(f"ERRO: Prefetch deve ser maior que zero (recebido: {args.prefetch})")
+        sys.exit(1)
+    
+    if args.io_workers < 1:
+        print(f"ERRO: Número de threads de leitura deve ser maior que zero (recebido: {args.io_workers})")
+        sys.exit(1)
+    
+    if args.num_threads is not None and args.num_threads < 1:
+        print(f"ERRO: Número de threads de inferência deve ser maior que zero (recebido: {args.num_threads})")
+        sys.exit(1)
+    
+    if args.write_workers < 0:
+        print(f"ERRO: Número de threads de gravação não pode ser negativo (recebido: {args.write_workers})")
+        sys.exit(1)
+    
+    if args.write_queue < 1:
+        print(f"ERRO: Fila de gravação deve ser maior que zero (recebido: {args.write_queue})")
+        sys.exit(1)
+    
+    if args.workers < 1:
+        print(f"ERRO: Número de processos deve ser maior que zero (recebido: {args.workers})")
+        sys.exit(1)
+    
+    backend = resolve_backend(args.model, args.backend)
+    
     # Processa as imagens
-    process_images(args.model, args.input, args.output, args.threshold)
+    process_images(
+        args.model, args.input, args.output, args.threshold,
+        batch_size=args.batch_size,
+        prefetch=args.prefetch,
+        io_workers=args.io_workers,
+        backend=backend,
+        num_threads=args.num_threads,
+        write_workers=args.write_workers,
+        write_queue=args.write_queue,
+        use_manifest=not args.no_manifest,
+        force=args.force,
+        workers=args.workers,
+        fast_decode=not args.full_decode,
+        perf_report=args.perf_report,
+        fsync_each=args.fsync_each,
+    )
 
 
 if __name__ == '__main__':
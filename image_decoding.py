@@ -0,0 +1,379 @@
+"""
+Decodificação rápida de imagens para inferência em resolução reduzida
+
+Fotos de campo (ex.: 4032x2268 de celular) são decodificadas por inteiro pelo
+cv2.imread apenas para serem reduzidas a 256x256 logo em seguida. Para JPEG, o
+decodificador consegue aplicar a redução já na IDCT (1/2, 1/4 ou 1/8), o que
+corta o tempo de decodificação e a memória por imagem. Este módulo lê as
+dimensões direto do cabeçalho (sem decodificar) e escolhe o maior fator de
+redução que ainda mantém a imagem maior que a entrada do modelo.
+
+Uso (verificação de paridade com a decodificação completa):
+    python image_decoding.py --input assets/images/examples
+    python image_decoding.py --input assets/images/examples --model assets/model.tflite
+"""
+
+import argparse
+import io
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+import cv2
+
+# Configurar encoding UTF-8 para Windows
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Marcadores SOF (Start Of Frame) do JPEG; C4, C8 e CC não são quadros
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+# Fatores de redução suportados pelo decodificador JPEG do OpenCV (maior primeiro)
+REDUCED_COLOR_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+def read_image_size(image_path):
+    """
+    Lê formato e dimensões de uma imagem JPEG ou PNG apenas pelo cabeçalho
+
+    Args:
+        image_path: Caminho para a imagem
+
+    Returns:
+        tuple: ('jpeg' | 'png', altura, largura), ou None se o formato não for
+            reconhecido ou o cabeçalho estiver incompleto
+    """
+    with open(image_path, 'rb') as f:
+        return read_image_size_from_stream(f)
+
+
+def read_image_size_from_stream(f):
+    """
+    Mesmo que `read_image_size`, a partir de um arquivo binário já aberto
+
+    Args:
+        f: Objeto binário com `read` e `seek` (arquivo ou io.BytesIO)
+
+    Returns:
+        tuple: ('jpeg' | 'png', altura, largura), ou None
+    """
+    head = f.read(24)
+
+    if head[:8] == PNG_SIGNATURE and head[12:16] == b'IHDR':
+        width, height = struct.unpack('>II', head[16:24])
+        return 'png', height, width
+
+    if head[:2] != b'\xff\xd8':
+        return None
+
+    # Percorre os segmentos do JPEG até o primeiro SOF
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        while byte and byte != b'\xff':
+            byte = f.read(1)
+        while byte == b'\xff':
+            byte = f.read(1)
+        if not byte:
+            return None
+
+        marker = byte[0]
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            # Marcadores sem segmento de dados
+            continue
+        if marker == 0xD9:
+            return None
+
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack('>H', length_bytes)[0]
+
+        if marker in JPEG_SOF_MARKERS:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            _, height, width = struct.unpack('>BHH', frame)
+            return 'jpeg', height, width
+
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def read_jpeg_orientation_from_stream(f):
+    """
+    Lê a orientação EXIF (tag 0x0112) de um JPEG sem decodificar a imagem
+
+    Args:
+        f: Objeto binário com `read` e `seek`, posicionado em qualquer ponto
+
+    Returns:
+        int: Orientação EXIF (1 a 8); 1 se ausente ou ilegível
+    """
+    f.seek(0)
+    if f.read(2) != b'\xff\xd8':
+        return 1
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF or marker[1] in (0xD9, 0xDA):
+            # Fim da imagem ou início dos dados comprimidos: sem EXIF
+            return 1
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return 1
+        length = struct.unpack('>H', length_bytes)[0]
+        if marker[1] != 0xE1:
+            f.seek(length - 2, os.SEEK_CUR)
+            continue
+
+        segment = f.read(length - 2)
+        if segment[:6] != b'Exif\x00\x00':
+            continue
+        tiff = segment[6:]
+        endian = {b'II': '<', b'MM': '>'}.get(tiff[:2])
+        if endian is None or len(tiff) < 8:
+            return 1
+        ifd_offset = struct.unpack(endian + 'I', tiff[4:8])[0]
+        if ifd_offset + 2 > len(tiff):
+            return 1
+        count = struct.unpack(endian + 'H', tiff[ifd_offset:ifd_offset + 2])[0]
+        for i in range(count):
+            entry = ifd_offset + 2 + 12 * i
+            if entry + 12 > len(tiff):
+                return 1
+            tag = struct.unpack(endian + 'H', tiff[entry:entry + 2])[0]
+            if tag == 0x0112:
+                orientation = struct.unpack(endian + 'H', tiff[entry + 8:entry + 10])[0]
+                return orientation if 1 <= orientation <= 8 else 1
+        return 1
+
+
+def read_display_size(image_path):
+    """
+    Dimensões da imagem como o cv2.imread as devolve, apenas pelo cabeçalho
+
+    O cv2.imread aplica a orientação EXIF dos JPEGs: orientações 5 a 8 (rotação
+    de 90 graus) trocam altura e largura em relação ao quadro gravado.
+
+    Returns:
+        tuple: (altura, largura), ou None se o formato não for reconhecido
+    """
+    with open(image_path, 'rb') as f:
+        header = read_image_size_from_stream(f)
+        if header is None:
+            return None
+        kind, height, width = header
+        if kind == 'jpeg' and read_jpeg_orientation_from_stream(f) >= 5:
+            return width, height
+    return height, width
+
+
+def choose_reduction_factor(height, width, target_height, target_width):
+    """
+    Escolhe o maior fator de redução da IDCT que ainda excede a entrada do modelo
+
+    A comparação usa o menor lado da imagem contra o maior lado do alvo, então
+    o resultado não depende da orientação EXIF aplicada na decodificação.
+
+    Args:
+        height: Altura da imagem original
+        width: Largura da imagem original
+        target_height: Altura de entrada do modelo
+        target_width: Largura de entrada do modelo
+
+    Returns:
+        int: Fator de redução (1, 2, 4 ou 8)
+    """
+    short_side = min(height, width)
+    target = max(target_height, target_width)
+    for factor, _ in REDUCED_COLOR_FLAGS:
+        if short_side // factor >= target:
+            return factor
+    return 1
+
+
+def imread_for_model(image_path, target_height, target_width, fast_decode=True):
+    """
+    Decodifica uma imagem (BGR) na menor resolução útil para o redimensionamento final
+
+    Para JPEGs maiores que a entrada do modelo, usa `cv2.IMREAD_REDUCED_COLOR_N`;
+    demais formatos (ou `fast_decode=False`) usam a decodificação completa.
+
+    Args:
+        image_path: Caminho para a imagem
+        target_height: Altura de entrada do modelo
+        target_width: Largura de entrada do modelo
+        fast_decode: Se False, sempre decodifica em resolução completa
+
+    Returns:
+        np.ndarray: Imagem BGR, ou None se não puder ser lida
+    """
+    flag = cv2.IMREAD_COLOR
+    if fast_decode:
+        header = read_image_size(image_path)
+        if header is not None and header[0] == 'jpeg':
+            factor = choose_reduction_factor(header[1], header[2], target_height, target_width)
+            flag = dict(REDUCED_COLOR_FLAGS).get(factor, cv2.IMREAD_COLOR)
+    return cv2.imread(image_path, flag)
+
+
+def imdecode_for_model(data, target_height, target_width, fast_decode=True):
+    """
+    Equivalente a `imread_for_model` para uma imagem já em memória (ex.: corpo HTTP)
+
+    Args:
+        data: Bytes do arquivo JPEG/PNG
+        target_height: Altura de entrada do modelo
+        target_width: Largura de entrada do modelo
+        fast_decode: Se False, sempre decodifica em resolução completa
+
+    Returns:
+        np.ndarray: Imagem BGR, ou None se não puder ser decodificada
+    """
+    flag = cv2.IMREAD_COLOR
+    if fast_decode:
+        header = read_image_size_from_stream(io.BytesIO(data))
+        if header is not None and header[0] == 'jpeg':
+            factor = choose_reduction_factor(header[1], header[2], target_height, target_width)
+            flag = dict(REDUCED_COLOR_FLAGS).get(factor, cv2.IMREAD_COLOR)
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flag)
+
+
+def check_decode_parity(input_dir, target_height=256, target_width=256, limit=None,
+                        model_path=None, threshold=0.3):
+    """
+    Compara a decodificação reduzida com a completa após o redimensionamento final
+
+    Para cada imagem, mede o tempo de decodificação dos dois caminhos, a
+    diferença absoluta média/máxima e o PSNR das imagens 256x256 resultantes.
+    Se um modelo for informado, compara também as máscaras binarizadas (IoU).
+
+    Args:
+        input_dir: Diretório com imagens
+        target_height: Altura de entrada do modelo
+        target_width: Largura de entrada do modelo
+        limit: Número máximo de imagens (None = todas)
+        model_path: Modelo .keras/.tflite opcional para comparar as máscaras
+        threshold: Threshold de binarização das máscaras
+
+    Returns:
+        dict: Estatísticas agregadas
+    """
+    image_extensions = ('.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif')
+    image_files = sorted(
+        f for f in os.listdir(input_dir)
+        if f.lower().endswith(image_extensions) and os.path.isfile(os.path.join(input_dir, f))
+    )
+    if limit:
+        image_files = image_files[:limit]
+
+    model = None
+    if model_path:
+        # Import tardio: generate_segmentation_crops importa este módulo
+        from generate_segmentation_crops import (
+            load_segmentation_model, prepare_model_input, resolve_backend, select_model_input,
+        )
+        model = load_segmentation_model(model_path, resolve_backend(model_path))
+
+    full_times, fast_times, mean_diffs, max_diffs, psnrs, ious = [], [], [], [], [], []
+    print(f"{'Imagem':<32} {'Fator':>5} {'Completa(ms)':>12} {'Rápida(ms)':>10} {'Dif.média':>9} {'PSNR':>7}" + (" IoU" if model else ""))
+    for filename in image_files:
+        image_path = os.path.join(input_dir, filename)
+
+        start = time.perf_counter()
+        full = cv2.imread(image_path, cv2.IMREAD_COLOR)
+        full_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        fast = imread_for_model(image_path, target_height, target_width)
+        fast_time = time.perf_counter() - start
+
+        if full is None or fast is None:
+            print(f"{filename:<32} [AVISO] não foi possível ler a imagem")
+            continue
+
+        factor = full.shape[0] // fast.shape[0]
+        full_resized = cv2.resize(full, (target_width, target_height))
+        fast_resized = cv2.resize(fast, (target_width, target_height))
+
+        diff = np.abs(full_resized.astype(np.float32) - fast_resized.astype(np.float32))
+        mse = float(np.mean(diff ** 2))
+        psnr = float('inf') if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+
+        full_times.append(full_time)
+        fast_times.append(fast_time)
+        mean_diffs.append(float(diff.mean()))
+        max_diffs.append(float(diff.max()))
+        psnrs.append(psnr)
+
+        line = (f"{filename[:32]:<32} {factor:>5} {full_time * 1000:>12.1f} {fast_time * 1000:>10.1f}"
+                f" {diff.mean():>9.3f} {psnr:>7.2f}")
+
+        if model is not None:
+            # Mesma entrada de segment_files (uint8 para pré-processamento embutido)
+            batch = np.stack([
+                select_model_input(model, *prepare_model_input(img, target_height, target_width))
+                for img in (full_resized, fast_resized)
+            ])
+            masks = np.asarray(model.predict_on_batch(batch)) > threshold
+            union = np.logical_or(masks[0], masks[1]).sum()
+            iou = 1.0 if union == 0 else float(np.logical_and(masks[0], masks[1]).sum() / union)
+            ious.append(iou)
+            line += f" {iou:.4f}"
+        print(line)
+
+    if not full_times:
+        print("AVISO: Nenhuma imagem comparada.")
+        return {}
+
+    summary = {
+        'images': len(full_times),
+        'full_decode_ms_mean': 1000 * float(np.mean(full_times)),
+        'fast_decode_ms_mean': 1000 * float(np.mean(fast_times)),
+        'speedup': float(np.sum(full_times) / max(np.sum(fast_times), 1e-9)),
+        'mean_abs_diff': float(np.mean(mean_diffs)),
+        'max_abs_diff': float(np.max(max_diffs)),
+        'psnr_min': float(np.min(psnrs)),
+    }
+    if ious:
+        summary['mask_iou_mean'] = float(np.mean(ious))
+        summary['mask_iou_min'] = float(np.min(ious))
+
+    print("\n" + "=" * 60)
+    print("Paridade da decodificação reduzida:")
+    for key, value in summary.items():
+        print(f"   {key}: {value:.4f}" if isinstance(value, float) else f"   {key}: {value}")
+    print("=" * 60)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Verifica a paridade entre a decodificação JPEG reduzida e a completa',
+    )
+    parser.add_argument('--input', '-i', type=str, required=True, help='Diretório com imagens')
+    parser.add_argument('--size', type=int, default=256, help='Lado da entrada do modelo (padrão: 256)')
+    parser.add_argument('--limit', type=int, default=None, help='Número máximo de imagens')
+    parser.add_argument('--model', '-m', type=str, default=None,
+                        help='Modelo .keras/.tflite opcional para comparar as máscaras (IoU)')
+    parser.add_argument('--threshold', '-t', type=float, default=0.3,
+                        help='Threshold de binarização das máscaras (padrão: 0.3)')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.input):
+        print(f"ERRO: Diretório de entrada não encontrado: {args.input}")
+        sys.exit(1)
+
+    check_decode_parity(args.input, args.size, args.size, args.limit, args.model, args.threshold)
+
+
+if __name__ == '__main__':
+    main()
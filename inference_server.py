@@ -0,0 +1,422 @@
+"""
+Servidor HTTP local de inferência com micro-batching dinâmico
+
+Permite que os notebooks de campo enviem fotos para uma máquina compartilhada
+em vez de rodar os scripts manualmente. Cada requisição é decodificada na
+thread da conexão e entra em uma fila; uma única thread de inferência junta as
+requisições que chegam em até `--max-delay-ms` da primeira (ou até
+`--max-batch-size`) e executa uma única passada do modelo para o lote.
+
+Endpoints:
+    POST /segment   corpo = bytes da imagem (JPEG/PNG); ?mask=1 inclui a máscara PNG em base64
+    POST /classify  segmentação + classificação FAMACHA (requer --cls-model)
+    GET  /health    estado do servidor
+    GET  /stats     contadores e distribuição do tamanho dos lotes
+
+Uso:
+    python inference_server.py --model assets/model.tflite
+    python inference_server.py --model melhor_modelo_unet_metricas_completas.keras --cls-model anemia_model_final.keras --port 8000
+    curl --data-binary @foto.jpg http://127.0.0.1:8000/segment
+"""
+
+import argparse
+import base64
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import cv2
+
+from generate_segmentation_crops import (
+    BACKENDS,
+    MIN_COVERAGE_PERCENTAGE,
+    SEGMENTATION_THRESHOLD,
+    load_segmentation_model,
+    model_output_mode,
+    model_input_size,
+    postprocess_prediction,
+    prepare_model_input,
+    resolve_backend,
+    select_model_input,
+)
+from image_decoding import imdecode_for_model
+from perf_report import latency_summary
+from segment_and_classify import crops_to_classifier_batch, model_class_names
+
+# Configurar encoding UTF-8 para Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8000
+DEFAULT_MAX_BATCH_SIZE = 16
+DEFAULT_MAX_DELAY_MS = 5.0
+DEFAULT_REQUEST_TIMEOUT = 60.0
+MAX_BODY_BYTES = 32 * 1024 * 1024
+
+
+def padded_batch_size(n, max_batch_size):
+    """
+    Arredonda o tamanho do lote para a próxima potência de 2 (limitada ao máximo)
+
+    Com lotes de tamanho arbitrário o Keras retraça a função de predição e o
+    TFLite cria um interpretador por tamanho; com potências de 2 há no
+    máximo log2(max_batch_size) + 1 formatos distintos.
+    """
+    size = 1
+    while size < n:
+        size *= 2
+    return min(size, max(max_batch_size, n))
+
+
+def pad_batch(inputs, max_batch_size):
+    """Completa o lote com zeros até `padded_batch_size` entradas"""
+    n = len(inputs)
+    padded = padded_batch_size(n, max_batch_size)
+    if padded > n:
+        inputs = np.concatenate(
+            [inputs, np.zeros((padded - n, *inputs.shape[1:]), dtype=inputs.dtype)], axis=0
+        )
+    return inputs
+
+
+class _PendingRequest:
+    __slots__ = ('model_input', 'resized', 'classify', 'future', 'enqueued_at')
+
+    def __init__(self, model_input, resized, classify):
+        self.model_input = model_input
+        self.resized = resized
+        self.classify = classify
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    Agrupa requisições concorrentes em lotes para uma única thread de inferência
+
+    A thread bloqueia até chegar a primeira requisição e então continua
+    coletando até o lote encher ou até `max_delay_ms` desde essa primeira
+    requisição. Sob carga baixa a latência extra é no máximo `max_delay_ms`;
+    sob carga alta os lotes enchem antes do prazo.
+    """
+
+    def __init__(self, seg_model, cls_model=None, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 max_delay_ms=DEFAULT_MAX_DELAY_MS, threshold=SEGMENTATION_THRESHOLD):
+        self.seg_model = seg_model
+        self.cls_model = cls_model
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay_ms / 1000.0
+        self.threshold = threshold
+
+        if cls_model is not None:
+            _, self.cls_height, self.cls_width, _ = cls_model.input_shape
+            self.class_names = model_class_names(cls_model)
+
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = {}
+        self._queue_waits = []
+        self._inference_times = []
+        self._requests = 0
+        self._errors = 0
+
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, model_input, resized, classify=False):
+        """
+        Enfileira uma imagem pré-processada
+
+        Returns:
+            Future: Resolvido com o dicionário de resultado da imagem
+        """
+        request = _PendingRequest(model_input, resized, classify)
+        self._queue.put(request)
+        return request.future
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_delay
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                # Prazo vencido: ainda aproveita o que já está na fila
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except queue.Empty:
+                    break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            started = time.perf_counter()
+            try:
+                results = self._infer(batch)
+            except Exception as e:
+                with self._stats_lock:
+                    self._errors += len(batch)
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            elapsed = time.perf_counter() - started
+
+            with self._stats_lock:
+                self._requests += len(batch)
+                self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+                self._inference_times.append(elapsed)
+                self._queue_waits.extend(started - r.enqueued_at for r in batch)
+            for request, result in zip(batch, results):
+                result['batch_size'] = len(batch)
+                result['queue_ms'] = round((started - request.enqueued_at) * 1000, 3)
+                result['inference_ms'] = round(elapsed * 1000, 3)
+                request.future.set_result(result)
+
+    def _infer(self, batch):
+        n = len(batch)
+        inputs = pad_batch(np.stack([r.model_input for r in batch], axis=0), self.max_batch_size)
+        predicted_masks_raw = np.asarray(self.seg_model.predict_on_batch(inputs))[:n]
+
+        results, masks = [], []
+        for pred in predicted_masks_raw:
+            binary_mask, coverage = postprocess_prediction(
+                pred, '', self.threshold, verbose=False, output_mode=model_output_mode(self.seg_model)
+            )
+            masks.append(binary_mask)
+            results.append({
+                'coverage': round(float(coverage), 4),
+                'mucosa_detected': bool(coverage >= MIN_COVERAGE_PERCENTAGE),
+                'mask': binary_mask,
+            })
+
+        to_classify = [
+            i for i, r in enumerate(batch)
+            if r.classify and results[i]['mucosa_detected']
+        ]
+        if to_classify and self.cls_model is not None:
+            cls_batch = crops_to_classifier_batch(
+                [masks[i] for i in to_classify],
+                [batch[i].resized for i in to_classify],
+                self.cls_height, self.cls_width,
+            )
+            probabilities = np.asarray(
+                self.cls_model.predict_on_batch(pad_batch(cls_batch, self.max_batch_size))
+            )[:len(to_classify)]
+            for i, probs in zip(to_classify, probabilities):
+                class_index = int(np.argmax(probs))
+                results[i]['class'] = self.class_names[class_index]
+                results[i]['confidence'] = round(float(probs[class_index]), 6)
+                results[i]['probabilities'] = {
+                    name: round(float(p), 6) for name, p in zip(self.class_names, probs)
+                }
+        for i, request in enumerate(batch):
+            if request.classify and i not in to_classify:
+                # Sem mucosa segmentada não há o que classificar
+                results[i]['class'] = None
+        return results
+
+    def stats(self):
+        """
+        Returns:
+            dict: Contadores, histograma de tamanhos de lote e latências
+        """
+        with self._stats_lock:
+            batches = sum(self._batch_sizes.values())
+            return {
+                'requests': self._requests,
+                'errors': self._errors,
+                'batches': batches,
+                'mean_batch_size': self._requests / batches if batches else 0.0,
+                'batch_sizes': {str(k): v for k, v in sorted(self._batch_sizes.items())},
+                'queue_wait': latency_summary(self._queue_waits),
+                'inference': latency_summary(self._inference_times),
+                'queue_depth': self._queue.qsize(),
+            }
+
+
+def make_handler(batcher, fast_decode=True, request_timeout=DEFAULT_REQUEST_TIMEOUT):
+    """Cria a classe de handler HTTP ligada a um MicroBatcher"""
+    input_height, input_width = model_input_size(batcher.seg_model)
+
+    class InferenceHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            # Log por requisição distorce a medição de latência; erros são logados à parte
+            pass
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == '/health':
+                self._send_json(200, {
+                    'status': 'ok',
+                    'classifier': batcher.cls_model is not None,
+                    'max_batch_size': batcher.max_batch_size,
+                    'max_delay_ms': batcher.max_delay * 1000,
+                })
+            elif path == '/stats':
+                self._send_json(200, batcher.stats())
+            else:
+                self._send_json(404, {'error': f'Rota não encontrada: {path}'})
+
+        def do_POST(self):
+            started = time.perf_counter()
+            url = urlparse(self.path)
+            if url.path not in ('/segment', '/classify'):
+                self._send_json(404, {'error': f'Rota não encontrada: {url.path}'})
+                return
+            classify = url.path == '/classify'
+            if classify and batcher.cls_model is None:
+                self._send_json(400, {'error': 'Servidor iniciado sem --cls-model'})
+                return
+            include_mask = parse_qs(url.query).get('mask', ['0'])[0] in ('1', 'true')
+
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+            except ValueError:
+                self._send_json(400, {'error': 'Content-Length inválido'})
+                return
+            if length <= 0 or length > MAX_BODY_BYTES:
+                self._send_json(400, {'error': f'Corpo inválido ({length} bytes)'})
+                return
+            data = self.rfile.read(length)
+
+            img = imdecode_for_model(data, input_height, input_width, fast_decode)
+            if img is None:
+                self._send_json(400, {'error': 'Não foi possível decodificar a imagem'})
+                return
+            model_input, resized = prepare_model_input(img, input_height, input_width)
+            model_input = select_model_input(batcher.seg_model, model_input, resized)
+
+            try:
+                result = batcher.submit(model_input, resized, classify).result(request_timeout)
+            except Exception as e:
+                print(f"[ERRO] Falha na inferência: {e}")
+                self._send_json(500, {'error': str(e)})
+                return
+
+            mask = result.pop('mask')
+            if include_mask:
+                ok, encoded = cv2.imencode('.png', mask * 255)
+                result['mask_png_base64'] = base64.b64encode(encoded.tobytes()).decode('ascii') if ok else None
+            result['total_ms'] = round((time.perf_counter() - started) * 1000, 3)
+            self._send_json(200, result)
+
+    return InferenceHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Servidor HTTP local de segmentação/classificação com micro-batching',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Exemplos:
+  # Apenas segmentação, modelo TFLite do aplicativo
+  python inference_server.py --model assets/model.tflite
+
+  # Segmentação + classificação, lotes de até 32 imagens esperando no máximo 10 ms
+  python inference_server.py --model melhor_modelo_unet_metricas_completas.keras --cls-model anemia_model_final.keras --max-batch-size 32 --max-delay-ms 10
+
+  # Medir vazão e latência
+  python load_test.py --url http://127.0.0.1:8000/segment --input assets/images/examples
+        """
+    )
+    parser.add_argument('--model', '-m', type=str, required=True,
+                        help='Modelo de segmentação (.keras ou .tflite)')
+    parser.add_argument('--cls-model', type=str, default=None,
+                        help='Modelo de classificação FAMACHA opcional (habilita POST /classify)')
+    parser.add_argument('--host', type=str, default=DEFAULT_HOST,
+                        help=f'Endereço de escuta (padrão: {DEFAULT_HOST})')
+    parser.add_argument('--port', '-p', type=int, default=DEFAULT_PORT,
+                        help=f'Porta (padrão: {DEFAULT_PORT})')
+    parser.add_argument('--max-batch-size', type=int, default=DEFAULT_MAX_BATCH_SIZE,
+                        help=f'Tamanho máximo do lote (padrão: {DEFAULT_MAX_BATCH_SIZE})')
+    parser.add_argument('--max-delay-ms', type=float, default=DEFAULT_MAX_DELAY_MS,
+                        help=f'Espera máxima para completar um lote, em ms (padrão: {DEFAULT_MAX_DELAY_MS})')
+    parser.add_argument('--threshold', '-t', type=float, default=SEGMENTATION_THRESHOLD,
+                        help=f'Threshold para binarização da máscara (padrão: {SEGMENTATION_THRESHOLD})')
+    parser.add_argument('--backend', type=str, choices=BACKENDS, default=None,
+                        help='Backend da segmentação (padrão: pela extensão do modelo)')
+    parser.add_argument('--cls-backend', type=str, choices=BACKENDS, default=None,
+                        help='Backend do classificador (padrão: pela extensão do modelo)')
+    parser.add_argument('--num-threads', type=int, default=None,
+                        help='Threads de inferência (padrão: definido pelo runtime)')
+    parser.add_argument('--full-decode', action='store_true',
+                        help='Decodifica os JPEGs em resolução completa')
+    args = parser.parse_args()
+
+    for path in filter(None, (args.model, args.cls_model)):
+        if not os.path.exists(path):
+            print(f"ERRO: Arquivo do modelo não encontrado: {path}")
+            sys.exit(1)
+
+    if not (0.0 <= args.threshold <= 1.0):
+        print(f"ERRO: Threshold deve estar entre 0.0 e 1.0 (recebido: {args.threshold})")
+        sys.exit(1)
+
+    if args.max_batch_size < 1 or args.max_delay_ms < 0:
+        print("ERRO: --max-batch-size deve ser maior que zero e --max-delay-ms não pode ser negativo")
+        sys.exit(1)
+
+    print(f"Carregando modelo de segmentação: {args.model}")
+    try:
+        seg_model = load_segmentation_model(
+            args.model, resolve_backend(args.model, args.backend), args.num_threads, require_mask=True
+        )
+    except ValueError as e:
+        print(f"ERRO: {e}")
+        sys.exit(1)
+    cls_model = None
+    if args.cls_model:
+        print(f"Carregando classificador: {args.cls_model}")
+        cls_model = load_segmentation_model(
+            args.cls_model, resolve_backend(args.cls_model, args.cls_backend), args.num_threads
+        )
+
+    batcher = MicroBatcher(
+        seg_model, cls_model,
+        max_batch_size=args.max_batch_size,
+        max_delay_ms=args.max_delay_ms,
+        threshold=args.threshold,
+    )
+    server = ThreadingHTTPServer(
+        (args.host, args.port), make_handler(batcher, fast_decode=not args.full_decode)
+    )
+    server.daemon_threads = True
+
+    print(f"\nServidor ouvindo em http://{args.host}:{args.port}")
+    print(f"   Lote máximo: {args.max_batch_size} | espera máxima: {args.max_delay_ms} ms")
+    print("   Ctrl+C para encerrar")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nEncerrando servidor...")
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Importação tardia do TensorFlow e runtime TFLite leve
+
+`import tensorflow` leva alguns segundos e centenas de MB antes mesmo do
+`--help` ser impresso. Os scripts importam o TensorFlow apenas quando
+realmente precisam do Keras ou do conversor; para executar um `.tflite`,
+usam o interpretador de um pacote leve (`ai_edge_litert` ou `tflite_runtime`)
+quando instalado, e só recorrem ao `tf.lite.Interpreter` na falta dele.
+"""
+
+import importlib
+import sys
+
+# Pacotes com o interpretador TFLite, em ordem de preferência
+TFLITE_RUNTIME_MODULES = (
+    ('ai_edge_litert', 'ai_edge_litert.interpreter'),
+    ('tflite_runtime', 'tflite_runtime.interpreter'),
+)
+
+_tflite_interpreter = None
+
+
+def import_tensorflow():
+    """
+    Importa o TensorFlow sob demanda
+
+    Returns:
+        module: O módulo `tensorflow`
+    """
+    import tensorflow as tf
+    return tf
+
+
+def get_tflite_interpreter_class():
+    """
+    Escolhe a classe `Interpreter` do TFLite
+
+    Se o TensorFlow já foi importado pelo processo, usa `tf.lite.Interpreter`
+    (evita carregar dois runtimes); caso contrário, tenta os pacotes leves e
+    só então importa o TensorFlow.
+
+    Returns:
+        tuple: (classe Interpreter, nome do runtime)
+    """
+    global _tflite_interpreter
+    if _tflite_interpreter is not None:
+        return _tflite_interpreter
+
+    if 'tensorflow' not in sys.modules:
+        for name, module_name in TFLITE_RUNTIME_MODULES:
+            try:
+                module = importlib.import_module(module_name)
+            except ImportError:
+                continue
+            _tflite_interpreter = (module.Interpreter, name)
+            return _tflite_interpreter
+
+    _tflite_interpreter = (import_tensorflow().lite.Interpreter, 'tensorflow')
+    return _tflite_interpreter
+
+
+def create_tflite_interpreter(model_path, num_threads=None):
+    """
+    Cria um interpretador TFLite para o modelo (tensores ainda não alocados)
+
+    Args:
+        model_path: Caminho para o arquivo .tflite
+        num_threads: Número de threads de inferência (None usa o padrão do runtime)
+
+    Returns:
+        Interpreter: Instância do interpretador
+    """
+    interpreter_class, _ = get_tflite_interpreter_class()
+    return interpreter_class(model_path=model_path, num_threads=num_threads)
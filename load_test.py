@@ -0,0 +1,174 @@
+"""
+Gerador de carga para o servidor de inferência (inference_server.py)
+
+Envia as imagens de um diretório (carregadas uma vez em memória) com N
+clientes concorrentes e mede vazão e latência (p50/p95/p99) do lado do
+cliente. Vários níveis de concorrência podem ser medidos em sequência para
+comparar configurações de --max-batch-size e --max-delay-ms.
+
+Uso:
+    python load_test.py --url http://127.0.0.1:8000/segment --input assets/images/examples
+    python load_test.py --url http://127.0.0.1:8000/classify --input fotos --concurrency 1,4,16 --requests 400 --output carga.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from perf_report import latency_summary
+
+# Configurar encoding UTF-8 para Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+
+def post_image(url, data, timeout):
+    """
+    Envia uma imagem e retorna o JSON de resposta
+
+    Returns:
+        dict: Resposta do servidor
+    """
+    request = urllib.request.Request(
+        url, data=data, method='POST', headers={'Content-Type': 'application/octet-stream'}
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def run_load(url, payloads, concurrency, total_requests, warmup=0, timeout=60.0):
+    """
+    Executa uma rodada de carga com `concurrency` clientes em laço fechado
+
+    Args:
+        url: Endpoint (ex.: http://127.0.0.1:8000/segment)
+        payloads: Lista de bytes das imagens (usadas em rodízio)
+        concurrency: Número de clientes simultâneos
+        total_requests: Número de requisições medidas
+        warmup: Requisições iniciais descartadas da medição
+        timeout: Timeout por requisição (s)
+
+    Returns:
+        dict: Vazão, latência do cliente e tamanho médio dos lotes no servidor
+    """
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies, batch_sizes, errors = [], [], []
+
+    for i in range(warmup):
+        try:
+            post_image(url, payloads[i % len(payloads)], timeout)
+        except (urllib.error.URLError, OSError, ValueError):
+            pass
+
+    def client():
+        while True:
+            i = next(counter)
+            if i >= total_requests:
+                return
+            start = time.perf_counter()
+            try:
+                result = post_image(url, payloads[i % len(payloads)], timeout)
+            except (urllib.error.URLError, OSError, ValueError) as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                batch_sizes.append(result.get('batch_size', 1))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(client)
+    wall_time = time.perf_counter() - start
+
+    summary = latency_summary(latencies)
+    summary.update({
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'wall_time_s': wall_time,
+        'requests_per_sec': len(latencies) / wall_time if wall_time > 0 else 0.0,
+        'mean_batch_size': sum(batch_sizes) / len(batch_sizes) if batch_sizes else 0.0,
+    })
+    if errors:
+        summary['first_error'] = errors[0]
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Mede vazão e latência do servidor de inferência local',
+    )
+    parser.add_argument('--url', type=str, default='http://127.0.0.1:8000/segment',
+                        help='Endpoint a testar (padrão: http://127.0.0.1:8000/segment)')
+    parser.add_argument('--input', '-i', type=str, required=True,
+                        help='Diretório com imagens usadas como carga')
+    parser.add_argument('--concurrency', '-c', type=str, default='1,4,16',
+                        help='Níveis de concorrência separados por vírgula (padrão: 1,4,16)')
+    parser.add_argument('--requests', '-n', type=int, default=200,
+                        help='Requisições medidas por nível (padrão: 200)')
+    parser.add_argument('--warmup', type=int, default=5,
+                        help='Requisições de aquecimento por nível (padrão: 5)')
+    parser.add_argument('--timeout', type=float, default=60.0,
+                        help='Timeout por requisição em segundos (padrão: 60)')
+    parser.add_argument('--output', '-o', type=str, default=None,
+                        help='Arquivo JSON opcional com os resultados')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.input):
+        print(f"ERRO: Diretório de entrada não encontrado: {args.input}")
+        sys.exit(1)
+
+    try:
+        levels = [int(c) for c in args.concurrency.split(',') if c.strip()]
+    except ValueError:
+        print(f"ERRO: --concurrency inválido: {args.concurrency}")
+        sys.exit(1)
+    if not levels or min(levels) < 1 or args.requests < 1:
+        print("ERRO: --concurrency e --requests devem ser maiores que zero")
+        sys.exit(1)
+
+    # Listagem local: o gerador de carga não deve importar o TensorFlow
+    image_extensions = ('.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif')
+    payloads = []
+    for filename in sorted(os.listdir(args.input)):
+        if not filename.lower().endswith(image_extensions):
+            continue
+        with open(os.path.join(args.input, filename), 'rb') as f:
+            payloads.append(f.read())
+    if not payloads:
+        print(f"AVISO: Nenhuma imagem encontrada no diretório: {args.input}")
+        sys.exit(1)
+
+    print(f"Carga: {len(payloads)} imagens em rodízio -> {args.url}\n")
+    print(f"{'Clientes':>8} {'Req/s':>8} {'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9} {'Lote médio':>10} {'Erros':>6}")
+    results = []
+    for concurrency in levels:
+        result = run_load(args.url, payloads, concurrency, args.requests, args.warmup, args.timeout)
+        results.append(result)
+        print(f"{concurrency:>8} {result['requests_per_sec']:>8.2f} {result.get('p50_ms', 0):>9.1f}"
+              f" {result.get('p95_ms', 0):>9.1f} {result.get('p99_ms', 0):>9.1f}"
+              f" {result['mean_batch_size']:>10.2f} {result['errors']:>6}")
+        if result['errors']:
+            print(f"   [AVISO] Primeiro erro: {result['first_error']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'url': args.url, 'results': results}, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados salvos em: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
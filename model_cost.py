@@ -0,0 +1,282 @@
+"""
+Custo estático de modelos Keras: MACs/FLOPs, memória de parâmetros e de ativações
+
+Usado por analyze_model.py (--cost-report) para comparar arquiteturas (ex.:
+EfficientNetB0 vs B3, resoluções de entrada da U-Net) e prever se um tamanho
+de lote cabe na RAM, sem treinar nem executar o modelo:
+
+- MACs e FLOPs por camada (convoluções, densas e operações elemento a elemento);
+- bytes de parâmetros por dtype;
+- tamanho do tensor de saída de cada camada;
+- pico estimado de ativações vivas para um tamanho de lote, simulando a
+  execução em ordem topológica e liberando cada tensor após o último consumidor.
+
+Modelos aninhados (ex.: `base_model(inputs)` do classificador) são expandidos:
+suas camadas aparecem com o prefixo do modelo e o pico interno é somado às
+ativações externas vivas naquele ponto.
+"""
+
+import csv
+
+import numpy as np
+
+# Camadas sem custo aritmético relevante (apenas reinterpretam ou copiam dados)
+ZERO_COST_LAYERS = (
+    'InputLayer', 'Reshape', 'Flatten', 'Dropout', 'SpatialDropout2D', 'Permute',
+    'Concatenate', 'ZeroPadding2D', 'Cropping2D', 'Identity',
+)
+# Camadas elemento a elemento: FLOPs por elemento de saída
+ELEMENTWISE_FLOPS = {
+    'Activation': 1, 'ReLU': 1, 'LeakyReLU': 1, 'Softmax': 3,
+    'Add': 1, 'Subtract': 1, 'Multiply': 1, 'Average': 1, 'Maximum': 1, 'Minimum': 1,
+    'BatchNormalization': 2, 'LayerNormalization': 5, 'Rescaling': 2, 'Normalization': 2,
+}
+
+
+def _dtype_bytes(dtype):
+    name = getattr(dtype, 'name', dtype)
+    if name == 'bfloat16':
+        return 2
+    return np.dtype(str(name)).itemsize
+
+
+def _elements(shape, batch_size=1):
+    dims = [batch_size if d is None else int(d) for d in shape]
+    return int(np.prod(dims)) if dims else 1
+
+
+def _node_tensors(node):
+    inputs = list(getattr(node, 'input_tensors', None) or [])
+    outputs = getattr(node, 'outputs', None)
+    if outputs is None:
+        outputs = getattr(node, 'output_tensors', [])
+    if not isinstance(outputs, (list, tuple)):
+        outputs = [outputs]
+    return inputs, list(outputs)
+
+
+def _topological_nodes(model):
+    """
+    Nós do grafo do modelo em ordem de execução
+
+    Parte das saídas e volta pelas entradas (`_keras_history`), de modo que
+    apenas as chamadas que pertencem a este modelo são consideradas (camadas
+    de um Sequential, por exemplo, guardam nós de cada reconstrução).
+    """
+    input_ids = {id(t) for t in model.inputs}
+    order, visited = [], set()
+    stack = [(t, False) for t in reversed(model.outputs)]
+    while stack:
+        tensor, expanded = stack.pop()
+        if id(tensor) in input_ids:
+            continue
+        layer, node_index = tensor._keras_history[:2]
+        node = layer._inbound_nodes[node_index]
+        if expanded:
+            if id(node) not in visited:
+                visited.add(id(node))
+                order.append((layer, node))
+            continue
+        if id(node) in visited:
+            continue
+        stack.append((tensor, True))
+        inputs, _ = _node_tensors(node)
+        stack.extend((t, False) for t in reversed(inputs))
+    return order
+
+
+def layer_macs(layer, input_shapes, output_shape):
+    """
+    Estima MACs e FLOPs de uma chamada da camada, por imagem
+
+    Args:
+        layer: Camada Keras
+        input_shapes: Shapes das entradas (com batch)
+        output_shape: Shape da (primeira) saída (com batch)
+
+    Returns:
+        tuple: (MACs, FLOPs)
+    """
+    kind = type(layer).__name__
+    out_elems = _elements(output_shape[1:])
+    in_shape = input_shapes[0] if input_shapes else output_shape
+
+    if kind in ('Conv2D', 'Conv1D', 'Conv3D'):
+        kernel = int(np.prod(layer.kernel_size))
+        in_channels = int(in_shape[-1])
+        groups = getattr(layer, 'groups', 1) or 1
+        macs = out_elems * kernel * in_channels // groups
+        return macs, 2 * macs + (out_elems if layer.use_bias else 0)
+    if kind == 'DepthwiseConv2D':
+        macs = out_elems * int(np.prod(layer.kernel_size))
+        return macs, 2 * macs + (out_elems if layer.use_bias else 0)
+    if kind == 'SeparableConv2D':
+        in_channels = int(in_shape[-1])
+        spatial = _elements(output_shape[1:-1])
+        depthwise = spatial * in_channels * layer.depth_multiplier * int(np.prod(layer.kernel_size))
+        pointwise = out_elems * in_channels * layer.depth_multiplier
+        macs = depthwise + pointwise
+        return macs, 2 * macs + (out_elems if layer.use_bias else 0)
+    if kind in ('Conv2DTranspose', 'Conv1DTranspose', 'Conv3DTranspose'):
+        # Cada elemento de entrada espalha um kernel completo por canal de saída
+        macs = _elements(in_shape[1:]) * int(np.prod(layer.kernel_size)) * int(output_shape[-1])
+        return macs, 2 * macs + (out_elems if layer.use_bias else 0)
+    if kind == 'Dense':
+        macs = out_elems * int(in_shape[-1])
+        return macs, 2 * macs + (out_elems if layer.use_bias else 0)
+    if kind in ('MaxPooling2D', 'AveragePooling2D'):
+        flops = out_elems * int(np.prod(layer.pool_size))
+        return 0, flops
+    if kind.startswith('GlobalAveragePooling') or kind.startswith('GlobalMaxPooling'):
+        return 0, _elements(in_shape[1:])
+    if kind in ELEMENTWISE_FLOPS:
+        return 0, ELEMENTWISE_FLOPS[kind] * out_elems
+    if kind in ZERO_COST_LAYERS:
+        return 0, 0
+    # Demais camadas (ex.: UpSampling2D, Resizing): uma operação por elemento
+    return 0, out_elems
+
+
+def _is_model(layer):
+    return hasattr(layer, 'layers') and hasattr(layer, 'inputs') and bool(getattr(layer, 'layers', None))
+
+
+def _analyze_graph(model, batch_size, prefix, rows, params, seen_weights):
+    """Percorre um modelo funcional; devolve (pico de ativações vivas em bytes, camada do pico)"""
+    tensor_bytes = {}
+    consumers = {}
+    steps = []
+    for tensor in model.inputs:
+        tensor_bytes[id(tensor)] = _elements(tensor.shape, batch_size) * _dtype_bytes(tensor.dtype)
+
+    for layer, node in _topological_nodes(model):
+        inputs, outputs = _node_tensors(node)
+        for tensor in outputs:
+            tensor_bytes[id(tensor)] = _elements(tensor.shape, batch_size) * _dtype_bytes(tensor.dtype)
+        for tensor in inputs:
+            consumers[id(tensor)] = len(steps)
+        steps.append((layer, inputs, outputs))
+
+    output_ids = {id(t) for t in model.outputs}
+    live = {id(t) for t in model.inputs}
+    peak, peak_layer = sum(tensor_bytes[t] for t in live), f"{prefix}entrada"
+    for index, (layer, inputs, outputs) in enumerate(steps):
+        name = f"{prefix}{layer.name}"
+        output_ids_step = [id(t) for t in outputs]
+        if _is_model(layer):
+            inner_peak, inner_layer = _analyze_graph(layer, batch_size, f"{name}/", rows, params, seen_weights)
+            boundary = {id(t) for t in inputs} | set(output_ids_step)
+            current = sum(tensor_bytes[t] for t in live - boundary) + inner_peak
+            live.update(output_ids_step)
+            name = inner_layer
+        else:
+            live.update(output_ids_step)
+            current = sum(tensor_bytes[t] for t in live)
+            input_shapes = [tuple(t.shape) for t in inputs]
+            output_shape = tuple(outputs[0].shape)
+            macs, flops = layer_macs(layer, input_shapes, output_shape)
+            layer_params = 0
+            for weight in layer.weights:
+                if id(weight) in seen_weights:
+                    continue  # pesos compartilhados contam uma vez
+                seen_weights.add(id(weight))
+                count = _elements(weight.shape)
+                dtype = str(getattr(weight.dtype, 'name', weight.dtype))
+                params[dtype] = params.get(dtype, 0) + count * _dtype_bytes(weight.dtype)
+                layer_params += count
+            rows.append({
+                'layer': name,
+                'type': type(layer).__name__,
+                'output_shape': output_shape,
+                'macs': macs,
+                'flops': flops,
+                'params': layer_params,
+                'activation_bytes': sum(tensor_bytes[t] for t in output_ids_step),
+            })
+        if current > peak:
+            peak, peak_layer = current, name
+        # Libera os tensores cujo último consumidor foi esta camada
+        for tensor in inputs:
+            if consumers.get(id(tensor)) == index and id(tensor) not in output_ids:
+                live.discard(id(tensor))
+    return peak, peak_layer
+
+
+def analyze_model_cost(model, batch_size=1):
+    """
+    Calcula o custo estático de um modelo Keras funcional
+
+    Args:
+        model: Modelo Keras (funcional ou Sequential já construído)
+        batch_size: Lote usado no pico de ativações e nos tamanhos de tensor
+
+    Returns:
+        dict: 'layers' (uma linha por camada), 'params_bytes' por dtype,
+            totais de MACs/FLOPs por imagem, 'peak_activation_bytes' e
+            'peak_layer' (camada em execução no pico)
+    """
+    rows, params = [], {}
+    peak, peak_layer = _analyze_graph(model, batch_size, '', rows, params, set())
+    return {
+        'batch_size': batch_size,
+        'layers': rows,
+        'total_macs': sum(r['macs'] for r in rows),
+        'total_flops': sum(r['flops'] for r in rows),
+        'total_params': sum(r['params'] for r in rows),
+        'params_bytes': params,
+        'activation_bytes': sum(r['activation_bytes'] for r in rows),
+        'peak_activation_bytes': peak,
+        'peak_layer': peak_layer,
+    }
+
+
+def _mb(value):
+    return value / (1024 * 1024)
+
+
+def print_cost_report(report, top_k=20):
+    """Exibe o resultado de `analyze_model_cost`"""
+    layers = report['layers']
+    print(f"\n   {'Camada':<40} {'Tipo':<22} {'MMACs':>9} {'Params':>10} {'Ativ.(MB)':>10}")
+    for row in sorted(layers, key=lambda r: r['flops'], reverse=True)[:top_k]:
+        print(f"   {row['layer'][-40:]:<40} {row['type'][:22]:<22} {row['macs'] / 1e6:>9.1f} "
+              f"{row['params']:>10,} {_mb(row['activation_bytes']):>10.2f}")
+    if len(layers) > top_k:
+        print(f"   ... {len(layers) - top_k} camadas restantes (use --cost-csv para a lista completa)")
+
+    by_type = {}
+    for row in layers:
+        entry = by_type.setdefault(row['type'], [0, 0, 0])
+        entry[0] += 1
+        entry[1] += row['macs']
+        entry[2] += row['flops']
+    total_flops = report['total_flops'] or 1
+    print(f"\n   {'Tipo de camada':<28} {'Qtd':>5} {'GMACs':>8} {'% FLOPs':>8}")
+    for kind, (count, macs, flops) in sorted(by_type.items(), key=lambda i: -i[1][2]):
+        if flops == 0:
+            continue
+        print(f"   {kind:<28} {count:>5} {macs / 1e9:>8.3f} {flops / total_flops * 100:>7.1f}%")
+
+    params_bytes = sum(report['params_bytes'].values())
+    print(f"\n   Total por imagem: {report['total_macs'] / 1e9:.3f} GMACs, {report['total_flops'] / 1e9:.3f} GFLOPs")
+    print(f"   Parâmetros: {report['total_params']:,} ({_mb(params_bytes):.2f} MB: " + ", ".join(
+        f"{dtype} {_mb(size):.2f} MB" for dtype, size in sorted(report['params_bytes'].items())
+    ) + ")")
+    print(f"   Soma das saídas de todas as camadas (lote {report['batch_size']}): "
+          f"{_mb(report['activation_bytes']):.1f} MB")
+    print(f"   Pico de ativações vivas (lote {report['batch_size']}): "
+          f"{_mb(report['peak_activation_bytes']):.1f} MB (em {report['peak_layer']})")
+    print(f"   Estimativa de memória para inferência: "
+          f"{_mb(params_bytes + report['peak_activation_bytes']):.1f} MB (parâmetros + pico)")
+
+
+def write_cost_csv(report, path):
+    """Grava uma linha por camada de `analyze_model_cost` em CSV"""
+    columns = ['layer', 'type', 'output_shape', 'macs', 'flops', 'params', 'activation_bytes']
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        for row in report['layers']:
+            writer.writerow({**row, 'output_shape': 'x'.join(
+                'N' if d is None else str(d) for d in row['output_shape']
+            )})
@@ -0,0 +1,239 @@
+"""
+Registro de artefatos de conversão (.tflite) com cache e metadados embutidos
+
+Cada artefato é identificado pelo SHA-256 do modelo de origem mais as opções
+de conversão (variante, batch, pré-processamento embutido, calibração...).
+Repetir uma conversão já feita copia o .tflite do registro em vez de carregar
+o Keras e rodar o conversor de novo.
+
+Os metadados (tamanho de entrada, normalização, threshold, classes, hash de
+origem) são gravados dentro do próprio .tflite, na tabela `metadata` do
+flatbuffer (a mesma usada pelo conversor para `min_runtime_version`), que os
+interpretadores ignoram. `read_tflite_metadata` lê essa tabela em Python puro,
+sem TensorFlow nem Keras, para os consumidores se configurarem sozinhos.
+
+Estrutura do registro:
+    <registry_dir>/<chave>.tflite   artefato com metadados embutidos
+    <registry_dir>/index.json       chave -> origem, opções, metadados e data
+"""
+
+import json
+import hashlib
+import os
+import shutil
+import struct
+import time
+
+# Nome da entrada na tabela `metadata` do flatbuffer TFLite
+METADATA_NAME = 'famacha_metadata'
+# Versão do formato dos metadados (entra na chave do cache)
+METADATA_VERSION = 1
+DEFAULT_REGISTRY_DIR = 'tflite_registry'
+INDEX_FILENAME = 'index.json'
+
+# Campos das tabelas do schema TFLite (tensorflow/compiler/mlir/lite/schema/schema.fbs)
+_MODEL_BUFFERS_FIELD = 4
+_MODEL_METADATA_FIELD = 6
+_METADATA_NAME_FIELD = 0
+_METADATA_BUFFER_FIELD = 1
+_BUFFER_DATA_FIELD = 0
+_BUFFER_OFFSET_FIELD = 1
+_BUFFER_SIZE_FIELD = 2
+
+
+def artifact_key(source_hash, options):
+    """
+    Chave do artefato: hash do modelo de origem + opções de conversão
+
+    Args:
+        source_hash: SHA-256 do arquivo .keras de origem
+        options: dict serializável em JSON com as opções que alteram o .tflite
+
+    Returns:
+        str: 24 caracteres hexadecimais
+    """
+    payload = json.dumps(
+        {'source': source_hash, 'options': options, 'format': METADATA_VERSION},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:24]
+
+
+def embed_tflite_metadata(model_content, metadata):
+    """
+    Grava `metadata` (JSON) na tabela de metadados de um modelo TFLite
+
+    Substitui uma entrada METADATA_NAME existente. Requer TensorFlow (usa o
+    schema do flatbuffer distribuído com ele); a leitura não requer.
+
+    Args:
+        model_content: bytes do modelo .tflite
+        metadata: dict serializável em JSON
+
+    Returns:
+        bytes: Modelo com os metadados embutidos
+    """
+    from tensorflow.lite.python import schema_py_generated as schema_fb
+    from tensorflow.lite.tools import flatbuffer_utils
+
+    model = flatbuffer_utils.read_model_from_bytearray(bytearray(model_content))
+    data = json.dumps(metadata, sort_keys=True, ensure_ascii=False).encode('utf-8')
+
+    entries = [
+        entry for entry in (model.metadata or [])
+        if entry.name.decode('utf-8') != METADATA_NAME
+    ]
+    buffer = schema_fb.BufferT()
+    buffer.data = list(data)
+    model.buffers.append(buffer)
+    entry = schema_fb.MetadataT()
+    entry.name = METADATA_NAME
+    entry.buffer = len(model.buffers) - 1
+    entries.append(entry)
+    model.metadata = entries
+    return bytes(flatbuffer_utils.convert_object_to_bytearray(model))
+
+
+def _field_position(data, table, field):
+    """Posição absoluta do campo `field` de uma tabela flatbuffer (None se ausente)"""
+    vtable = table - struct.unpack_from('<i', data, table)[0]
+    vtable_size = struct.unpack_from('<H', data, vtable)[0]
+    entry = 4 + 2 * field
+    if entry >= vtable_size:
+        return None
+    offset = struct.unpack_from('<H', data, vtable + entry)[0]
+    return table + offset if offset else None
+
+
+def _indirect(data, position):
+    """Segue um offset relativo (uoffset_t) armazenado em `position`"""
+    return position + struct.unpack_from('<I', data, position)[0]
+
+
+def _vector(data, table, field):
+    """(início dos elementos, tamanho) de um campo vetor; (0, 0) se ausente"""
+    position = _field_position(data, table, field)
+    if position is None:
+        return 0, 0
+    vector = _indirect(data, position)
+    return vector + 4, struct.unpack_from('<I', data, vector)[0]
+
+
+def read_tflite_metadata(model, name=METADATA_NAME):
+    """
+    Lê os metadados embutidos por `embed_tflite_metadata`, em Python puro
+
+    Args:
+        model: Caminho do .tflite ou seus bytes
+        name: Nome da entrada na tabela de metadados
+
+    Returns:
+        dict ou None se o modelo não tem a entrada (ex.: convertido antes do
+        registro) ou não é um flatbuffer TFLite válido
+    """
+    if isinstance(model, (bytes, bytearray, memoryview)):
+        data = bytes(model)
+    else:
+        with open(model, 'rb') as f:
+            data = f.read()
+
+    try:
+        root = _indirect(data, 0)
+        metadata_start, metadata_count = _vector(data, root, _MODEL_METADATA_FIELD)
+        buffers_start, buffers_count = _vector(data, root, _MODEL_BUFFERS_FIELD)
+        for i in range(metadata_count):
+            entry = _indirect(data, metadata_start + 4 * i)
+            name_position = _field_position(data, entry, _METADATA_NAME_FIELD)
+            if name_position is None:
+                continue
+            string = _indirect(data, name_position)
+            length = struct.unpack_from('<I', data, string)[0]
+            if data[string + 4:string + 4 + length].decode('utf-8') != name:
+                continue
+
+            buffer_position = _field_position(data, entry, _METADATA_BUFFER_FIELD)
+            buffer_index = struct.unpack_from('<I', data, buffer_position)[0] if buffer_position else 0
+            if buffer_index >= buffers_count:
+                return None
+            buffer = _indirect(data, buffers_start + 4 * buffer_index)
+            start, size = _vector(data, buffer, _BUFFER_DATA_FIELD)
+            if not size:
+                # Modelos > 2 GB guardam os buffers após o flatbuffer (offset/size)
+                offset_position = _field_position(data, buffer, _BUFFER_OFFSET_FIELD)
+                size_position = _field_position(data, buffer, _BUFFER_SIZE_FIELD)
+                if offset_position is None or size_position is None:
+                    return None
+                start = struct.unpack_from('<Q', data, offset_position)[0]
+                size = struct.unpack_from('<Q', data, size_position)[0]
+            return json.loads(data[start:start + size].decode('utf-8'))
+    except (struct.error, UnicodeDecodeError, ValueError):
+        return None
+    return None
+
+
+class ArtifactRegistry:
+    """
+    Diretório de artefatos .tflite indexados por `artifact_key`
+
+    O índice é apenas informativo (listagem e auditoria): a busca verifica a
+    existência de `<chave>.tflite`, então apagar o diretório limpa o cache.
+    """
+
+    def __init__(self, registry_dir=DEFAULT_REGISTRY_DIR):
+        self.registry_dir = registry_dir
+        self.index_path = os.path.join(registry_dir, INDEX_FILENAME)
+
+    def artifact_path(self, key):
+        return os.path.join(self.registry_dir, f'{key}.tflite')
+
+    def load_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def lookup(self, key):
+        """Caminho do artefato em cache ou None"""
+        path = self.artifact_path(key)
+        return path if os.path.exists(path) else None
+
+    def store(self, key, model_content, source_path, options, metadata):
+        """
+        Grava o artefato (já com metadados embutidos) e atualiza o índice
+
+        Returns:
+            str: Caminho do artefato no registro
+        """
+        os.makedirs(self.registry_dir, exist_ok=True)
+        path = self.artifact_path(key)
+        # Grava em arquivo temporário e renomeia: uma conversão interrompida
+        # não deixa um artefato truncado com a chave válida
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(model_content)
+        os.replace(tmp_path, path)
+
+        index = self.load_index()
+        index[key] = {
+            'source': os.path.abspath(source_path),
+            'options': options,
+            'metadata': metadata,
+            'size_bytes': len(model_content),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        tmp_index = self.index_path + '.tmp'
+        with open(tmp_index, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=2, sort_keys=True, ensure_ascii=False)
+        os.replace(tmp_index, self.index_path)
+        return path
+
+    def export(self, key, output_path):
+        """Copia o artefato `key` para `output_path` (cria o diretório)"""
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        shutil.copyfile(self.artifact_path(key), output_path)
+        return output_path
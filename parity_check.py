@@ -0,0 +1,394 @@
+"""
+Verificação de paridade Keras <-> TFLite em um diretório inteiro de imagens
+
+Substitui as comparações com um único tensor aleatório que existiam em
+analyze_model.py, test_model_inference.py e convert_model.py. As imagens são
+decodificadas em paralelo (mesmo pipeline de generate_segmentation_crops.py),
+processadas em lotes pelos dois motores ao mesmo tempo (cada um na sua
+thread) e comparadas por imagem de forma vetorizada: diferença absoluta
+média/máxima, IoU e Dice das máscaras binarizadas (ou concordância do top-1
+para classificadores). As k piores imagens são listadas no final.
+
+Uso:
+    python parity_check.py --keras melhor_modelo_unet_metricas_completas.keras --tflite assets/model.tflite --input dataset/images
+    python parity_check.py --keras anemia_model_final.keras --tflite anemia_model_final.tflite --input recortes --output paridade.csv --worst 20
+"""
+
+import argparse
+import csv
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Configurar encoding UTF-8 para Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Threshold de binarização usado pelo app e por generate_segmentation_crops.py
+SEGMENTATION_THRESHOLD = 0.3
+
+# Pré-processamento aplicado às imagens antes dos dois motores:
+# - 'rescale': /255, como o app Flutter e generate_segmentation_crops.py
+# - 'mobilenet_v2': [-1, 1], como no treinamento da U-Net
+PARITY_PREPROCESSING = ('rescale', 'mobilenet_v2')
+
+DEFAULT_BATCH_SIZE = 16
+DEFAULT_WORST_K = 10
+
+
+def score_masks(ref_mask, out_mask):
+    """
+    Compara, por imagem, máscaras binárias achatadas [N, P]
+
+    Returns:
+        dict: Arrays por imagem: 'iou', 'dice' e 'mask_diff_pct'
+    """
+    intersection = np.logical_and(ref_mask, out_mask).sum(axis=1)
+    ref_area = ref_mask.sum(axis=1)
+    out_area = out_mask.sum(axis=1)
+    union = ref_area + out_area - intersection
+    return {
+        'iou': np.where(union == 0, 1.0, intersection / np.maximum(union, 1)),
+        'dice': np.where(
+            ref_area + out_area == 0, 1.0, 2 * intersection / np.maximum(ref_area + out_area, 1)
+        ),
+        'mask_diff_pct': 100.0 * (union - intersection) / ref_mask.shape[1],
+    }
+
+
+def score_outputs(reference, outputs, threshold=SEGMENTATION_THRESHOLD):
+    """
+    Compara, por imagem, as saídas de um modelo com as de referência
+
+    Args:
+        reference: Saídas de referência [N, ...] (ex.: Keras)
+        outputs: Saídas a avaliar, mesmo shape
+        threshold: Threshold de binarização das máscaras (segmentação)
+
+    Returns:
+        dict: Arrays por imagem: 'mean_abs_diff', 'max_abs_diff' e, para saída
+            4D, 'iou', 'dice' e 'mask_diff_pct'; para saída 2D, 'top1_agree'
+    """
+    n = len(reference)
+    is_segmentation = reference.ndim == 4
+    reference = reference.reshape(n, -1)
+    outputs = outputs.reshape(n, -1).astype(reference.dtype, copy=False)
+    diff = np.abs(reference - outputs)
+    scores = {'mean_abs_diff': diff.mean(axis=1), 'max_abs_diff': diff.max(axis=1)}
+    if is_segmentation:
+        scores.update(score_masks(reference > threshold, outputs > threshold))
+    else:
+        scores['top1_agree'] = (
+            np.argmax(reference, axis=1) == np.argmax(outputs, axis=1)
+        ).astype(np.float64)
+    return scores
+
+
+def normalize_batch(batch, preprocessing='rescale'):
+    """Converte um lote RGB uint8 para float32 com um dos PARITY_PREPROCESSING"""
+    batch = batch.astype(np.float32)
+    if preprocessing == 'mobilenet_v2':
+        return batch / 127.5 - 1.0
+    return batch / 255.0
+
+
+def iter_image_batches(input_dir, height, width, batch_size=DEFAULT_BATCH_SIZE,
+                       preprocessing='rescale', limit=None, io_workers=None, uint8=False):
+    """
+    Lê um diretório em lotes pré-processados, com decodificação em paralelo
+
+    Args:
+        input_dir: Diretório com imagens
+        height: Altura de entrada do modelo
+        width: Largura de entrada do modelo
+        batch_size: Imagens por lote
+        preprocessing: Um de PARITY_PREPROCESSING
+        limit: Número máximo de imagens (None = todas)
+        io_workers: Threads de decodificação (None usa o padrão)
+        uint8: Se True, devolve os pixels RGB uint8 sem normalizar (para
+            modelos com pré-processamento embutido)
+
+    Yields:
+        tuple: (lista de nomes, lote float32 [N, height, width, 3], ou uint8
+            com `uint8=True`)
+    """
+    import cv2
+    from generate_segmentation_crops import (
+        DEFAULT_IO_WORKERS, DEFAULT_PREFETCH, iter_preprocessed_images, list_image_files,
+    )
+
+    image_files = list_image_files(input_dir)
+    if limit:
+        image_files = image_files[:limit]
+    images = iter_preprocessed_images(
+        input_dir, image_files, io_workers or DEFAULT_IO_WORKERS,
+        max(DEFAULT_PREFETCH, 2 * batch_size),
+    )
+    while True:
+        items = list(itertools.islice(images, batch_size))
+        if not items:
+            return
+        names, batch = [], []
+        for filename, _, resized, _, error in items:
+            if error is not None:
+                print(f"   [AVISO] Imagem ignorada '{filename}': {error}")
+                continue
+            if resized.shape[:2] != (height, width):
+                resized = cv2.resize(resized, (width, height))
+            names.append(filename)
+            batch.append(resized)
+        if not names:
+            continue
+        batch = np.stack(batch)
+        yield names, (batch if uint8 else normalize_batch(batch, preprocessing))
+
+
+def compare_engines(keras_model, tflite_model, batches, threshold=SEGMENTATION_THRESHOLD,
+                    keras_preprocessing=None, output_mode='probabilities'):
+    """
+    Executa os dois motores em cada lote e acumula as estatísticas por imagem
+
+    O Keras e o TFLite rodam em threads próprias (um executor de uma thread por
+    motor, pois o interpretador não pode ser usado por duas threads ao mesmo
+    tempo). Enquanto o lote atual é inferido, as estatísticas do lote anterior
+    são calculadas e as próximas imagens são decodificadas.
+
+    Para modelos com pré-processamento embutido, os lotes são uint8: o TFLite
+    os recebe como estão e o Keras, normalizados com `keras_preprocessing`.
+    Com `output_mode='mask'`, a saída do TFLite já é a máscara 0/1 e só a
+    concordância com a máscara do Keras (binarizada por
+    `postprocess_prediction`) é medida.
+
+    Args:
+        keras_model: Modelo Keras (ou qualquer objeto com `predict_on_batch`)
+        tflite_model: Modelo TFLite com `predict_on_batch` (TFLiteSegmentationModel)
+        batches: Iterável de (nomes, lote float32, ou uint8 com `keras_preprocessing`)
+        threshold: Threshold de binarização das máscaras
+        keras_preprocessing: Normalização aplicada aos lotes uint8 antes do
+            Keras (None: os lotes já estão normalizados)
+        output_mode: Saída do TFLite ('probabilities' ou 'mask')
+
+    Returns:
+        tuple: (lista de nomes, dict de arrays por imagem de `score_outputs`)
+    """
+    all_names = []
+    all_scores = {}
+
+    def collect(names, keras_future, tflite_future):
+        reference = np.asarray(keras_future.result(), dtype=np.float32)
+        outputs = np.asarray(tflite_future.result())
+        if output_mode == 'mask':
+            from generate_segmentation_crops import postprocess_prediction
+
+            ref_masks = np.stack([
+                postprocess_prediction(pred, '', threshold, verbose=False)[0] for pred in reference
+            ])
+            scores = score_masks(
+                ref_masks.reshape(len(names), -1) > 0, outputs.reshape(len(names), -1) > 0
+            )
+        else:
+            scores = score_outputs(reference, outputs.astype(np.float32, copy=False), threshold)
+        all_names.extend(names)
+        for key, values in scores.items():
+            all_scores.setdefault(key, []).append(values)
+
+    with ThreadPoolExecutor(max_workers=1) as keras_executor, \
+            ThreadPoolExecutor(max_workers=1) as tflite_executor:
+        pending = None
+        for names, batch in batches:
+            keras_batch = batch if keras_preprocessing is None else normalize_batch(
+                batch, keras_preprocessing
+            )
+            futures = (
+                keras_executor.submit(keras_model.predict_on_batch, keras_batch),
+                tflite_executor.submit(tflite_model.predict_on_batch, batch),
+            )
+            if pending is not None:
+                collect(*pending)
+            pending = (names, *futures)
+        if pending is not None:
+            collect(*pending)
+
+    return all_names, {key: np.concatenate(values) for key, values in all_scores.items()}
+
+
+def summarize_parity(names, scores, worst_k=DEFAULT_WORST_K, title='Paridade Keras vs TFLite'):
+    """
+    Exibe o resumo agregado e as k piores imagens
+
+    Returns:
+        dict: Estatísticas agregadas
+    """
+    summary = {'images': len(names)}
+    if 'mean_abs_diff' in scores:
+        # Ausentes para modelos com saída 'mask' (só a concordância das máscaras)
+        summary['mean_abs_diff'] = float(np.mean(scores['mean_abs_diff'])) if names else 0.0
+        summary['max_abs_diff'] = float(np.max(scores['max_abs_diff'])) if names else 0.0
+    if 'iou' in scores and names:
+        summary.update({
+            'iou_mean': float(np.mean(scores['iou'])),
+            'iou_min': float(np.min(scores['iou'])),
+            'dice_mean': float(np.mean(scores['dice'])),
+            'dice_min': float(np.min(scores['dice'])),
+            'images_iou_below_0.99': int(np.sum(scores['iou'] < 0.99)),
+        })
+        # Piores: menor IoU, desempate pela maior diferença média
+        order = np.lexsort((-scores.get('mean_abs_diff', scores['mask_diff_pct']), scores['iou']))
+    elif names:
+        summary['top1_agreement'] = float(np.mean(scores['top1_agree']))
+        order = np.lexsort((-scores['mean_abs_diff'], scores['top1_agree']))
+    else:
+        order = []
+
+    print("\n" + "=" * 60)
+    print(f"{title}:")
+    for key, value in summary.items():
+        print(f"   {key}: {value:.6f}" if isinstance(value, float) else f"   {key}: {value}")
+
+    if len(order) and worst_k:
+        print(f"\n   {min(worst_k, len(order))} piores imagens:")
+        for i in order[:worst_k]:
+            line = f"   {names[i][:40]:<40}"
+            if 'mean_abs_diff' in scores:
+                line += f" dif.media {scores['mean_abs_diff'][i]:.6f} max {scores['max_abs_diff'][i]:.6f}"
+            if 'iou' in scores:
+                line += f" IoU {scores['iou'][i]:.4f} Dice {scores['dice'][i]:.4f}"
+            else:
+                line += f" top1 {'igual' if scores['top1_agree'][i] else 'DIFERENTE'}"
+            print(line)
+        summary['worst'] = [names[i] for i in order[:worst_k]]
+    print("=" * 60)
+    return summary
+
+
+def write_parity_csv(path, names, scores):
+    """Grava as estatísticas por imagem em CSV"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    keys = list(scores)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['arquivo'] + keys)
+        for i, name in enumerate(names):
+            writer.writerow([name] + [f'{scores[key][i]:.6g}' for key in keys])
+
+
+def check_parity(keras_path, tflite_path, input_dir, batch_size=DEFAULT_BATCH_SIZE,
+                 preprocessing='rescale', threshold=SEGMENTATION_THRESHOLD,
+                 worst_k=DEFAULT_WORST_K, limit=None, num_threads=None,
+                 io_workers=None, output_csv=None):
+    """
+    Compara um modelo Keras e sua conversão TFLite em todas as imagens de um diretório
+
+    Modelos exportados com pré-processamento embutido (entrada uint8) recebem
+    os pixels sem normalizar, e o Keras a normalização gravada nos metadados.
+    Para saída 'mask', o threshold dos metadados é usado e apenas a
+    concordância das máscaras é reportada.
+
+    Returns:
+        dict: Estatísticas agregadas (ver `summarize_parity`)
+    """
+    from generate_segmentation_crops import load_segmentation_model, model_output_mode
+
+    print(f"Carregando modelo Keras: {keras_path}")
+    keras_model = load_segmentation_model(keras_path, 'keras', num_threads)
+    print(f"Carregando modelo TFLite: {tflite_path}")
+    tflite_model = load_segmentation_model(tflite_path, 'tflite', num_threads)
+
+    metadata = tflite_model.metadata or {}
+    output_mode = model_output_mode(tflite_model)
+    if output_mode == 'coverage':
+        raise ValueError(
+            f"O modelo {tflite_path} devolve apenas a cobertura; "
+            "valide-o com convert_model.py --validate-precision"
+        )
+    uint8_input = tflite_model.uint8_input
+    if uint8_input:
+        if metadata.get('normalization') in PARITY_PREPROCESSING:
+            preprocessing = metadata['normalization']
+        print(f"[INFO] Entrada uint8 com pré-processamento embutido; Keras recebe '{preprocessing}'")
+    if output_mode == 'mask':
+        if metadata.get('threshold') is not None:
+            threshold = metadata['threshold']
+        print(f"[INFO] Saída 'mask': comparando apenas as máscaras (threshold {threshold})")
+
+    _, height, width, _ = keras_model.input_shape
+    start = time.perf_counter()
+    names, scores = compare_engines(
+        keras_model, tflite_model,
+        iter_image_batches(
+            input_dir, height, width, batch_size, preprocessing, limit, io_workers, uint8=uint8_input
+        ),
+        threshold,
+        keras_preprocessing=preprocessing if uint8_input else None,
+        output_mode=output_mode,
+    )
+    elapsed = time.perf_counter() - start
+
+    summary = summarize_parity(names, scores, worst_k)
+    summary['wall_time_s'] = elapsed
+    print(f"   Tempo: {elapsed:.2f}s ({len(names) / max(elapsed, 1e-9):.2f} imagens/s)")
+    if output_csv:
+        write_parity_csv(output_csv, names, scores)
+        print(f"   Estatísticas por imagem em: {output_csv}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compara um modelo Keras e sua conversão TFLite em um diretório de imagens',
+    )
+    parser.add_argument('--keras', '-k', type=str, required=True, help='Modelo .keras')
+    parser.add_argument('--tflite', '-l', type=str, required=True, help='Modelo .tflite')
+    parser.add_argument('--input', '-i', type=str, required=True, help='Diretório com imagens')
+    parser.add_argument('--batch-size', '-b', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'Imagens por lote (padrão: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--preprocessing', type=str, choices=PARITY_PREPROCESSING, default='rescale',
+                        help='Pré-processamento das imagens (padrão: rescale, como no app)')
+    parser.add_argument('--threshold', '-t', type=float, default=SEGMENTATION_THRESHOLD,
+                        help=f'Threshold das máscaras (padrão: {SEGMENTATION_THRESHOLD})')
+    parser.add_argument('--worst', type=int, default=DEFAULT_WORST_K,
+                        help=f'Número de piores imagens listadas (padrão: {DEFAULT_WORST_K})')
+    parser.add_argument('--limit', type=int, default=None, help='Número máximo de imagens')
+    parser.add_argument('--num-threads', type=int, default=None,
+                        help='Threads de inferência de cada motor (padrão: definido pelo runtime)')
+    parser.add_argument('--output', '-o', type=str, default=None,
+                        help='CSV opcional com as estatísticas por imagem')
+    args = parser.parse_args()
+
+    for path in (args.keras, args.tflite):
+        if not os.path.exists(path):
+            print(f"ERRO: Arquivo do modelo não encontrado: {path}")
+            sys.exit(1)
+    if not os.path.isdir(args.input):
+        print(f"ERRO: Diretório de entrada não encontrado: {args.input}")
+        sys.exit(1)
+    if args.batch_size < 1:
+        print("ERRO: --batch-size deve ser maior que zero")
+        sys.exit(1)
+
+    try:
+        check_parity(
+            args.keras, args.tflite, args.input,
+            batch_size=args.batch_size,
+            preprocessing=args.preprocessing,
+            threshold=args.threshold,
+            worst_k=args.worst,
+            limit=args.limit,
+            num_threads=args.num_threads,
+            output_csv=args.output,
+        )
+    except ValueError as e:
+        print(f"ERRO: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Medição de tempo por etapa e relatório de performance em JSON
+
+Usado por generate_segmentation_crops.py (--perf-report) para identificar se
+uma execução está limitada por decodificação, pré-processamento, inferência,
+binarização ou gravação.
+"""
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+
+def latency_summary(samples):
+    """
+    Resume uma lista de durações (em segundos)
+
+    Args:
+        samples: Durações individuais em segundos
+
+    Returns:
+        dict: Total (s), média e percentis p50/p95/p99 (ms)
+    """
+    if len(samples) == 0:
+        return {'calls': 0, 'total_s': 0.0}
+    values = np.asarray(samples, dtype=np.float64)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'calls': int(values.size),
+        'total_s': float(values.sum()),
+        'mean_ms': float(values.mean() * 1000),
+        'p50_ms': float(p50 * 1000),
+        'p95_ms': float(p95 * 1000),
+        'p99_ms': float(p99 * 1000),
+        'max_ms': float(values.max() * 1000),
+    }
+
+
+class StageTimer:
+    """
+    Acumula durações por etapa, de forma segura entre threads
+
+    Cada chamada a `record` guarda uma amostra (uma imagem ou um lote inteiro,
+    conforme a etapa) e quantos itens ela cobriu, para que o relatório
+    apresente tanto a latência por chamada quanto o custo médio por imagem.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.items = {}
+
+    def record(self, stage, seconds, items=1):
+        """Registra a duração de uma chamada da etapa"""
+        with self._lock:
+            self.samples.setdefault(stage, []).append(seconds)
+            self.items[stage] = self.items.get(stage, 0) + items
+
+    def time(self, stage, items=1):
+        """Context manager que registra a duração do bloco na etapa"""
+        return _StageContext(self, stage, items)
+
+    def merge(self, state):
+        """Incorpora as amostras exportadas por `export` (ex.: de outro processo)"""
+        samples, items = state
+        with self._lock:
+            for stage, values in samples.items():
+                self.samples.setdefault(stage, []).extend(values)
+            for stage, count in items.items():
+                self.items[stage] = self.items.get(stage, 0) + count
+
+    def export(self):
+        """Exporta as amostras em estruturas simples (serializáveis com pickle)"""
+        with self._lock:
+            return (
+                {stage: list(values) for stage, values in self.samples.items()},
+                dict(self.items),
+            )
+
+    def summary(self):
+        """
+        Returns:
+            dict: Estatísticas por etapa, incluindo itens e ms por item
+        """
+        stages = {}
+        with self._lock:
+            for stage, values in self.samples.items():
+                stats = latency_summary(values)
+                items = self.items.get(stage, 0)
+                stats['items'] = items
+                if items:
+                    stats['ms_per_item'] = stats['total_s'] * 1000 / items
+                stages[stage] = stats
+        return stages
+
+    def write_report(self, path, wall_time_s, images, extra=None):
+        """
+        Grava o relatório JSON
+
+        Args:
+            path: Caminho do arquivo JSON
+            wall_time_s: Tempo total de parede da execução
+            images: Número de imagens processadas
+            extra: Campos adicionais (configuração, contadores)
+
+        Returns:
+            dict: Relatório gravado
+        """
+        report = {
+            'wall_time_s': wall_time_s,
+            'images': images,
+            'images_per_sec': images / wall_time_s if wall_time_s > 0 else 0.0,
+            'stages': self.summary(),
+        }
+        if extra:
+            report.update(extra)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        return report
+
+
+class _StageContext:
+    def __init__(self, timer, stage, items):
+        self._timer = timer
+        self._stage = stage
+        self._items = items
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._timer.record(self._stage, time.perf_counter() - self._start, self._items)
+        return False
@@ -27,6 +27,8 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, confusion_matrix
 from sklearn.utils import class_weight
 import os
+import hashlib
+import time
 from PIL import Image
 
 # Verificação de GPU
@@ -46,6 +48,8 @@ MODEL_CHOICE = 'B0' # 'B0' (rápido) ou 'B3' (mais robusto)
 USE_AGGRESSIVE_AUG = True  # True para usar rotação e mudança de cor
 USE_CLASS_WEIGHTS = True   # True para balancear classes desproporcionais
 FINE_TUNE = True           # True para refinar o modelo na Fase 2
+USE_FEATURE_CACHE = True   # True: Fase 1 treina só a cabeça sobre features do backbone congelado
+FEATURE_CACHE_AUG_VIEWS = 4  # Visões aumentadas por imagem de treino no cache (0 = só as originais)
 
 # --- Parâmetros Gerais ---
 IMG_HEIGHT = 224 if MODEL_CHOICE == 'B0' else 300
@@ -248,13 +252,89 @@ if USE_CLASS_WEIGHTS:
 model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=LEARNING_RATE),
               loss='categorical_crossentropy', metrics=METRICS)
 
-history_1 = model.fit(
-    train_generator,
-    epochs=EPOCHS_PHASE_1,
-    validation_data=validation_generator,
-    callbacks=callbacks,
-    class_weight=class_weights
-)
+if USE_FEATURE_CACHE:
+    # O backbone está congelado e roda com training=False: a saída do
+    # GlobalAveragePooling é a mesma em toda época. Ela é calculada uma vez
+    # (imagens originais + FEATURE_CACHE_AUG_VIEWS visões aumentadas do treino)
+    # e a Fase 1 treina só Dropout -> Dense(256) -> BatchNorm -> Dense(4).
+    # As camadas da cabeça são as mesmas do `model`: o treino atualiza o modelo completo.
+    gap_layer = next(layer for layer in model.layers if isinstance(layer, GlobalAveragePooling2D))
+    feature_extractor = Model(model.input, gap_layer.output)
+    head_input = tf.keras.Input(shape=gap_layer.output.shape[1:])
+    x = head_input
+    for layer in model.layers[model.layers.index(gap_layer) + 1:]:
+        x = layer(x)
+    head_model = Model(head_input, x)
+
+    # Cache em disco: refeito se as imagens, a divisão, o backbone ou o aumento mudarem
+    digest = hashlib.sha256()
+    for split_df in (train_df, val_df):
+        for filepath in split_df['filepath']:
+            stat = os.stat(filepath)
+            digest.update(f'{filepath}:{stat.st_size}:{stat.st_mtime_ns}\n'.encode('utf-8'))
+    digest.update(f'{BASE_MODEL_NAME}:{INPUT_SHAPE}:{CLASSES}:{USE_AGGRESSIVE_AUG}:{FEATURE_CACHE_AUG_VIEWS}'.encode('utf-8'))
+    feature_cache_path = os.path.join(MODEL_OUTPUT_DIR, f"features_fase1_{digest.hexdigest()[:16]}.npz")
+
+    if os.path.exists(feature_cache_path):
+        cache = np.load(feature_cache_path)
+        x_train_feat, y_train_feat = cache['x_train'], cache['y_train']
+        x_val_feat, y_val_feat = cache['x_val'], cache['y_val']
+        print(f"Features carregadas do cache: {feature_cache_path}")
+    else:
+        start = time.time()
+        def extract(datagen, split_df):
+            # shuffle=False: as features saem na ordem de `classes`
+            generator = datagen.flow_from_dataframe(
+                split_df, x_col='filepath', y_col='classe',
+                target_size=(IMG_HEIGHT, IMG_WIDTH),
+                batch_size=BATCH_SIZE, class_mode='categorical', classes=CLASSES, shuffle=False
+            )
+            return feature_extractor.predict(generator, verbose=0), generator.classes
+
+        views = [extract(val_test_datagen, train_df)]
+        for view in range(FEATURE_CACHE_AUG_VIEWS):
+            views.append(extract(train_datagen, train_df))
+        x_train_feat = np.concatenate([features for features, _ in views])
+        y_train_feat = np.concatenate([labels for _, labels in views])
+        x_val_feat, y_val_feat = extract(val_test_datagen, val_df)
+        np.savez(feature_cache_path, x_train=x_train_feat, y_train=y_train_feat,
+                 x_val=x_val_feat, y_val=y_val_feat)
+        print(f"Features extraídas em {time.time() - start:.1f}s ({1 + FEATURE_CACHE_AUG_VIEWS} visões do treino): {feature_cache_path}")
+    print(f"Features: treino {x_train_feat.shape}, validação {x_val_feat.shape}")
+
+    head_model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=LEARNING_RATE),
+                       loss='categorical_crossentropy', metrics=METRICS)
+    # O melhor estado da cabeça é guardado por um ModelCheckpoint só de pesos
+    # (o restore_best_weights do EarlyStopping só age se ele disparar); ele é
+    # recarregado e o modelo completo é salvo ao final
+    head_weights_path = os.path.join(MODEL_OUTPUT_DIR, "best_head_fase1.weights.h5")
+    head_checkpoint = ModelCheckpoint(head_weights_path, monitor='val_loss', save_best_only=True,
+                                      save_weights_only=True, verbose=1)
+    history_1 = head_model.fit(
+        x_train_feat, tf.keras.utils.to_categorical(y_train_feat, N_CLASSES),
+        batch_size=BATCH_SIZE,
+        epochs=EPOCHS_PHASE_1,
+        validation_data=(x_val_feat, tf.keras.utils.to_categorical(y_val_feat, N_CLASSES)),
+        callbacks=[
+            head_checkpoint,
+            EarlyStopping(monitor='val_loss', patience=20, restore_best_weights=True, verbose=1),
+            ReduceLROnPlateau(monitor='val_loss', factor=0.2, patience=3, verbose=1)
+        ],
+        class_weight=class_weights
+    )
+    head_model.load_weights(head_weights_path)
+    model.save(checkpoint_path)
+    # A Fase 2 só sobrescreve o checkpoint se melhorar o val_loss da época salva
+    callbacks[0].best = head_checkpoint.best
+    print(f"Melhor modelo da Fase 1 salvo em: {checkpoint_path}")
+else:
+    history_1 = model.fit(
+        train_generator,
+        epochs=EPOCHS_PHASE_1,
+        validation_data=validation_generator,
+        callbacks=callbacks,
+        class_weight=class_weights
+    )
 
 # CÉLULA 8: Fase 2 (Fine-Tuning)
 print("\n--- CÉLULA 8: Fase 2 (Fine-Tuning) ---")
@@ -365,11 +445,37 @@ keras_path = os.path.join(MODEL_OUTPUT_DIR, "anemia_model_final.keras")
 best_model.save(keras_path)
 print(f"Salvo: {keras_path}")
 
-# Converter para TFLite (Otimizado)
+# Converter para TFLite (Otimizado) - única conversão; a CÉLULA 12 reutiliza o arquivo
 converter = tf.lite.TFLiteConverter.from_keras_model(best_model)
 converter.optimizations = [tf.lite.Optimize.DEFAULT]
 tflite_model = converter.convert()
 
+# Metadados embutidos no .tflite (mesmo formato do convert_model.py): os
+# scripts de inferência leem classes e entrada sem carregar o Keras
+try:
+    from model_registry import embed_tflite_metadata
+    with open(keras_path, 'rb') as f:
+        keras_sha256 = hashlib.sha256(f.read()).hexdigest()
+    tflite_model = embed_tflite_metadata(tflite_model, {
+        'task': 'classification',
+        'source_sha256': keras_sha256,
+        'source_name': os.path.basename(keras_path),
+        'input_size': [IMG_HEIGHT, IMG_WIDTH],
+        'input_channels': IMG_CHANNELS,
+        'input_dtype': 'float32',
+        'normalization': 'rescale',
+        'normalization_embedded': False,
+        'output_mode': 'probabilities',
+        'threshold': None,
+        # Ordem das saídas do modelo (índices do gerador)
+        'classes': list(test_generator.class_indices.keys()),
+        'variant': 'dynamic-range',
+        'export_batch': None,
+        'tensorflow': tf.__version__,
+    })
+except ImportError:
+    print("AVISO: model_registry.py não encontrado; TFLite salvo sem metadados")
+
 tflite_path = os.path.join(MODEL_OUTPUT_DIR, "anemia_model_final.tflite")
 with open(tflite_path, 'wb') as f:
     f.write(tflite_model)
@@ -403,25 +509,14 @@ for i in range(min(12, len(images))): # Plotar até 12 imagens
 plt.tight_layout()
 plt.show()
 
-# --- 12.2: Exportação Final (.keras e .tflite) ---
-print(f"Salvando e convertendo o modelo final para: {MODEL_OUTPUT_DIR}")
-
-h5_path = os.path.join(MODEL_OUTPUT_DIR, "anemia_model_final.h5")
-keras_path = os.path.join(MODEL_OUTPUT_DIR, "anemia_model_final.keras")
-tflite_path = os.path.join(MODEL_OUTPUT_DIR, "anemia_model_final.tflite")
+# --- 12.2: Exportação Final (.h5; .keras e .tflite já gerados na CÉLULA 11) ---
+print(f"Salvando o modelo final em: {MODEL_OUTPUT_DIR}")
 
 best_model.save(h5_path)
-best_model.save(keras_path)
-print(f"Modelos salvos em {keras_path} e {h5_path}")
-
-# Converter para TensorFlow Lite (TFLite)
-converter = tf.lite.TFLiteConverter.from_keras_model(best_model)
-converter.optimizations = [tf.lite.Optimize.DEFAULT]
-tflite_model = converter.convert()
-
-with open(tflite_path, 'wb') as f:
-    f.write(tflite_model)
-print(f"Modelo TFLite (otimizado) salvo em {tflite_path}")
+print(f"Modelo salvo em {h5_path}")
+# O best_model não mudou desde a CÉLULA 11: reutiliza o .keras e o .tflite
+# em vez de salvar e converter de novo
+print(f"Modelos reutilizados da CÉLULA 11: {keras_path} e {tflite_path}")
 
 try:
     keras_size = os.path.getsize(keras_path) / (1024 * 1024) # em MB
@@ -33,7 +33,6 @@ from tensorflow.keras import backend as K
 from tensorflow.keras.layers import Input, Conv2D, MaxPooling2D, Dropout, Conv2DTranspose, concatenate, BatchNormalization, Activation
 from tensorflow.keras.models import Model, load_model
 from tensorflow.keras.callbacks import ModelCheckpoint, EarlyStopping, ReduceLROnPlateau
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
 from tensorflow.keras.applications import MobileNetV2
 from sklearn.model_selection import train_test_split
 import matplotlib.pyplot as plt
@@ -57,6 +56,16 @@ NEW_IMAGES_PATH = os.path.join(DRIVE_BASE_PATH, 'fotos_para_analisar/')
 RESULTS_PATH = os.path.join(DRIVE_BASE_PATH, 'resultados_segmentacao/')
 RESULTS_MASKS_PATH = os.path.join(RESULTS_PATH, 'mascaras_previstas/')
 RESULTS_OVERLAYS_PATH = os.path.join(RESULTS_PATH, 'recortes_previstos/')
+PACKED_DATASET_PATH = os.path.join(DRIVE_BASE_PATH, 'dataset_empacotado/')
+
+# --- Módulos do Projeto (segmentation_pack.py, unet_model.py, ...) ---
+# No Colab, copie os .py da raiz do repositório para esta pasta do Drive;
+# localmente, o notebook roda na raiz do repositório
+PROJECT_CODE_PATH = os.path.join(DRIVE_BASE_PATH, 'codigo/') if COLAB_ENVIRONMENT else './'
+import sys
+if PROJECT_CODE_PATH not in sys.path:
+    sys.path.insert(0, PROJECT_CODE_PATH)
+from segmentation_pack import ensure_packed_dataset
 
 # --- Configuração Global do Modelo ---
 IMG_HEIGHT, IMG_WIDTH, IMG_CHANNELS = 256, 256, 3
@@ -127,45 +136,34 @@ CUSTOM_OBJECTS = {
     'f1_score': f1_score
 }
 
+# --- Pipeline tf.data de Treinamento (unet_model.make_train_dataset) ---
+# Substitui os dois ImageDataGenerator.flow + combined_generator: o aumento de
+# dados roda no grafo, por lote, em paralelo e com prefetch. Imagem e máscara
+# recebem a mesma transformação geométrica; o brilho só altera a imagem, em
+# [0, 255] e antes da normalização (o ImageDataGenerator aplicava o brilho
+# também à máscara e devolvia ambas em [0, 255]).
+# Benchmark contra o gerador antigo: benchmark_unet_input.py
+from unet_model import make_train_dataset
+
+# --- Decodificação Reduzida para Inferência ---
+# JPEGs grandes são lidos já reduzidos pela IDCT (1/2, 1/4 ou 1/8), com o maior
+# fator que ainda mantém a imagem maior que a entrada do modelo
+from image_decoding import imread_for_model
+
 print("Funções personalizadas e configurações globais definidas.")
 
 # Célula 2: Gerador de Máscaras
+# generate_masks.py: dimensões lidas do cabeçalho (com a orientação EXIF),
+# rasterização em paralelo e manifesto (masks_manifest.jsonl) que pula as
+# imagens cuja anotação e arquivo não mudaram, gravado a cada máscara
 print("\n--- Iniciando Bloco 2: Geração de Máscaras ---")
+from generate_masks import generate_masks
 
-os.makedirs(MASKS_PATH, exist_ok=True)
 try:
-    with open(JSON_PATH) as f:
-        data = json.load(f)
-    annotations = data['_via_img_metadata']
-    print(f"Encontradas anotações para {len(annotations)} imagens no arquivo JSON.")
-
-    for image_id, ann in annotations.items():
-        filename = ann['filename']
-        image_path = os.path.join(IMAGES_PATH, filename)
-        if not os.path.exists(image_path):
-            print(f"AVISO: Imagem {filename} não encontrada. Pulando.")
-            continue
-
-        image = cv2.imread(image_path)
-        if image is None:
-            print(f"AVISO: Imagem {filename} corrompida ou ilegível. Pulando.")
-            continue
-
-        height, width, _ = image.shape
-        mask = np.zeros((height, width), dtype=np.uint8)
-
-        for region in ann['regions']:
-            shape_attributes = region['shape_attributes']
-            if shape_attributes['name'] == 'polygon':
-                points = np.array([list(zip(shape_attributes['all_points_x'], shape_attributes['all_points_y']))], dtype=np.int32)
-                cv2.fillPoly(mask, points, 255)
-
-        mask_filename = os.path.splitext(filename)[0] + '.png'
-        mask_path = os.path.join(MASKS_PATH, mask_filename)
-        cv2.imwrite(mask_path, mask)
-        # print(f"  - Máscara para {filename} gerada com sucesso.") # Comentado para reduzir o log
-
-    print("\nProcesso de geração de máscaras concluído!")
+    counts = generate_masks(JSON_PATH, IMAGES_PATH, MASKS_PATH)
+    print(f"\nProcesso de geração de máscaras concluído! {counts['generated']} geradas, "
+          f"{counts['skipped']} inalteradas, {counts['missing']} não encontradas, "
+          f"{counts['unreadable']} ilegíveis.")
 
 except FileNotFoundError:
     print(f"ERRO: Arquivo JSON não encontrado em: {JSON_PATH}")
@@ -175,46 +173,19 @@ except Exception as e:
 print("\n--- Iniciando Bloco 3: Treinamento da U-Net ---")
 
 # --- Carregamento dos Dados ---
-print("--- Carregando imagens e máscaras ---")
-image_files = sorted(os.listdir(IMAGES_PATH))
-mask_files = sorted(os.listdir(MASKS_PATH))
-X, y = [], []
-for img_file in image_files:
-    mask_file = os.path.splitext(img_file)[0] + '.png'
-    if mask_file in mask_files:
-        img = cv2.imread(os.path.join(IMAGES_PATH, img_file))
-        if img is None: continue
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        img = cv2.resize(img, (IMG_HEIGHT, IMG_WIDTH))
-        X.append(img)
-        mask = cv2.imread(os.path.join(MASKS_PATH, mask_file), cv2.IMREAD_GRAYSCALE)
-        if mask is None:
-            X.pop()
-            continue
-        mask = cv2.resize(mask, (IMG_HEIGHT, IMG_WIDTH))
-        y.append(mask)
-
-X = np.array(X, dtype=np.float32)
-X = tf.keras.applications.mobilenet_v2.preprocess_input(X)
-y = np.array(y, dtype=np.float32) / 255.0
-y = np.expand_dims(y, axis=-1)
-X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.2, random_state=42)
-print(f"Dados carregados, pré-processados e divididos: {len(X_train)} para treino, {len(X_val)} para validação.")
+print("--- Carregando imagens e máscaras (dataset empacotado) ---")
+# Mesma divisão de train_test_split(X, y, test_size=0.2, random_state=42),
+# gravada no pacote sobre os índices
+X_raw, y_raw, train_idx, val_idx, _ = ensure_packed_dataset(IMAGES_PATH, MASKS_PATH, PACKED_DATASET_PATH, IMG_HEIGHT, IMG_WIDTH)
+X_train_raw, y_train_raw = X_raw[train_idx], y_raw[train_idx]
+X_val = tf.keras.applications.mobilenet_v2.preprocess_input(X_raw[val_idx].astype(np.float32))
+y_val = y_raw[val_idx].astype(np.float32) / 255.0
+print(f"Dados carregados, pré-processados e divididos: {len(train_idx)} para treino, {len(X_val)} para validação.")
 
 # --- Aumento de Dados (Data Augmentation) ---
-data_gen_args = dict(rotation_range=15, width_shift_range=0.1, height_shift_range=0.1, shear_range=0.05, zoom_range=0.1, horizontal_flip=True, brightness_range=[0.8, 1.2], fill_mode='nearest')
 seed = 1
-image_datagen = ImageDataGenerator(**data_gen_args)
-mask_datagen = ImageDataGenerator(**data_gen_args)
-image_datagen.fit(X_train, augment=True, seed=seed)
-mask_datagen.fit(y_train, augment=True, seed=seed)
-image_generator = image_datagen.flow(X_train, batch_size=BATCH_SIZE, seed=seed)
-mask_generator = mask_datagen.flow(y_train, batch_size=BATCH_SIZE, seed=seed)
-def combined_generator(img_gen, msk_gen):
-    while True:
-        yield (next(img_gen), next(msk_gen))
-train_generator = combined_generator(image_generator, mask_generator)
-print("\n--- Geradores de dados com augmentation configurados ---")
+train_dataset = make_train_dataset(X_train_raw, y_train_raw, BATCH_SIZE, seed=seed)
+print("\n--- Pipeline tf.data com augmentation configurado ---")
 
 # --- U-Net com Encoder Pré-treinado (MobileNetV2) ---
 def build_unet_with_transfer_learning(input_shape):
@@ -269,8 +240,8 @@ callbacks = [
 ]
 
 history = model.fit(
-    train_generator,
-    steps_per_epoch=len(X_train) // BATCH_SIZE,
+    train_dataset,
+    steps_per_epoch=len(train_idx) // BATCH_SIZE,
     epochs=EPOCHS,
     validation_data=(X_val, y_val),
     callbacks=callbacks
@@ -310,8 +281,8 @@ total_epochs = EPOCHS + FINE_TUNE_EPOCHS
 
 # Continuamos o treinamento (callbacks são reutilizados)
 history_fine_tune = model.fit(
-    train_generator,
-    steps_per_epoch=len(X_train) // BATCH_SIZE,
+    train_dataset,
+    steps_per_epoch=len(train_idx) // BATCH_SIZE,
     epochs=total_epochs,
     initial_epoch=history.epoch[-1], # Importante: continua de onde parou
     validation_data=(X_val, y_val),
@@ -341,46 +312,19 @@ plt.show()
 print("\n--- Iniciando Bloco 3: Treinamento da U-Net ---")
 
 # --- Carregamento dos Dados ---
-print("--- Carregando imagens e máscaras ---")
-image_files = sorted(os.listdir(IMAGES_PATH))
-mask_files = sorted(os.listdir(MASKS_PATH))
-X, y = [], []
-for img_file in image_files:
-    mask_file = os.path.splitext(img_file)[0] + '.png'
-    if mask_file in mask_files:
-        img = cv2.imread(os.path.join(IMAGES_PATH, img_file))
-        if img is None: continue
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        img = cv2.resize(img, (IMG_HEIGHT, IMG_WIDTH))
-        X.append(img)
-        mask = cv2.imread(os.path.join(MASKS_PATH, mask_file), cv2.IMREAD_GRAYSCALE)
-        if mask is None:
-            X.pop()
-            continue
-        mask = cv2.resize(mask, (IMG_HEIGHT, IMG_WIDTH))
-        y.append(mask)
-
-X = np.array(X, dtype=np.float32)
-X = tf.keras.applications.mobilenet_v2.preprocess_input(X)
-y = np.array(y, dtype=np.float32) / 255.0
-y = np.expand_dims(y, axis=-1)
-X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.2, random_state=42)
-print(f"Dados carregados, pré-processados e divididos: {len(X_train)} para treino, {len(X_val)} para validação.")
+print("--- Carregando imagens e máscaras (dataset empacotado) ---")
+# Mesma divisão de train_test_split(X, y, test_size=0.2, random_state=42),
+# gravada no pacote sobre os índices
+X_raw, y_raw, train_idx, val_idx, _ = ensure_packed_dataset(IMAGES_PATH, MASKS_PATH, PACKED_DATASET_PATH, IMG_HEIGHT, IMG_WIDTH)
+X_train_raw, y_train_raw = X_raw[train_idx], y_raw[train_idx]
+X_val = tf.keras.applications.mobilenet_v2.preprocess_input(X_raw[val_idx].astype(np.float32))
+y_val = y_raw[val_idx].astype(np.float32) / 255.0
+print(f"Dados carregados, pré-processados e divididos: {len(train_idx)} para treino, {len(X_val)} para validação.")
 
 # --- Aumento de Dados (Data Augmentation) ---
-data_gen_args = dict(rotation_range=15, width_shift_range=0.1, height_shift_range=0.1, shear_range=0.05, zoom_range=0.1, horizontal_flip=True, brightness_range=[0.8, 1.2], fill_mode='nearest')
 seed = 1
-image_datagen = ImageDataGenerator(**data_gen_args)
-mask_datagen = ImageDataGenerator(**data_gen_args)
-image_datagen.fit(X_train, augment=True, seed=seed)
-mask_datagen.fit(y_train, augment=True, seed=seed)
-image_generator = image_datagen.flow(X_train, batch_size=BATCH_SIZE, seed=seed)
-mask_generator = mask_datagen.flow(y_train, batch_size=BATCH_SIZE, seed=seed)
-def combined_generator(img_gen, msk_gen):
-    while True:
-        yield (next(img_gen), next(msk_gen))
-train_generator = combined_generator(image_generator, mask_generator)
-print("\n--- Geradores de dados com augmentation configurados ---")
+train_dataset = make_train_dataset(X_train_raw, y_train_raw, BATCH_SIZE, seed=seed)
+print("\n--- Pipeline tf.data com augmentation configurado ---")
 
 # --- U-Net com Encoder Pré-treinado (MobileNetV2) ---
 def build_unet_with_transfer_learning(input_shape):
@@ -435,8 +379,8 @@ callbacks = [
 ]
 
 history = model.fit(
-    train_generator,
-    steps_per_epoch=len(X_train) // BATCH_SIZE,
+    train_dataset,
+    steps_per_epoch=len(train_idx) // BATCH_SIZE,
     epochs=EPOCHS,
     validation_data=(X_val, y_val),
     callbacks=callbacks
@@ -476,8 +420,8 @@ total_epochs = EPOCHS + FINE_TUNE_EPOCHS
 
 # Continuamos o treinamento (callbacks são reutilizados)
 history_fine_tune = model.fit(
-    train_generator,
-    steps_per_epoch=len(X_train) // BATCH_SIZE,
+    train_dataset,
+    steps_per_epoch=len(train_idx) // BATCH_SIZE,
     epochs=total_epochs,
     initial_epoch=history.epoch[-1], # Importante: continua de onde parou
     validation_data=(X_val, y_val),
@@ -523,30 +467,10 @@ if model is not None:
     # Se a Célula 3 não foi executada, precisamos recarregar os dados.
     # Esta é uma verificação de segurança:
     if 'X_val' not in locals() or 'y_val' not in locals():
-        print("Recarregando dados de validação...")
-        # (Este é um subconjunto da lógica de carregamento da Célula 3)
-        image_files = sorted(os.listdir(IMAGES_PATH))
-        mask_files = sorted(os.listdir(MASKS_PATH))
-        X, y = [], []
-        for img_file in image_files:
-            mask_file = os.path.splitext(img_file)[0] + '.png'
-            if mask_file in mask_files:
-                img = cv2.imread(os.path.join(IMAGES_PATH, img_file))
-                if img is None: continue
-                img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-                img = cv2.resize(img, (IMG_HEIGHT, IMG_WIDTH))
-                X.append(img)
-                mask = cv2.imread(os.path.join(MASKS_PATH, mask_file), cv2.IMREAD_GRAYSCALE)
-                if mask is None:
-                    X.pop()
-                    continue
-                mask = cv2.resize(mask, (IMG_HEIGHT, IMG_WIDTH))
-                y.append(mask)
-        X = np.array(X, dtype=np.float32)
-        X = tf.keras.applications.mobilenet_v2.preprocess_input(X)
-        y = np.array(y, dtype=np.float32) / 255.0
-        y = np.expand_dims(y, axis=-1)
-        _, X_val, _, y_val = train_test_split(X, y, test_size=0.2, random_state=42)
+        print("Recarregando dados de validação do dataset empacotado...")
+        X_raw, y_raw, train_idx, val_idx, _ = ensure_packed_dataset(IMAGES_PATH, MASKS_PATH, PACKED_DATASET_PATH, IMG_HEIGHT, IMG_WIDTH)
+        X_val = tf.keras.applications.mobilenet_v2.preprocess_input(X_raw[val_idx].astype(np.float32))
+        y_val = y_raw[val_idx].astype(np.float32) / 255.0
         print("Dados de validação recarregados.")
 
     print(f"{len(X_val)} imagens de validação prontas para avaliação.")
@@ -582,26 +506,10 @@ if model is not None:
         print(f"F1-Score: {metrics_dict.get('f1_score', 'N/A')}")
 
     # --- Visualização das Previsões ---
-    # Precisamos recarregar as imagens originais (não processadas) para visualização
-    print("Carregando imagens originais para visualização...")
-    X_orig, y_orig = [], []
-    for img_file in image_files:
-        mask_file = os.path.splitext(img_file)[0] + '.png'
-        if mask_file in mask_files:
-            img = cv2.imread(os.path.join(IMAGES_PATH, img_file))
-            if img is None: continue
-            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            img = cv2.resize(img, (IMG_HEIGHT, IMG_WIDTH))
-            X_orig.append(img)
-            mask = cv2.imread(os.path.join(MASKS_PATH, mask_file), cv2.IMREAD_GRAYSCALE)
-            if mask is None:
-                X_orig.pop()
-                continue
-            mask = cv2.resize(mask, (IMG_HEIGHT, IMG_WIDTH))
-            mask = np.expand_dims(mask, axis=-1)
-            y_orig.append(mask)
-    y_orig_np = np.array(y_orig, dtype=np.float32) / 255.0
-    _, X_val_orig, _, y_val_orig = train_test_split(X_orig, y_orig_np, test_size=0.2, random_state=42)
+    # Imagens originais (não processadas) para visualização: vêm do pacote,
+    # sem decodificar de novo
+    X_val_orig = X_raw[val_idx]
+    y_val_orig = y_raw[val_idx].astype(np.float32) / 255.0
 
     predictions = model.predict(X_val)
     predictions = (predictions > 0.5).astype(np.uint8)
@@ -638,7 +546,7 @@ except Exception as e:
 if model_inference is not None:
     # --- Função de Pré-processamento para Inferência ---
     def preprocess_inference_image(image_path, target_height, target_width):
-        img = cv2.imread(image_path)
+        img = imread_for_model(image_path, target_height, target_width)
         if img is None:
             raise IOError(f"Não foi possível ler a imagem: {image_path}")
         img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
@@ -767,7 +675,7 @@ if model_inference is not None:
     # --- Função de Pré-processamento para Inferência ---
     # (Vou assumir que o modelo de segmentação foi treinado com os mesmos inputs)
     def preprocess_inference_image(image_path, target_height, target_width):
-        img = cv2.imread(image_path)
+        img = imread_for_model(image_path, target_height, target_width)
         if img is None:
             raise IOError(f"Não foi possível ler a imagem: {image_path}")
         img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
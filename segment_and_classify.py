@@ -0,0 +1,343 @@
+"""
+Pipeline em um único processo: segmentação -> recorte -> classificação FAMACHA
+
+Hoje os recortes da segmentação são gravados em disco (generate_segmentation_crops.py
+ou a pasta Resultados_Recortes do notebook) e relidos depois para a classificação
+com o modelo EfficientNet de projeto_tc_coloração.py. Este script mantém os
+recortes em memória: segmenta um lote a 256x256, aplica a máscara, redimensiona
+os recortes para a entrada do classificador (224x224 no B0) e classifica o lote
+inteiro, gravando apenas o CSV de resultados (e, opcionalmente, os recortes).
+
+Uso:
+    python segment_and_classify.py --seg-model melhor_modelo_unet_metricas_completas.keras --cls-model anemia_model_final.keras --input fotos --output resultados.csv
+    python segment_and_classify.py --seg-model assets/model.tflite --cls-model anemia_model_final.tflite --input fotos --output resultados.csv --save-crops resultados_recortes
+"""
+
+import argparse
+import csv
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+import cv2
+
+from generate_segmentation_crops import (
+    BACKENDS,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_IO_WORKERS,
+    DEFAULT_PREFETCH,
+    DEFAULT_WRITE_QUEUE,
+    DEFAULT_WRITE_WORKERS,
+    MIN_COVERAGE_PERCENTAGE,
+    SEGMENTATION_THRESHOLD,
+    AsyncOutputWriter,
+    iter_preprocessed_images,
+    list_image_files,
+    load_segmentation_model,
+    model_output_mode,
+    model_input_size,
+    postprocess_prediction,
+    resolve_backend,
+    select_model_input,
+)
+
+# Configurar encoding UTF-8 para Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Classes do classificador (mesma ordem de CLASSES em projeto_tc_coloração.py)
+FAMACHA_CLASSES = ['Normal', 'Leve', 'Moderada', 'Grave']
+
+
+def model_class_names(model):
+    """
+    Nomes das classes do classificador
+
+    Usa a lista gravada nos metadados do .tflite pelo convert_model.py; sem
+    metadados (Keras ou .tflite antigo), FAMACHA_CLASSES quando o número de
+    saídas coincide ou nomes genéricos.
+    """
+    n_classes = model.output_shape[-1]
+    classes = (getattr(model, 'metadata', None) or {}).get('classes')
+    if classes and len(classes) == n_classes:
+        return list(classes)
+    return FAMACHA_CLASSES if n_classes == len(FAMACHA_CLASSES) else [
+        f'classe_{i}' for i in range(n_classes)
+    ]
+
+
+def crops_to_classifier_batch(binary_masks, resized_originals, cls_height, cls_width):
+    """
+    Gera os recortes mascarados e os converte na entrada do classificador
+
+    O classificador foi treinado com ImageDataGenerator(rescale=1/255) lendo os
+    recortes do disco com `target_size` (interpolação 'nearest', padrão do
+    Keras), então o redimensionamento aqui usa INTER_NEAREST e a mesma escala.
+
+    Args:
+        binary_masks: Máscaras binárias uint8 [H, W] (valores 0/1)
+        resized_originals: Imagens RGB 256x256 correspondentes
+        cls_height: Altura de entrada do classificador
+        cls_width: Largura de entrada do classificador
+
+    Returns:
+        np.ndarray: Lote float32 [N, cls_height, cls_width, 3]
+    """
+    return np.stack([
+        cv2.resize(
+            cv2.bitwise_and(original, original, mask=mask),
+            (cls_width, cls_height), interpolation=cv2.INTER_NEAREST,
+        )
+        for mask, original in zip(binary_masks, resized_originals)
+    ]).astype(np.float32) / 255.0
+
+
+def run_pipeline(seg_model_path, cls_model_path, input_dir, output_csv,
+                 threshold=SEGMENTATION_THRESHOLD, batch_size=DEFAULT_BATCH_SIZE,
+                 prefetch=DEFAULT_PREFETCH, io_workers=DEFAULT_IO_WORKERS,
+                 seg_backend='keras', cls_backend='keras', num_threads=None,
+                 crops_dir=None, write_workers=DEFAULT_WRITE_WORKERS, fast_decode=True):
+    """
+    Segmenta, recorta e classifica as imagens de um diretório sem passar pelo disco
+
+    Args:
+        seg_model_path: Modelo de segmentação (.keras ou .tflite)
+        cls_model_path: Modelo de classificação FAMACHA (.keras ou .tflite)
+        input_dir: Diretório com imagens de entrada
+        output_csv: Caminho do CSV de resultados
+        threshold: Threshold para binarização da máscara
+        batch_size: Número de imagens por chamada a cada modelo
+        prefetch: Número máximo de imagens decodificadas à frente do modelo
+        io_workers: Número de threads de decodificação
+        seg_backend: Backend do modelo de segmentação ('keras' ou 'tflite')
+        cls_backend: Backend do classificador ('keras' ou 'tflite')
+        num_threads: Threads de inferência (None usa o padrão do runtime)
+        crops_dir: Se informado, grava máscaras e recortes neste diretório
+        write_workers: Threads de gravação dos recortes opcionais
+        fast_decode: Se True, decodifica JPEGs grandes em resolução reduzida
+
+    Returns:
+        tuple: (número de sucessos, número de falhas)
+    """
+    print(f"Carregando modelo de segmentação: {seg_model_path} (backend: {seg_backend})")
+    seg_model = load_segmentation_model(seg_model_path, seg_backend, num_threads, require_mask=True)
+    # O adaptador TFLite e o carregamento Keras não dependem do tipo de modelo
+    print(f"Carregando classificador: {cls_model_path} (backend: {cls_backend})")
+    cls_model = load_segmentation_model(cls_model_path, cls_backend, num_threads)
+
+    _, cls_height, cls_width, _ = cls_model.input_shape
+    n_classes = cls_model.output_shape[-1]
+    class_names = model_class_names(cls_model)
+    print(f"   Entrada do classificador: {cls_width}x{cls_height}, {n_classes} classes")
+
+    image_files = list_image_files(input_dir)
+    if not image_files:
+        print(f"AVISO: Nenhuma imagem encontrada no diretório: {input_dir}")
+        return 0, 0
+
+    writer = None
+    if crops_dir:
+        masks_path = os.path.join(crops_dir, 'masks')
+        overlays_path = os.path.join(crops_dir, 'crops')
+        os.makedirs(masks_path, exist_ok=True)
+        os.makedirs(overlays_path, exist_ok=True)
+        writer = AsyncOutputWriter(max(1, write_workers), DEFAULT_WRITE_QUEUE)
+
+    output_dir = os.path.dirname(output_csv)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    print(f"\nIniciando pipeline para {len(image_files)} imagens (lote: {batch_size})...")
+    start_time = time.perf_counter()
+    successful = 0
+    failed = 0
+
+    with open(output_csv, 'w', newline='', encoding='utf-8') as csv_file:
+        csv_writer = csv.writer(csv_file)
+        csv_writer.writerow(
+            ['arquivo', 'cobertura', 'classe', 'confianca']
+            + [f'prob_{name}' for name in class_names]
+        )
+
+        preprocessed_images = iter_preprocessed_images(
+            input_dir, image_files, io_workers, prefetch, fast_decode=fast_decode,
+            target_size=model_input_size(seg_model)
+        )
+        while True:
+            batch_items = list(itertools.islice(preprocessed_images, batch_size))
+            if not batch_items:
+                break
+
+            batch_names, batch_inputs, batch_originals = [], [], []
+            for filename, processed_img, resized_original_img, _, error in batch_items:
+                if error is not None:
+                    print(f"   - ERRO CRÍTICO ao processar '{filename}': {error}")
+                    failed += 1
+                    continue
+                batch_names.append(filename)
+                batch_inputs.append(select_model_input(seg_model, processed_img, resized_original_img))
+                batch_originals.append(resized_original_img)
+            if not batch_names:
+                continue
+
+            try:
+                # Estágio 1: segmentação do lote a 256x256
+                predicted_masks_raw = np.asarray(
+                    seg_model.predict_on_batch(np.stack(batch_inputs, axis=0))
+                )
+                masks, coverages = zip(*(
+                    postprocess_prediction(pred, filename, threshold,
+                                           output_mode=model_output_mode(seg_model))
+                    for filename, pred in zip(batch_names, predicted_masks_raw)
+                ))
+
+                # Estágio 2: recortes em memória -> classificação do lote
+                cls_batch = crops_to_classifier_batch(
+                    masks, batch_originals, cls_height, cls_width
+                )
+                has_mucosa = np.array([c >= MIN_COVERAGE_PERCENTAGE for c in coverages])
+                probabilities = np.zeros((len(batch_names), n_classes), dtype=np.float32)
+                if has_mucosa.any():
+                    probabilities[has_mucosa] = np.asarray(
+                        cls_model.predict_on_batch(cls_batch[has_mucosa])
+                    )
+            except Exception as e:
+                for filename in batch_names:
+                    print(f"   - ERRO CRÍTICO ao processar '{filename}': {e}")
+                failed += len(batch_names)
+                continue
+
+            for i, filename in enumerate(batch_names):
+                if has_mucosa[i]:
+                    class_index = int(np.argmax(probabilities[i]))
+                    label, confidence = class_names[class_index], float(probabilities[i, class_index])
+                    print(f"     -> Classe: {label} ({confidence * 100:.1f}%)")
+                else:
+                    # Sem mucosa segmentada não há o que classificar
+                    label, confidence = '', 0.0
+                csv_writer.writerow(
+                    [filename, f'{coverages[i]:.2f}', label, f'{confidence:.4f}']
+                    + [f'{p:.4f}' for p in probabilities[i]]
+                )
+                if writer is not None:
+                    writer.submit(
+                        filename, masks[i], batch_originals[i],
+                        os.path.join(masks_path, f"mascara_{filename}"),
+                        os.path.join(overlays_path, f"recorte_{filename}"),
+                    )
+                else:
+                    successful += 1
+
+            if writer is not None:
+                for filename, error in writer.drain():
+                    if error is None:
+                        successful += 1
+                    else:
+                        print(f"   - ERRO CRÍTICO ao gravar '{filename}': {error}")
+                        failed += 1
+
+    if writer is not None:
+        for filename, error in writer.close():
+            if error is None:
+                successful += 1
+            else:
+                print(f"   - ERRO CRÍTICO ao gravar '{filename}': {error}")
+                failed += 1
+
+    elapsed = time.perf_counter() - start_time
+    print("\n" + "=" * 60)
+    print("Pipeline concluído!")
+    print(f"   Sucesso: {successful}")
+    print(f"   Falhas: {failed}")
+    print(f"   Total: {len(image_files)}")
+    print(f"   Tempo: {elapsed:.2f}s ({len(image_files) / max(elapsed, 1e-9):.2f} imagens/s)")
+    print(f"\nResultados em: {output_csv}")
+    if crops_dir:
+        print(f"Recortes em: {crops_dir}")
+    print("=" * 60)
+    return successful, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Segmenta a conjuntiva e classifica o grau FAMACHA em um único processo',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Exemplos:
+  # Apenas o CSV de resultados (nenhum recorte gravado)
+  python segment_and_classify.py --seg-model melhor_modelo_unet_metricas_completas.keras --cls-model anemia_model_final.keras --input fotos --output resultados.csv
+
+  # Com os modelos TFLite do aplicativo e gravando os recortes
+  python segment_and_classify.py --seg-model assets/model.tflite --cls-model anemia_model_final.tflite --input fotos --output resultados.csv --save-crops resultados_recortes
+        """
+    )
+    parser.add_argument('--seg-model', type=str, required=True,
+                        help='Modelo de segmentação (.keras ou .tflite)')
+    parser.add_argument('--cls-model', type=str, required=True,
+                        help='Modelo de classificação FAMACHA (.keras ou .tflite)')
+    parser.add_argument('--input', '-i', type=str, required=True,
+                        help='Diretório com imagens de entrada')
+    parser.add_argument('--output', '-o', type=str, default='resultados_classificacao.csv',
+                        help='CSV de resultados (padrão: resultados_classificacao.csv)')
+    parser.add_argument('--threshold', '-t', type=float, default=SEGMENTATION_THRESHOLD,
+                        help=f'Threshold para binarização da máscara (padrão: {SEGMENTATION_THRESHOLD})')
+    parser.add_argument('--batch-size', '-b', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'Imagens por passada de cada modelo (padrão: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--prefetch', type=int, default=DEFAULT_PREFETCH,
+                        help=f'Imagens decodificadas à frente do modelo (padrão: {DEFAULT_PREFETCH})')
+    parser.add_argument('--io-workers', type=int, default=DEFAULT_IO_WORKERS,
+                        help=f'Threads de leitura das imagens (padrão: {DEFAULT_IO_WORKERS})')
+    parser.add_argument('--seg-backend', type=str, choices=BACKENDS, default=None,
+                        help='Backend da segmentação (padrão: pela extensão do modelo)')
+    parser.add_argument('--cls-backend', type=str, choices=BACKENDS, default=None,
+                        help='Backend do classificador (padrão: pela extensão do modelo)')
+    parser.add_argument('--num-threads', type=int, default=None,
+                        help='Threads de inferência (padrão: definido pelo runtime)')
+    parser.add_argument('--save-crops', type=str, default=None,
+                        help='Diretório opcional para gravar máscaras e recortes')
+    parser.add_argument('--full-decode', action='store_true',
+                        help='Decodifica os JPEGs em resolução completa')
+    args = parser.parse_args()
+
+    for path in (args.seg_model, args.cls_model):
+        if not os.path.exists(path):
+            print(f"ERRO: Arquivo do modelo não encontrado: {path}")
+            sys.exit(1)
+
+    if not os.path.isdir(args.input):
+        print(f"ERRO: Diretório de entrada não encontrado: {args.input}")
+        sys.exit(1)
+
+    if not (0.0 <= args.threshold <= 1.0):
+        print(f"ERRO: Threshold deve estar entre 0.0 e 1.0 (recebido: {args.threshold})")
+        sys.exit(1)
+
+    if args.batch_size < 1 or args.prefetch < 1 or args.io_workers < 1:
+        print("ERRO: --batch-size, --prefetch e --io-workers devem ser maiores que zero")
+        sys.exit(1)
+
+    try:
+        run_pipeline(
+            args.seg_model, args.cls_model, args.input, args.output,
+            threshold=args.threshold,
+            batch_size=args.batch_size,
+            prefetch=args.prefetch,
+            io_workers=args.io_workers,
+            seg_backend=resolve_backend(args.seg_model, args.seg_backend),
+            cls_backend=resolve_backend(args.cls_model, args.cls_backend),
+            num_threads=args.num_threads,
+            crops_dir=args.save_crops,
+            fast_decode=not args.full_decode,
+        )
+    except ValueError as e:
+        # Modelo de segmentação sem saída por pixel (require_mask_output)
+        print(f"ERRO: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
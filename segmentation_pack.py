@@ -0,0 +1,249 @@
+"""
+Empacotamento do dataset de segmentação em arrays .npy mapeáveis em memória
+
+As células 3 e 4 de projeto_tc_segmentacao.py decodificavam e redimensionavam
+todas as imagens e máscaras a cada execução. Este script faz isso uma única
+vez e grava:
+
+    <saida>/images.npy     uint8 [N, H, W, 3] (RGB, cv2.resize como no notebook)
+    <saida>/masks.npy      uint8 [N, H, W, 1] (0-255)
+    <saida>/train_idx.npy  índices de treino (train_test_split, seed 42)
+    <saida>/val_idx.npy    índices de validação
+    <saida>/index.json     nomes, tamanho, divisão e impressão digital da origem
+
+`open_packed_dataset` abre os arrays com np.load(mmap_mode='r'): sem cópia e
+sem decodificação, em milissegundos. O pacote é refeito apenas quando os
+arquivos de origem, o tamanho ou a divisão mudam (`ensure_packed_dataset`).
+
+Uso:
+    python segmentation_pack.py --images dataset/imagens --masks dataset/mascaras --output dataset/empacotado
+    python segmentation_pack.py --images dataset/imagens --masks dataset/mascaras --output dataset/empacotado_128 --size 128
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from unet_model import (
+    SPLIT_SEED, VALIDATION_SPLIT, list_image_mask_pairs, read_image_mask_pair, split_indices,
+)
+
+# Configurar encoding UTF-8 para Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+PACK_VERSION = 1
+INDEX_FILENAME = 'index.json'
+ARRAY_FILES = ('images.npy', 'masks.npy', 'train_idx.npy', 'val_idx.npy')
+DEFAULT_SIZE = 256
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)  # Threads de decodificação (cv2 libera o GIL)
+
+
+def source_fingerprint(images_dir, masks_dir, pairs):
+    """SHA-256 dos nomes, tamanhos e datas de modificação dos pares de origem"""
+    digest = hashlib.sha256()
+    for img_file, mask_file in pairs:
+        for directory, filename in ((images_dir, img_file), (masks_dir, mask_file)):
+            stat = os.stat(os.path.join(directory, filename))
+            digest.update(f'{filename}:{stat.st_size}:{stat.st_mtime_ns}\n'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def load_pack_index(pack_dir):
+    """Conteúdo de index.json ou None se o pacote não existe"""
+    index_path = os.path.join(pack_dir, INDEX_FILENAME)
+    if not os.path.exists(index_path):
+        return None
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_pack_current(pack_dir, images_dir, masks_dir, height, width,
+                    test_size=VALIDATION_SPLIT, seed=SPLIT_SEED):
+    """True se o pacote existe e corresponde à origem, ao tamanho e à divisão"""
+    index = load_pack_index(pack_dir)
+    if index is None or index.get('version') != PACK_VERSION:
+        return False
+    if not all(os.path.exists(os.path.join(pack_dir, name)) for name in ARRAY_FILES):
+        return False
+    pairs = list_image_mask_pairs(images_dir, masks_dir)
+    return (
+        index.get('height') == height and index.get('width') == width
+        and index.get('test_size') == test_size and index.get('seed') == seed
+        and index.get('fingerprint') == source_fingerprint(images_dir, masks_dir, pairs)
+    )
+
+
+def pack_segmentation_dataset(images_dir, masks_dir, pack_dir, height=DEFAULT_SIZE, width=DEFAULT_SIZE,
+                              test_size=VALIDATION_SPLIT, seed=SPLIT_SEED, workers=DEFAULT_WORKERS):
+    """
+    Decodifica o dataset uma vez e grava os arrays .npy e o índice
+
+    As imagens são gravadas direto em arquivos mapeados (np.lib.format.open_memmap),
+    sem montar o dataset inteiro em memória. O index.json é gravado por último:
+    um empacotamento interrompido é tratado como desatualizado.
+
+    Returns:
+        dict: Conteúdo do index.json
+    """
+    pairs = list_image_mask_pairs(images_dir, masks_dir)
+    if not pairs:
+        raise ValueError(f"Nenhum par imagem/máscara encontrado em {images_dir} e {masks_dir}")
+    os.makedirs(pack_dir, exist_ok=True)
+    index_path = os.path.join(pack_dir, INDEX_FILENAME)
+    if os.path.exists(index_path):
+        os.remove(index_path)
+
+    tmp_images = os.path.join(pack_dir, 'images.tmp.npy')
+    tmp_masks = os.path.join(pack_dir, 'masks.tmp.npy')
+    images = np.lib.format.open_memmap(tmp_images, mode='w+', dtype=np.uint8,
+                                       shape=(len(pairs), height, width, 3))
+    masks = np.lib.format.open_memmap(tmp_masks, mode='w+', dtype=np.uint8,
+                                      shape=(len(pairs), height, width, 1))
+
+    def decode(pair):
+        return read_image_mask_pair(images_dir, masks_dir, pair[0], pair[1], height, width)
+
+    names, skipped = [], []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        # map preserva a ordem dos pares (a mesma do notebook)
+        for (img_file, _), decoded in zip(pairs, executor.map(decode, pairs)):
+            if decoded is None:
+                skipped.append(img_file)
+                continue
+            images[len(names)] = decoded[0]
+            masks[len(names), ..., 0] = decoded[1]
+            names.append(img_file)
+    count = len(names)
+    images.flush()
+    masks.flush()
+    del images, masks
+
+    if count < len(pairs):
+        # Arquivos ilegíveis: regrava só as linhas válidas
+        for tmp_path in (tmp_images, tmp_masks):
+            full = np.load(tmp_path, mmap_mode='r')
+            trimmed = np.lib.format.open_memmap(tmp_path + '.trim', mode='w+', dtype=np.uint8,
+                                                shape=(count,) + full.shape[1:])
+            trimmed[:] = full[:count]
+            trimmed.flush()
+            del full, trimmed
+            os.replace(tmp_path + '.trim', tmp_path)
+    os.replace(tmp_images, os.path.join(pack_dir, 'images.npy'))
+    os.replace(tmp_masks, os.path.join(pack_dir, 'masks.npy'))
+
+    train_idx, val_idx = split_indices(count, test_size, seed)
+    np.save(os.path.join(pack_dir, 'train_idx.npy'), train_idx)
+    np.save(os.path.join(pack_dir, 'val_idx.npy'), val_idx)
+
+    index = {
+        'version': PACK_VERSION,
+        'images_dir': os.path.abspath(images_dir),
+        'masks_dir': os.path.abspath(masks_dir),
+        'height': height,
+        'width': width,
+        'count': count,
+        'test_size': test_size,
+        'seed': seed,
+        'n_train': int(len(train_idx)),
+        'n_val': int(len(val_idx)),
+        'names': names,
+        'skipped': skipped,
+        'fingerprint': source_fingerprint(images_dir, masks_dir, pairs),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    tmp_index = index_path + '.tmp'
+    with open(tmp_index, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_index, index_path)
+    return index
+
+
+def open_packed_dataset(pack_dir, mmap_mode='r'):
+    """
+    Abre um pacote sem copiar nem decodificar
+
+    Args:
+        pack_dir: Diretório gerado por `pack_segmentation_dataset`
+        mmap_mode: Modo do np.load ('r' mapeia os arquivos; None carrega em memória)
+
+    Returns:
+        tuple: (images uint8 [N, H, W, 3], masks uint8 [N, H, W, 1],
+            train_idx, val_idx, index)
+    """
+    index = load_pack_index(pack_dir)
+    if index is None:
+        raise FileNotFoundError(f"Pacote nao encontrado: {os.path.join(pack_dir, INDEX_FILENAME)}")
+    images = np.load(os.path.join(pack_dir, 'images.npy'), mmap_mode=mmap_mode)
+    masks = np.load(os.path.join(pack_dir, 'masks.npy'), mmap_mode=mmap_mode)
+    train_idx = np.load(os.path.join(pack_dir, 'train_idx.npy'))
+    val_idx = np.load(os.path.join(pack_dir, 'val_idx.npy'))
+    return images, masks, train_idx, val_idx, index
+
+
+def ensure_packed_dataset(images_dir, masks_dir, pack_dir, height=DEFAULT_SIZE, width=DEFAULT_SIZE,
+                          test_size=VALIDATION_SPLIT, seed=SPLIT_SEED, workers=DEFAULT_WORKERS,
+                          force=False):
+    """Empacota se necessário e abre o pacote (ver `open_packed_dataset`)"""
+    if force or not is_pack_current(pack_dir, images_dir, masks_dir, height, width, test_size, seed):
+        print(f"Empacotando dataset {width}x{height} em: {pack_dir}")
+        start = time.perf_counter()
+        index = pack_segmentation_dataset(images_dir, masks_dir, pack_dir, height, width,
+                                          test_size, seed, workers)
+        print(f"   {index['count']} pares empacotados em {time.perf_counter() - start:.1f}s "
+              f"({index['n_train']} treino, {index['n_val']} validação)")
+        for name in index['skipped']:
+            print(f"   AVISO: Par ignorado (arquivo ilegível): {name}")
+    return open_packed_dataset(pack_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Empacota imagens e máscaras redimensionadas em arrays .npy mapeáveis em memória',
+    )
+    parser.add_argument('--images', type=str, required=True, help='Diretório das imagens')
+    parser.add_argument('--masks', type=str, required=True, help='Diretório das máscaras (.png)')
+    parser.add_argument('--output', '-o', type=str, required=True, help='Diretório do pacote')
+    parser.add_argument('--size', type=int, default=DEFAULT_SIZE,
+                        help=f'Resolução (altura = largura) dos arrays (padrão: {DEFAULT_SIZE})')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'Threads de decodificação (padrão: {DEFAULT_WORKERS})')
+    parser.add_argument('--force', action='store_true',
+                        help='Reempacota mesmo se o pacote estiver atualizado')
+    args = parser.parse_args()
+
+    for path in (args.images, args.masks):
+        if not os.path.isdir(path):
+            print(f"ERRO: Diretório não encontrado: {path}")
+            sys.exit(1)
+    if args.size < 1:
+        print("ERRO: --size deve ser maior que zero")
+        sys.exit(1)
+
+    try:
+        start = time.perf_counter()
+        images, masks, train_idx, val_idx, index = ensure_packed_dataset(
+            args.images, args.masks, args.output, args.size, args.size,
+            workers=args.workers, force=args.force
+        )
+    except ValueError as e:
+        print(f"ERRO: {e}")
+        sys.exit(1)
+    print(f"Pacote pronto em {(time.perf_counter() - start) * 1000:.0f} ms: "
+          f"images {images.shape}, masks {masks.shape}, "
+          f"{len(train_idx)} treino / {len(val_idx)} validação")
+
+
+if __name__ == '__main__':
+    main()
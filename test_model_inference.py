@@ -7,6 +7,9 @@ from PIL import Image
 import sys
 import os
 
+from generate_segmentation_crops import load_segmentation_model
+from parity_check import compare_engines, summarize_parity
+
 # Configurar encoding UTF-8 para Windows
 if sys.platform == 'win32':
     import io
@@ -115,7 +118,7 @@ def test_keras_inference(model_path, image_path=None):
     return model
 
 def compare_with_tflite(keras_model, tflite_path, test_input):
-    """Compara saída Keras vs TFLite"""
+    """Compara saída Keras vs TFLite (harness de parity_check.py)"""
     print(f"\n[8] Comparação Keras vs TFLite:")
     
     if not os.path.exists(tflite_path):
@@ -123,36 +126,10 @@ def compare_with_tflite(keras_model, tflite_path, test_input):
         return
     
     try:
-        # Keras
-        keras_output = keras_model.predict(test_input, verbose=0)
-        
-        # TFLite
-        interpreter = tf.lite.Interpreter(model_path=tflite_path)
-        interpreter.allocate_tensors()
-        
-        input_details = interpreter.get_input_details()
-        output_details = interpreter.get_output_details()
-        
-        interpreter.set_tensor(input_details[0]['index'], test_input)
-        interpreter.invoke()
-        tflite_output = interpreter.get_tensor(output_details[0]['index'])
-        
-        # Compara
-        diff = np.abs(keras_output - tflite_output)
-        print(f"   Diferença média: {diff.mean():.6f}")
-        print(f"   Diferença máxima: {diff.max():.6f}")
-        print(f"   Diferença mínima: {diff.min():.6f}")
-        print(f"   Pixels com diferença > 0.01: {np.sum(diff > 0.01)}")
-        print(f"   Pixels com diferença > 0.1: {np.sum(diff > 0.1)}")
-        
-        # Compara máscaras binarizadas
-        threshold = 0.3
-        keras_mask = (keras_output > threshold).astype(np.uint8)
-        tflite_mask = (tflite_output > threshold).astype(np.uint8)
-        
-        mask_diff = np.abs(keras_mask - tflite_mask)
-        print(f"\n   Máscaras binarizadas (threshold {threshold}):")
-        print(f"   Pixels diferentes: {np.sum(mask_diff > 0)} ({np.sum(mask_diff > 0) / (256*256) * 100:.2f}%)")
+        tflite_model = load_segmentation_model(tflite_path, 'tflite')
+        names = [f'entrada_{i}' for i in range(len(test_input))]
+        names, scores = compare_engines(keras_model, tflite_model, [(names, test_input)])
+        summarize_parity(names, scores)
         
     except Exception as e:
         print(f"   [ERRO] Erro na comparação: {e}")
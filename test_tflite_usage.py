@@ -1,11 +1,15 @@
 """
 Script para testar o uso correto do TFLite e comparar com Keras
 """
+import os
 import numpy as np
-import tensorflow as tf
 from PIL import Image
 import sys
 
+# Apenas a comparação com Keras importa o TensorFlow; o TFLite usa o runtime
+# leve (ai_edge_litert/tflite_runtime) quando instalado
+from lazy_runtime import create_tflite_interpreter, get_tflite_interpreter_class, import_tensorflow
+
 # Configurar encoding UTF-8 para Windows
 if sys.platform == 'win32':
     import io
@@ -20,7 +24,8 @@ def test_tflite_usage(tflite_path, keras_model_path=None):
     
     # Carrega o modelo TFLite
     print(f"\n[1] Carregando modelo TFLite: {tflite_path}")
-    interpreter = tf.lite.Interpreter(model_path=tflite_path)
+    print(f"   Runtime: {get_tflite_interpreter_class()[1]}")
+    interpreter = create_tflite_interpreter(tflite_path)
     interpreter.allocate_tensors()
     
     # Obtém informações de entrada e saída
@@ -57,8 +62,11 @@ def test_tflite_usage(tflite_path, keras_model_path=None):
     print(f"   Output std: {output1.std():.6f}")
     
     # Compara com Keras se disponível
-    if keras_model_path:
+    if keras_model_path and not os.path.exists(keras_model_path):
+        print(f"\n[5] Modelo Keras não encontrado ({keras_model_path}); comparação ignorada")
+    elif keras_model_path:
         print(f"\n[5] Comparação com Keras:")
+        tf = import_tensorflow()
         keras_model = tf.keras.models.load_model(keras_model_path, compile=False)
         keras_output = keras_model.predict(test_input, verbose=0)
         
@@ -0,0 +1,397 @@
+"""
+Perfil de latência por operador de modelos TFLite
+
+Usado por analyze_model.py (--profile-tflite) para descobrir quais camadas
+dominam o tempo de inferência da U-Net em um alvo:
+
+- executa o interpretador repetidamente com entradas representativas (fotos
+  reais pré-processadas) e resume a latência de ponta a ponta;
+- identifica quais nós foram absorvidos por um delegate (XNNPACK etc.) e
+  quais ficaram em kernels comuns do TFLite (fallback), reconstruindo cada
+  partição do delegate a partir do grafo do interpretador;
+- quando a ferramenta oficial `benchmark_model` do TFLite está disponível,
+  coleta o tempo de cada operador (--enable_op_profiling) e agrega por tipo
+  de operador e por nome de camada.
+"""
+
+import csv
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+
+from perf_report import latency_summary
+
+# Nomes do binário de benchmark do TFLite (build local ou pré-compilado)
+BENCHMARK_BINARY_NAMES = (
+    'benchmark_model',
+    'linux_x86-64_benchmark_model',
+    'linux_aarch64_benchmark_model',
+)
+BENCHMARK_BINARY_ENV = 'TFLITE_BENCHMARK_MODEL'
+
+DEFAULT_PROFILE_RUNS = 50
+DEFAULT_PROFILE_IMAGES = 16
+
+# Prefixos de escopo do modelo nos nomes de tensores do conversor
+MODEL_SCOPE_PREFIXES = ('functional', 'model', 'sequential', 'serving_default')
+
+
+def find_benchmark_binary(path=None):
+    """
+    Localiza o binário `benchmark_model` do TFLite
+
+    Args:
+        path: Caminho explícito (tem prioridade sobre a variável de ambiente
+            TFLITE_BENCHMARK_MODEL e o PATH)
+
+    Returns:
+        str: Caminho do binário ou None
+    """
+    for candidate in (path, os.environ.get(BENCHMARK_BINARY_ENV)):
+        if candidate and os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+            return candidate
+    for name in BENCHMARK_BINARY_NAMES:
+        found = shutil.which(name)
+        if found:
+            return found
+    return None
+
+
+def layer_name_from_tensor(tensor_name):
+    """
+    Extrai o nome da camada Keras do nome do tensor de saída de um nó
+
+    Ex.: 'functional_1/Conv1_1/convolution' -> 'Conv1_1'
+    """
+    name = tensor_name.strip()
+    if name.startswith('[') and ']' in name:
+        # Nomes do benchmark_model: '[tensor1;tensor2, ...]:índice'
+        name = name[1:name.index(']')]
+    name = re.split('[;,]', name)[0].strip().split(':')[0]
+    parts = [p for p in name.split('/') if p]
+    while len(parts) > 2 and parts[0].startswith(MODEL_SCOPE_PREFIXES):
+        parts = parts[1:]
+    if len(parts) > 1:
+        parts = parts[:-1]
+    return '/'.join(parts) if parts else tensor_name
+
+
+def delegation_report(interpreter):
+    """
+    Classifica os nós do grafo em delegados e em kernels comuns (fallback)
+
+    Depois de aplicar um delegate, o interpretador mantém os nós originais e
+    acrescenta um nó DELEGATE por partição. Cada partição é reconstruída
+    caminhando para trás a partir das saídas do nó DELEGATE até as suas
+    entradas; os nós originais fora de todas as partições executam no kernel
+    padrão do TFLite.
+
+    Args:
+        interpreter: Interpretador com tensores alocados
+
+    Returns:
+        dict: 'nodes' (um dict por nó original com op, camada, tensor de saída
+            e partição ou None) e 'partitions' (número de nós DELEGATE)
+    """
+    ops = interpreter._get_ops_details()
+    tensor_names = {t['index']: t['name'] for t in interpreter.get_tensor_details()}
+    original = [op for op in ops if op['op_name'] != 'DELEGATE']
+    delegates = [op for op in ops if op['op_name'] == 'DELEGATE']
+
+    producer = {}
+    for op in original:
+        for tensor in op['outputs']:
+            producer[int(tensor)] = op['index']
+    by_index = {op['index']: op for op in original}
+
+    partition_of = {}
+    for partition, delegate in enumerate(delegates):
+        boundary = {int(t) for t in delegate['inputs']}
+        pending = [int(t) for t in delegate['outputs']]
+        seen = set()
+        while pending:
+            tensor = pending.pop()
+            if tensor in seen or tensor in boundary:
+                continue
+            seen.add(tensor)
+            node = producer.get(tensor)
+            if node is None or node in partition_of:
+                continue
+            partition_of[node] = partition
+            pending.extend(int(t) for t in by_index[node]['inputs'] if t >= 0)
+
+    nodes = []
+    for op in original:
+        output_name = tensor_names.get(int(op['outputs'][0]), '') if len(op['outputs']) else ''
+        nodes.append({
+            'index': op['index'],
+            'op': op['op_name'],
+            'tensor': output_name,
+            'layer': layer_name_from_tensor(output_name),
+            'partition': partition_of.get(op['index']),
+        })
+    return {'nodes': nodes, 'partitions': len(delegates)}
+
+
+def time_invocations(model, images, runs=DEFAULT_PROFILE_RUNS):
+    """
+    Mede a latência de ponta a ponta, uma imagem por `invoke()`
+
+    Args:
+        model: TFLiteSegmentationModel
+        images: Entradas representativas [N, H, W, C] (percorridas em ciclo)
+        runs: Número de invocações medidas (após uma de aquecimento)
+
+    Returns:
+        dict: Resumo de `latency_summary`
+    """
+    model.predict_on_batch(images[:1])  # aquecimento / alocação
+    samples = []
+    for i in range(runs):
+        image = images[i % len(images)][np.newaxis]
+        start = time.perf_counter()
+        model.predict_on_batch(image)
+        samples.append(time.perf_counter() - start)
+    return latency_summary(samples)
+
+
+def _split_profile_line(line):
+    if '\t' in line:
+        return [cell.strip() for cell in line.split('\t') if cell.strip()]
+    return [cell.strip() for cell in next(csv.reader([line]))]
+
+
+def _normalize_header(cell):
+    return cell.strip().strip('[]"').strip().lower()
+
+
+def parse_op_profile(text):
+    """
+    Lê a tabela 'Run Order' do perfil por operador do `benchmark_model`
+
+    Aceita a saída em texto (colunas separadas por tabulação) e em CSV
+    (--op_profiling_output_mode=csv). Considera apenas as execuções do
+    benchmark (ignora a tabela de inicialização).
+
+    Returns:
+        list: Um dict por nó (op, name, avg_ms, calls)
+    """
+    lines = text.splitlines()
+    start = next((i for i, line in enumerate(lines) if 'Regular Benchmark Runs' in line), 0)
+    rows = []
+    header = None
+    in_table = False
+    for line in lines[start:]:
+        if 'Run Order' in line:
+            in_table, header = True, None
+            continue
+        if not in_table:
+            continue
+        if not line.strip() or line.lstrip().startswith('='):
+            if header is not None:
+                break
+            continue
+        cells = _split_profile_line(line)
+        if header is None:
+            normalized = [_normalize_header(c) for c in cells]
+            if 'node type' in normalized:
+                header = normalized
+            continue
+        if len(cells) < len(header):
+            continue
+        row = dict(zip(header, cells))
+        try:
+            avg_ms = float(row.get('avg ms', row.get('avg_ms', 'nan')))
+        except ValueError:
+            continue
+        rows.append({
+            'op': row['node type'],
+            'name': row.get('name', ''),
+            'avg_ms': avg_ms,
+            'calls': int(float(row.get('times called', 1) or 1)),
+        })
+    return rows
+
+
+def run_benchmark_model(binary, model_path, input_name, input_sample, runs=DEFAULT_PROFILE_RUNS,
+                        num_threads=None, use_xnnpack=True):
+    """
+    Executa o `benchmark_model` com perfil por operador
+
+    A entrada representativa é gravada em um arquivo binário e passada com
+    --input_layer_value_files, para que o perfil reflita dados reais.
+
+    Args:
+        binary: Caminho do `benchmark_model`
+        model_path: Modelo .tflite
+        input_name: Nome do tensor de entrada
+        input_sample: Uma entrada [1, H, W, C] já no dtype do modelo
+        runs: Número de execuções do benchmark
+        num_threads: Threads do interpretador (None usa o padrão da ferramenta)
+        use_xnnpack: Se False, desabilita o XNNPACK (tempo de cada camada no
+            kernel padrão)
+
+    Returns:
+        list: Linhas de `parse_op_profile`
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, 'input.bin')
+        profile_path = os.path.join(tmp, 'profile.csv')
+        input_sample.tofile(input_path)
+        command = [
+            binary,
+            f'--graph={model_path}',
+            f'--num_runs={runs}',
+            '--enable_op_profiling=true',
+            '--op_profiling_output_mode=csv',
+            f'--op_profiling_output_file={profile_path}',
+            f'--input_layer={input_name}',
+            f'--input_layer_shape={",".join(str(d) for d in input_sample.shape)}',
+            f'--input_layer_value_files={input_name}:{input_path}',
+            f'--use_xnnpack={"true" if use_xnnpack else "false"}',
+        ]
+        if num_threads:
+            command.append(f'--num_threads={num_threads}')
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(
+                f"benchmark_model falhou ({result.returncode}): "
+                f"{(result.stderr or result.stdout).strip().splitlines()[-1:]}"
+            )
+        if os.path.exists(profile_path):
+            with open(profile_path, encoding='utf-8', errors='replace') as f:
+                rows = parse_op_profile(f.read())
+            if rows:
+                return rows
+        # Versões antigas ignoram o modo CSV e imprimem a tabela na saída
+        return parse_op_profile(result.stdout + '\n' + result.stderr)
+
+
+def aggregate_op_profile(rows, key):
+    """
+    Soma o tempo dos nós por tipo de operador ('op') ou camada ('layer')
+
+    Nós de delegate executam várias camadas de uma vez e entram na agregação
+    por camada como uma única partição.
+
+    Returns:
+        list: (chave, ms, nós, % do total) em ordem decrescente de tempo
+    """
+    totals, counts = {}, {}
+    for row in rows:
+        if key == 'op':
+            name = row['op']
+        elif is_delegate_row(row):
+            name = f"{row['op']} {row['name'].rsplit(':', 1)[-1]}"
+        else:
+            name = layer_name_from_tensor(row['name'])
+        totals[name] = totals.get(name, 0.0) + row['avg_ms']
+        counts[name] = counts.get(name, 0) + 1
+    overall = sum(totals.values()) or 1.0
+    return sorted(
+        ((name, ms, counts[name], 100.0 * ms / overall) for name, ms in totals.items()),
+        key=lambda item: item[1], reverse=True,
+    )
+
+
+def is_delegate_row(row):
+    """Nós de delegate aparecem no perfil com o tipo do kernel do delegate"""
+    return 'delegate' in row['op'].lower()
+
+
+def print_profile_report(latency, delegation, op_rows=None, top_k=15):
+    """Exibe o resultado de `profile_tflite_model`"""
+    print(f"\n   Latência (1 imagem/invoke, {latency['calls']} execuções): "
+          f"média {latency['mean_ms']:.2f} ms | p50 {latency['p50_ms']:.2f} ms | "
+          f"p95 {latency['p95_ms']:.2f} ms")
+
+    nodes = delegation['nodes']
+    fallback = [n for n in nodes if n['partition'] is None]
+    print(f"\n   Delegação: {delegation['partitions']} partição(ões) de delegate, "
+          f"{len(nodes) - len(fallback)}/{len(nodes)} nós delegados")
+    if delegation['partitions'] == 0:
+        print("   [INFO] Nenhum delegate aplicado; todos os nós usam os kernels padrão")
+    elif fallback:
+        counts = {}
+        for node in fallback:
+            counts[node['op']] = counts.get(node['op'], 0) + 1
+        print(f"   Nós fora do delegate (fallback para kernels padrão): "
+              + ", ".join(f"{op} x{n}" for op, n in sorted(counts.items(), key=lambda i: -i[1])))
+        for node in fallback[:top_k]:
+            print(f"     - #{node['index']:<4} {node['op']:<20} {node['layer']}")
+        if len(fallback) > top_k:
+            print(f"     ... e mais {len(fallback) - top_k} nós")
+
+    if op_rows is None:
+        return
+    if not op_rows:
+        print("\n   [AVISO] O benchmark_model não produziu o perfil por operador")
+        return
+    total_ms = sum(row['avg_ms'] for row in op_rows)
+    print(f"\n   Perfil por operador (benchmark_model, soma {total_ms:.2f} ms/execução):")
+    print(f"   {'Tipo de operador':<28} {'ms':>9} {'nós':>5} {'%':>6}")
+    for name, ms, count, pct in aggregate_op_profile(op_rows, 'op')[:top_k]:
+        print(f"   {name:<28} {ms:>9.3f} {count:>5} {pct:>5.1f}%")
+    print(f"\n   {'Camada':<40} {'ms':>9} {'nós':>5} {'%':>6}")
+    for name, ms, count, pct in aggregate_op_profile(op_rows, 'layer')[:top_k]:
+        print(f"   {name[:40]:<40} {ms:>9.3f} {count:>5} {pct:>5.1f}%")
+
+    cpu_rows = [row for row in op_rows if not is_delegate_row(row)]
+    delegate_ms = total_ms - sum(row['avg_ms'] for row in cpu_rows)
+    if len(cpu_rows) < len(op_rows):
+        print(f"\n   Tempo em delegates: {delegate_ms:.3f} ms | em kernels padrão: "
+              f"{total_ms - delegate_ms:.3f} ms ({len(cpu_rows)} nós)")
+
+
+def profile_tflite_model(model_path, images, runs=DEFAULT_PROFILE_RUNS, num_threads=None,
+                         benchmark_binary=None, use_xnnpack=True):
+    """
+    Perfil de latência de um modelo TFLite em entradas representativas
+
+    Args:
+        model_path: Modelo .tflite
+        images: Entradas float32 pré-processadas [N, H, W, C] (em [0, 1]
+            para modelos com entrada uint8)
+        runs: Execuções medidas (interpretador e benchmark_model)
+        num_threads: Threads do interpretador
+        benchmark_binary: Caminho do `benchmark_model` (None procura no PATH)
+        use_xnnpack: Repassado ao benchmark_model
+
+    Returns:
+        dict: 'latency', 'delegation' e 'op_profile' (None sem o binário)
+    """
+    from generate_segmentation_crops import TFLiteSegmentationModel
+
+    model = TFLiteSegmentationModel(model_path, num_threads=num_threads)
+    if model.uint8_input:
+        # Normalização embutida no grafo: a entrada são os pixels RGB
+        images = np.clip(np.round(images * 255.0), 0, 255).astype(np.uint8)
+    latency = time_invocations(model, images, runs)
+    delegation = delegation_report(model.interpreter)
+
+    op_rows = None
+    binary = find_benchmark_binary(benchmark_binary)
+    if binary is None:
+        print(f"   [INFO] benchmark_model não encontrado (PATH ou {BENCHMARK_BINARY_ENV}); "
+              "perfil por operador indisponível")
+    else:
+        print(f"   Perfil por operador com: {binary}")
+        input_details = model.interpreter.get_input_details()[0]
+        sample = images[:1]
+        if np.issubdtype(input_details['dtype'], np.integer) and not model.uint8_input:
+            scale, zero_point = input_details['quantization']
+            info = np.iinfo(input_details['dtype'])
+            sample = np.clip(np.round(sample / scale + zero_point), info.min, info.max)
+        sample = np.ascontiguousarray(sample.astype(input_details['dtype']))
+        try:
+            op_rows = run_benchmark_model(
+                binary, model_path, input_details['name'], sample, runs, num_threads, use_xnnpack
+            )
+        except (OSError, RuntimeError) as e:
+            print(f"   [AVISO] {e}")
+    return {'latency': latency, 'delegation': delegation, 'op_profile': op_rows}
@@ -0,0 +1,439 @@
+"""
+Cache das ativações do encoder congelado para a etapa 1 do treino da U-Net
+
+Na etapa 1 (projeto_tc_segmentacao.py) o MobileNetV2 está congelado
+(`base_model.trainable = False`, BatchNormalization em modo de inferência):
+para uma mesma imagem, as saídas das skip connections (SKIP_CONNECTION_NAMES,
+a última é o gargalo `out_relu`) são sempre as mesmas. Este script calcula
+essas ativações uma vez, para as imagens de treino originais e para
+--views visões aumentadas (o mesmo `augment_batch` do tf.data), e treina só o
+decodificador sobre elas.
+
+    <cache>/train/skip_0.npy ... skip_4.npy  float16 [M, h, w, c], M = N x (1 + views)
+    <cache>/train/masks.npy                  uint8 [M, H, W, 1] (máscaras aumentadas, 0-255)
+    <cache>/val/...                          mesmo formato, sem aumento
+    <cache>/*/index.json                     formas, visões e impressão digital da origem
+
+Os arrays são lidos por memmap, lote a lote; o cache é refeito quando o
+pacote do dataset, a divisão, os pesos do encoder ou o número de visões mudam.
+Com --benchmark, mede o tempo por época e o pico de memória (RSS) da etapa 1
+de ponta a ponta (tf.data + modelo completo) e sobre o cache, cada modo em um
+processo separado. O pico de RSS inclui as páginas do memmap lidas (memória de
+arquivo, liberável pelo sistema).
+
+Uso:
+    python unet_encoder_cache.py --images dataset/imagens --masks dataset/mascaras --pack dataset/empacotado --cache dataset/cache_encoder --epochs 150 --save unet_etapa1.keras
+    python unet_encoder_cache.py --images dataset/imagens --masks dataset/mascaras --pack dataset/empacotado --cache dataset/cache_encoder --benchmark --epochs 3
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from lazy_runtime import import_tensorflow
+from segmentation_pack import DEFAULT_SIZE, ensure_packed_dataset
+from unet_model import SKIP_CONNECTION_NAMES, augment_batch
+
+# Configurar encoding UTF-8 para Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+CACHE_VERSION = 1
+INDEX_FILENAME = 'index.json'
+DEFAULT_VIEWS = 4           # Visões aumentadas por imagem de treino (além da original)
+DEFAULT_BATCH_SIZE = 8      # BATCH_SIZE do notebook
+DEFAULT_EPOCHS = 3
+LEARNING_RATE = 1e-4        # Etapa 1 do notebook
+CACHE_SEED = 1
+
+
+def split_unet(model, base_model):
+    """
+    Separa a U-Net em encoder e decodificador que compartilham as camadas do modelo
+
+    Returns:
+        tuple: (encoder: imagem -> [skips], decoder: [skips] -> máscara)
+    """
+    tf = import_tensorflow()
+    skips = [base_model.get_layer(name).output for name in SKIP_CONNECTION_NAMES]
+    encoder = tf.keras.Model(base_model.input, skips)
+    decoder = tf.keras.Model(skips, model.output)
+    return encoder, decoder
+
+
+def encoder_fingerprint(base_model):
+    """SHA-256 da forma de entrada e dos pesos do encoder"""
+    digest = hashlib.sha256(str(base_model.input.shape).encode('utf-8'))
+    for weights in base_model.get_weights():
+        digest.update(np.ascontiguousarray(weights).tobytes())
+    return digest.hexdigest()
+
+
+def cache_nbytes(encoder, count):
+    """Tamanho (bytes) das ativações float16 de `count` imagens"""
+    per_image = sum(int(np.prod(output.shape[1:])) for output in encoder.outputs)
+    return per_image * 2 * count
+
+
+def load_cache_index(cache_dir):
+    """Conteúdo de index.json ou None se o cache não existe"""
+    index_path = os.path.join(cache_dir, INDEX_FILENAME)
+    if not os.path.exists(index_path):
+        return None
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def build_encoder_cache(encoder, images, masks, cache_dir, views=0, source=None,
+                        batch_size=DEFAULT_BATCH_SIZE, seed=CACHE_SEED):
+    """
+    Passa as imagens pelo encoder uma vez e grava as ativações em float16
+
+    A visão 0 é a imagem original; as visões 1..views recebem o aumento de
+    dados do treino (`augment_batch`), com a máscara transformada junto. As
+    linhas ficam na ordem visão x imagem. O index.json é gravado por último:
+    um cache interrompido é tratado como desatualizado.
+
+    Args:
+        encoder: Modelo imagem -> skips (`split_unet`)
+        images: uint8 [N, H, W, 3]
+        masks: uint8 [N, H, W, 1] com valores 0-255
+        views: Visões aumentadas por imagem
+        source: Impressão digital gravada no índice (ver `ensure_encoder_cache`)
+
+    Returns:
+        dict: Conteúdo do index.json
+    """
+    tf = import_tensorflow()
+    tf.random.set_seed(seed)
+    count = len(images) * (1 + views)
+    if os.path.isdir(cache_dir):
+        shutil.rmtree(cache_dir)
+    os.makedirs(cache_dir)
+
+    shapes = [tuple(int(d) for d in output.shape[1:]) for output in encoder.outputs]
+    skips = [
+        np.lib.format.open_memmap(os.path.join(cache_dir, f'skip_{i}.npy'), mode='w+',
+                                  dtype=np.float16, shape=(count,) + shape)
+        for i, shape in enumerate(shapes)
+    ]
+    cached_masks = np.lib.format.open_memmap(os.path.join(cache_dir, 'masks.npy'), mode='w+',
+                                             dtype=np.uint8, shape=(count,) + masks.shape[1:])
+
+    row = 0
+    for view in range(1 + views):
+        for start in range(0, len(images), batch_size):
+            image_batch = tf.cast(np.asarray(images[start:start + batch_size]), tf.float32)
+            mask_batch = tf.cast(np.asarray(masks[start:start + batch_size]), tf.float32) / 255.0
+            if view > 0:
+                image_batch, mask_batch = augment_batch(image_batch, mask_batch)
+            # mobilenet_v2.preprocess_input, como em make_train_dataset
+            outputs = encoder(image_batch / 127.5 - 1.0, training=False)
+            end = row + len(image_batch)
+            for target, output in zip(skips, outputs):
+                target[row:end] = output.numpy().astype(np.float16)
+            cached_masks[row:end] = np.round(mask_batch.numpy() * 255.0).astype(np.uint8)
+            row = end
+    for array in skips + [cached_masks]:
+        array.flush()
+    del skips, cached_masks
+
+    index = {
+        'version': CACHE_VERSION,
+        'count': count,
+        'images': len(images),
+        'views': views,
+        'shapes': [list(shape) for shape in shapes],
+        'source': source,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    tmp_index = os.path.join(cache_dir, INDEX_FILENAME + '.tmp')
+    with open(tmp_index, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_index, os.path.join(cache_dir, INDEX_FILENAME))
+    return index
+
+
+def open_encoder_cache(cache_dir):
+    """
+    Abre um cache por memmap, sem copiar
+
+    Returns:
+        tuple: (skips [float16 [M, h, w, c]], masks uint8 [M, H, W, 1], index)
+    """
+    index = load_cache_index(cache_dir)
+    if index is None:
+        raise FileNotFoundError(f"Cache nao encontrado: {os.path.join(cache_dir, INDEX_FILENAME)}")
+    skips = [np.load(os.path.join(cache_dir, f'skip_{i}.npy'), mmap_mode='r')
+             for i in range(len(index['shapes']))]
+    masks = np.load(os.path.join(cache_dir, 'masks.npy'), mmap_mode='r')
+    return skips, masks, index
+
+
+def ensure_encoder_cache(encoder, base_model, images, masks, indices, pack_index, cache_dir,
+                         views=0, batch_size=DEFAULT_BATCH_SIZE, seed=CACHE_SEED, force=False):
+    """
+    Gera o cache das imagens `indices` do pacote se necessário e o abre
+
+    O cache é válido enquanto o pacote de origem, os índices, os pesos do
+    encoder, o número de visões e a semente forem os mesmos.
+    """
+    source = {
+        'pack': pack_index['fingerprint'],
+        'size': [pack_index['height'], pack_index['width']],
+        'indices': hashlib.sha256(np.asarray(indices, dtype=np.int64).tobytes()).hexdigest(),
+        'encoder': encoder_fingerprint(base_model),
+        'seed': seed,
+    }
+    index = load_cache_index(cache_dir)
+    if (force or index is None or index.get('version') != CACHE_VERSION
+            or index.get('views') != views or index.get('source') != source):
+        count = len(indices) * (1 + views)
+        print(f"Gerando cache do encoder ({len(indices)} imagens x {1 + views} visões, "
+              f"{cache_nbytes(encoder, count) / 1024 ** 2:.0f} MB) em: {cache_dir}")
+        start = time.perf_counter()
+        # Ordena os índices: leitura sequencial do memmap do pacote
+        order = np.sort(indices)
+        build_encoder_cache(encoder, images[order], masks[order], cache_dir, views, source,
+                            batch_size, seed)
+        print(f"   Cache gerado em {time.perf_counter() - start:.1f}s")
+    return open_encoder_cache(cache_dir)
+
+
+def make_cached_dataset(skips, masks, batch_size, shuffle=True, seed=None):
+    """
+    tf.data de (skips float32, máscaras em [0, 1]) lido do memmap lote a lote
+
+    Com shuffle, o dataset é infinito (use `steps_per_epoch`), como
+    `make_train_dataset`; sem shuffle, percorre o cache uma vez (validação).
+    Só os índices passam pelo tf.data: as linhas de cada lote são lidas do
+    memmap em ordem crescente e convertidas para float32 no grafo.
+    """
+    tf = import_tensorflow()
+    autotune = tf.data.AUTOTUNE
+    count = len(masks)
+
+    def gather(batch_indices):
+        batch_indices = np.sort(batch_indices)
+        return tuple(array[batch_indices] for array in skips) + (masks[batch_indices],)
+
+    def load(batch_indices):
+        arrays = tf.numpy_function(gather, [batch_indices], [tf.float16] * len(skips) + [tf.uint8])
+        features = []
+        for array, source in zip(arrays[:-1], skips):
+            array.set_shape((None,) + source.shape[1:])
+            features.append(tf.cast(array, tf.float32))
+        mask_batch = arrays[-1]
+        mask_batch.set_shape((None,) + masks.shape[1:])
+        return tuple(features), tf.cast(mask_batch, tf.float32) / 255.0
+
+    dataset = tf.data.Dataset.range(count)
+    if shuffle:
+        dataset = dataset.shuffle(count, seed=seed, reshuffle_each_iteration=True).repeat()
+    dataset = dataset.batch(batch_size, drop_remainder=shuffle)
+    dataset = dataset.map(load, num_parallel_calls=autotune, deterministic=not shuffle)
+    return dataset.prefetch(autotune)
+
+
+def peak_rss_mb():
+    """Pico de memória residente do processo (MB) ou None sem o módulo resource (Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB; macOS, bytes
+    return peak / (1024 ** 2 if sys.platform == 'darwin' else 1024)
+
+
+def run_phase1(mode, config):
+    """
+    Executa a etapa 1 (encoder congelado) em um dos modos
+
+    Args:
+        mode: 'end-to-end' (make_train_dataset + modelo completo) ou 'cache'
+            (decodificador sobre o cache; gera o cache se necessário)
+        config: Parâmetros da linha de comando (dict)
+
+    Returns:
+        dict: Tempos por época, tempo de geração do cache e pico de RSS
+    """
+    from unet_model import build_unet_with_transfer_learning, dice_coefficient, focal_dice_loss, make_train_dataset
+
+    tf = import_tensorflow()
+    images, masks, train_idx, val_idx, pack_index = ensure_packed_dataset(
+        config['images'], config['masks'], config['pack'], config['size'], config['size']
+    )
+    batch_size = config['batch_size']
+    steps = len(train_idx) // batch_size
+    if steps == 0:
+        raise ValueError(f"Imagens de treino insuficientes para um lote de {batch_size}: {len(train_idx)}")
+
+    # Mesma inicialização do decodificador nos dois modos (e, sem os pesos da
+    # ImageNet, o mesmo encoder entre execuções: o cache continua válido)
+    tf.keras.utils.set_random_seed(CACHE_SEED)
+    model, base_model = build_unet_with_transfer_learning(
+        (config['size'], config['size'], 3), weights=config['weights']
+    )
+    base_model.trainable = False
+
+    times = []
+
+    class EpochTimer(tf.keras.callbacks.Callback):
+        def on_epoch_begin(self, epoch, logs=None):
+            self.start = time.perf_counter()
+
+        def on_epoch_end(self, epoch, logs=None):
+            times.append(time.perf_counter() - self.start)
+
+    callbacks = [EpochTimer()]
+    cache_seconds = None
+    if mode == 'cache':
+        encoder, decoder = split_unet(model, base_model)
+        start = time.perf_counter()
+        train_skips, train_masks, _ = ensure_encoder_cache(
+            encoder, base_model, images, masks, train_idx, pack_index,
+            os.path.join(config['cache'], 'train'), config['views'], force=config['force']
+        )
+        val_skips, val_masks, _ = ensure_encoder_cache(
+            encoder, base_model, images, masks, val_idx, pack_index,
+            os.path.join(config['cache'], 'val'), 0, force=config['force']
+        )
+        cache_seconds = time.perf_counter() - start
+        trained = decoder
+        train_data = make_cached_dataset(train_skips, train_masks, batch_size, seed=CACHE_SEED)
+        val_data = make_cached_dataset(val_skips, val_masks, batch_size, shuffle=False)
+        fit_kwargs = dict(validation_data=val_data)
+    else:
+        trained = model
+        train_data = make_train_dataset(images[train_idx], masks[train_idx], batch_size, seed=CACHE_SEED)
+        x_val = np.asarray(images[val_idx], dtype=np.float32) / 127.5 - 1.0
+        y_val = np.asarray(masks[val_idx], dtype=np.float32) / 255.0
+        fit_kwargs = dict(validation_data=(x_val, y_val), validation_batch_size=batch_size)
+
+    trained.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=LEARNING_RATE),
+                    loss=focal_dice_loss, metrics=[dice_coefficient])
+    history = trained.fit(train_data, steps_per_epoch=steps, epochs=config['epochs'],
+                          callbacks=callbacks, verbose=0, **fit_kwargs)
+    if config.get('save') and mode == 'cache':
+        # As camadas do decodificador são as do modelo completo
+        model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=LEARNING_RATE),
+                      loss=focal_dice_loss, metrics=[dice_coefficient])
+        model.save(config['save'])
+
+    peak_rss = peak_rss_mb()
+    return {
+        'mode': mode,
+        'steps_per_epoch': steps,
+        'cache_s': round(cache_seconds, 2) if cache_seconds is not None else None,
+        'first_epoch_s': round(times[0], 3),
+        'epoch_s': round(float(np.median(times[1:] or times)), 3),
+        'val_dice': round(float(history.history['val_dice_coefficient'][-1]), 4),
+        'peak_rss_mb': round(peak_rss, 1) if peak_rss is not None else None,
+    }
+
+
+def run_isolated(mode, config):
+    """Executa `run_phase1` em um processo novo (pico de RSS sem interferência)"""
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(run_phase1, mode, config).result()
+
+
+def directory_nbytes(path):
+    """Soma do tamanho dos arquivos de um diretório"""
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Treina o decodificador da U-Net sobre as ativações em cache do encoder congelado',
+    )
+    parser.add_argument('--images', type=str, required=True, help='Diretório das imagens')
+    parser.add_argument('--masks', type=str, required=True, help='Diretório das máscaras (.png)')
+    parser.add_argument('--pack', type=str, required=True,
+                        help='Diretório do dataset empacotado (segmentation_pack.py; criado se necessário)')
+    parser.add_argument('--cache', type=str, required=True, help='Diretório do cache do encoder')
+    parser.add_argument('--size', type=int, default=DEFAULT_SIZE,
+                        help=f'Resolução de entrada (padrão: {DEFAULT_SIZE})')
+    parser.add_argument('--views', type=int, default=DEFAULT_VIEWS,
+                        help=f'Visões aumentadas por imagem de treino no cache (padrão: {DEFAULT_VIEWS})')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'Tamanho do lote (padrão: {DEFAULT_BATCH_SIZE}, como no notebook)')
+    parser.add_argument('--epochs', type=int, default=DEFAULT_EPOCHS,
+                        help=f'Épocas da etapa 1 (padrão: {DEFAULT_EPOCHS})')
+    parser.add_argument('--no-pretrained', action='store_true',
+                        help='Encoder sem pesos da ImageNet (não requer download)')
+    parser.add_argument('--force', action='store_true', help='Regera o cache mesmo se estiver atualizado')
+    parser.add_argument('--save', type=str, default=None,
+                        help='Salva o modelo completo (.keras) após a etapa 1, pronto para o ajuste fino')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Compara com a etapa 1 de ponta a ponta (tempo por época e pico de memória)')
+    parser.add_argument('--output', '-o', type=str, default=None,
+                        help='Arquivo JSON opcional com os resultados')
+    args = parser.parse_args()
+
+    for path in (args.images, args.masks):
+        if not os.path.isdir(path):
+            print(f"ERRO: Diretório não encontrado: {path}")
+            sys.exit(1)
+    if args.size % 32 != 0 or args.batch_size < 1 or args.epochs < 1 or args.views < 0:
+        print("ERRO: --size deve ser múltiplo de 32; --batch-size e --epochs maiores que zero; --views >= 0")
+        sys.exit(1)
+
+    config = dict(
+        images=args.images, masks=args.masks, pack=args.pack, cache=args.cache, size=args.size,
+        views=args.views, batch_size=args.batch_size, epochs=args.epochs, force=args.force,
+        weights=None if args.no_pretrained else 'imagenet', save=args.save,
+    )
+    try:
+        if args.benchmark:
+            # O cache é gerado na primeira execução do modo 'cache' e reutilizado na segunda
+            results = [run_isolated('end-to-end', config), run_isolated('cache', config)]
+            config['force'] = False
+            results.append(dict(run_isolated('cache', config), mode='cache (reaberto)'))
+        else:
+            results = [run_phase1('cache', config)]
+    except ValueError as e:
+        print(f"ERRO: {e}")
+        sys.exit(1)
+
+    cache_mb = directory_nbytes(args.cache) / 1024 ** 2
+    print(f"\nCache do encoder: {cache_mb:.0f} MB em {args.cache}")
+    print(f"\n{'Modo':<18} {'cache (s)':>10} {'1a época (s)':>13} {'s/época':>9} {'vs ponta a ponta':>17} {'RSS pico (MB)':>14} {'val Dice':>9}")
+    baseline = next((r['epoch_s'] for r in results if r['mode'] == 'end-to-end'), None)
+    for r in results:
+        speedup = f"{baseline / r['epoch_s']:.2f}x" if baseline and r['epoch_s'] else '-'
+        cache_s = f"{r['cache_s']:.2f}" if r['cache_s'] is not None else '-'
+        rss = f"{r['peak_rss_mb']:.0f}" if r['peak_rss_mb'] is not None else '-'
+        print(f"{r['mode']:<18} {cache_s:>10} {r['first_epoch_s']:>13.3f} {r['epoch_s']:>9.3f} "
+              f"{speedup:>17} {rss:>14} {r['val_dice']:>9.4f}")
+    if args.save:
+        print(f"\nModelo da etapa 1 salvo em: {args.save}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'images': args.images, 'size': args.size, 'views': args.views,
+                       'batch_size': args.batch_size, 'cache_mb': round(cache_mb, 1),
+                       'results': results}, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados salvos em: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,311 @@
+"""
+U-Net com encoder MobileNetV2 e carregamento do dataset de segmentação
+
+Mesma arquitetura, métricas e divisão treino/validação de
+projeto_tc_segmentacao.py, em forma de módulo importável (o notebook executa o
+treinamento inteiro ao ser importado). O construtor aceita a largura `alpha`
+do MobileNetV2 e qualquer tamanho de entrada múltiplo de 32, para gerar
+variantes menores do modelo (unet_variants.py).
+"""
+
+import os
+
+import numpy as np
+
+from lazy_runtime import import_tensorflow
+
+# Ativações do MobileNetV2 usadas como skip connections (da maior para a menor)
+SKIP_CONNECTION_NAMES = [
+    'block_1_expand_relu', 'block_3_expand_relu', 'block_6_expand_relu',
+    'block_13_expand_relu', 'out_relu',
+]
+
+# Camada do MobileNetV2 a partir da qual o ajuste fino descongela o encoder
+FINE_TUNE_AT = 100
+
+# Divisão do notebook: train_test_split(test_size=0.2, random_state=42)
+VALIDATION_SPLIT = 0.2
+SPLIT_SEED = 42
+
+# Aumento de dados do notebook (data_gen_args do ImageDataGenerator); ângulos
+# em graus, deslocamentos em fração do tamanho, zoom independente em x e y
+AUGMENTATION = dict(
+    rotation_range=15, width_shift_range=0.1, height_shift_range=0.1,
+    shear_range=0.05, zoom_range=0.1, horizontal_flip=True, brightness_range=(0.8, 1.2),
+)
+
+
+def conv_block(input_tensor, num_filters):
+    """Duas convoluções 3x3 com BatchNormalization e ReLU (bloco do decoder)"""
+    layers = import_tensorflow().keras.layers
+    x = layers.Conv2D(num_filters, (3, 3), kernel_initializer='he_normal', padding='same')(input_tensor)
+    x = layers.BatchNormalization()(x)
+    x = layers.Activation('relu')(x)
+    x = layers.Conv2D(num_filters, (3, 3), kernel_initializer='he_normal', padding='same')(x)
+    x = layers.BatchNormalization()(x)
+    x = layers.Activation('relu')(x)
+    return x
+
+
+def build_unet_with_transfer_learning(input_shape, alpha=1.0, weights='imagenet'):
+    """
+    Constrói a U-Net com encoder MobileNetV2 pré-treinado
+
+    Args:
+        input_shape: (altura, largura, canais); altura e largura múltiplos de 32
+        alpha: Largura do MobileNetV2 (0.35, 0.5, 0.75, 1.0, 1.3 ou 1.4 com
+            pesos da ImageNet)
+        weights: 'imagenet' ou None
+
+    Returns:
+        tuple: (modelo, base_model) — o base_model é retornado para ser
+            congelado/descongelado fora da função
+    """
+    tf = import_tensorflow()
+    layers = tf.keras.layers
+    base_model = tf.keras.applications.MobileNetV2(
+        input_shape=input_shape, alpha=alpha, include_top=False, weights=weights
+    )
+    encoder_outputs = [base_model.get_layer(name).output for name in SKIP_CONNECTION_NAMES]
+    decoder_input = encoder_outputs[-1]
+    d1 = layers.Conv2DTranspose(512, (2, 2), strides=(2, 2), padding='same')(decoder_input)
+    c1 = conv_block(layers.concatenate([d1, encoder_outputs[3]]), 512)
+    d2 = layers.Conv2DTranspose(256, (2, 2), strides=(2, 2), padding='same')(c1)
+    c2 = conv_block(layers.concatenate([d2, encoder_outputs[2]]), 256)
+    d3 = layers.Conv2DTranspose(128, (2, 2), strides=(2, 2), padding='same')(c2)
+    c3 = conv_block(layers.concatenate([d3, encoder_outputs[1]]), 128)
+    d4 = layers.Conv2DTranspose(64, (2, 2), strides=(2, 2), padding='same')(c3)
+    c4 = conv_block(layers.concatenate([d4, encoder_outputs[0]]), 64)
+    d5 = layers.Conv2DTranspose(32, (2, 2), strides=(2, 2), padding='same')(c4)
+    c5 = conv_block(d5, 32)
+    outputs = layers.Conv2D(1, (1, 1), activation='sigmoid')(c5)
+    model = tf.keras.Model(inputs=base_model.input, outputs=outputs)
+    return model, base_model
+
+
+def dice_coefficient(y_true, y_pred, smooth=1):
+    K = import_tensorflow().keras.backend
+    y_true_f = K.flatten(y_true)
+    y_pred_f = K.flatten(y_pred)
+    intersection = K.sum(y_true_f * y_pred_f)
+    return (2. * intersection + smooth) / (K.sum(y_true_f) + K.sum(y_pred_f) + smooth)
+
+
+def iou_metric(y_true, y_pred, smooth=1e-6):
+    K = import_tensorflow().keras.backend
+    y_true_f = K.flatten(y_true)
+    y_pred_f = K.flatten(y_pred)
+    intersection = K.sum(y_true_f * y_pred_f)
+    union = K.sum(y_true_f) + K.sum(y_pred_f) - intersection
+    return (intersection + smooth) / (union + smooth)
+
+
+def focal_dice_loss(y_true, y_pred, alpha=0.8, gamma=2):
+    tf = import_tensorflow()
+    K = tf.keras.backend
+    y_pred = tf.clip_by_value(y_pred, K.epsilon(), 1 - K.epsilon())
+    focal = K.mean(alpha * K.pow(1 - y_pred, gamma) * (-y_true * K.log(y_pred)))
+    return focal + 1 - dice_coefficient(y_true, y_pred)
+
+
+def split_indices(n_samples, test_size=VALIDATION_SPLIT, seed=SPLIT_SEED):
+    """
+    Índices de treino e validação idênticos a `train_test_split` do scikit-learn
+
+    Reproduz o ShuffleSplit (permutação de RandomState(seed); os primeiros
+    ceil(test_size * n) índices vão para a validação), sem depender do sklearn.
+
+    Returns:
+        tuple: (índices de treino, índices de validação)
+    """
+    n_test = int(np.ceil(test_size * n_samples))
+    permutation = np.random.RandomState(seed).permutation(n_samples)
+    return permutation[n_test:], permutation[:n_test]
+
+
+def list_image_mask_pairs(images_dir, masks_dir):
+    """Pares (imagem, máscara) com a convenção do notebook: máscara = nome da imagem + .png"""
+    mask_files = set(os.listdir(masks_dir))
+    pairs = []
+    for img_file in sorted(os.listdir(images_dir)):
+        mask_file = os.path.splitext(img_file)[0] + '.png'
+        if mask_file in mask_files:
+            pairs.append((img_file, mask_file))
+    return pairs
+
+
+def read_image_mask_pair(images_dir, masks_dir, img_file, mask_file, height, width):
+    """
+    Decodifica e redimensiona um par como no notebook: imagem RGB e máscara em
+    escala de cinza, ambas com cv2.resize
+
+    Returns:
+        tuple: (imagem uint8 [H, W, 3], máscara uint8 [H, W]) ou None se
+            algum dos arquivos não puder ser lido
+    """
+    import cv2
+
+    img = cv2.imread(os.path.join(images_dir, img_file))
+    mask = cv2.imread(os.path.join(masks_dir, mask_file), cv2.IMREAD_GRAYSCALE)
+    if img is None or mask is None:
+        return None
+    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    return cv2.resize(img, (width, height)), cv2.resize(mask, (width, height))
+
+
+def load_raw_segmentation_dataset(images_dir, masks_dir, height, width):
+    """
+    Decodifica e redimensiona imagens e máscaras como no notebook, sem normalizar
+
+    Returns:
+        tuple: (X uint8 [N, H, W, 3], y uint8 [N, H, W, 1], nomes das imagens)
+    """
+    X, y, names = [], [], []
+    for img_file, mask_file in list_image_mask_pairs(images_dir, masks_dir):
+        pair = read_image_mask_pair(images_dir, masks_dir, img_file, mask_file, height, width)
+        if pair is None:
+            continue
+        X.append(pair[0])
+        y.append(pair[1])
+        names.append(img_file)
+
+    X = np.array(X, dtype=np.uint8).reshape(-1, height, width, 3)
+    y = np.array(y, dtype=np.uint8).reshape(-1, height, width)[..., np.newaxis]
+    return X, y, names
+
+
+def load_segmentation_dataset(images_dir, masks_dir, height, width):
+    """
+    Carrega imagens e máscaras como no notebook de treinamento
+
+    Imagens: RGB -> cv2.resize -> mobilenet_v2.preprocess_input; máscaras:
+    escala de cinza -> cv2.resize -> /255.
+
+    Returns:
+        tuple: (X float32 [N, H, W, 3], y float32 [N, H, W, 1], nomes das imagens)
+    """
+    X, y, names = load_raw_segmentation_dataset(images_dir, masks_dir, height, width)
+    X = import_tensorflow().keras.applications.mobilenet_v2.preprocess_input(X.astype(np.float32))
+    return X, y.astype(np.float32) / 255.0, names
+
+
+def random_affine_transforms(batch_size, height, width, augmentation=AUGMENTATION):
+    """
+    Sorteia uma transformação afim por imagem, como o ImageDataGenerator
+
+    Compõe rotação, deslocamento, cisalhamento, zoom e espelhamento
+    horizontal em torno do centro da imagem (a mesma composição de
+    `apply_affine_transform`) e devolve o formato de
+    `ImageProjectiveTransformV3`: 8 coeficientes que levam cada pixel de saída
+    ao ponto de origem na entrada.
+
+    Returns:
+        tf.Tensor float32 [batch_size, 8]
+    """
+    tf = import_tensorflow()
+
+    def uniform(limit, center=0.0):
+        return tf.random.uniform([batch_size], center - limit, center + limit)
+
+    theta = uniform(augmentation['rotation_range']) * (np.pi / 180.0)
+    shear = uniform(augmentation['shear_range']) * (np.pi / 180.0)
+    tx = uniform(augmentation['width_shift_range']) * width
+    ty = uniform(augmentation['height_shift_range']) * height
+    zx = uniform(augmentation['zoom_range'], 1.0)
+    zy = uniform(augmentation['zoom_range'], 1.0)
+    cos, sin = tf.cos(theta), tf.sin(theta)
+
+    # A = rotação @ cisalhamento @ zoom, em coordenadas (x, y)
+    a00 = cos * zx
+    a01 = (-cos * tf.sin(shear) - sin * tf.cos(shear)) * zy
+    a10 = sin * zx
+    a11 = (-sin * tf.sin(shear) + cos * tf.cos(shear)) * zy
+    if augmentation.get('horizontal_flip'):
+        # Espelhar a saída em x equivale a inverter a primeira coluna de A
+        flip = tf.where(tf.random.uniform([batch_size]) < 0.5, -1.0, 1.0)
+        a00, a10 = a00 * flip, a10 * flip
+
+    # Entrada = A (saída - centro) + rotação @ deslocamento + centro
+    cx, cy = (width - 1) / 2.0, (height - 1) / 2.0
+    offset_x = cx - a00 * cx - a01 * cy + cos * tx - sin * ty
+    offset_y = cy - a10 * cx - a11 * cy + sin * tx + cos * ty
+    zeros = tf.zeros([batch_size])
+    return tf.stack([a00, a01, offset_x, a10, a11, offset_y, zeros, zeros], axis=1)
+
+
+def augment_batch(images, masks, augmentation=AUGMENTATION):
+    """
+    Aplica o aumento de dados do notebook a um lote, no grafo do TensorFlow
+
+    Imagem e máscara recebem a mesma transformação geométrica em uma única
+    chamada (canais concatenados, interpolação bilinear e preenchimento
+    'nearest', como o ImageDataGenerator); o brilho é aplicado só à imagem,
+    nos pixels em [0, 255], antes da normalização.
+
+    Args:
+        images: float32 [B, H, W, 3] em [0, 255]
+        masks: float32 [B, H, W, 1] em [0, 1]
+
+    Returns:
+        tuple: (imagens em [0, 255], máscaras em [0, 1])
+    """
+    tf = import_tensorflow()
+    shape = tf.shape(images)
+    batch_size, height, width = shape[0], shape[1], shape[2]
+    transforms = random_affine_transforms(
+        batch_size, tf.cast(height, tf.float32), tf.cast(width, tf.float32), augmentation
+    )
+    stacked = tf.raw_ops.ImageProjectiveTransformV3(
+        images=tf.concat([images, masks], axis=-1),
+        transforms=transforms,
+        output_shape=tf.stack([height, width]),
+        fill_value=0.0,
+        interpolation='BILINEAR',
+        fill_mode='NEAREST',
+    )
+    images, masks = stacked[..., :3], stacked[..., 3:]
+
+    low, high = augmentation['brightness_range']
+    brightness = tf.random.uniform([batch_size, 1, 1, 1], low, high)
+    images = tf.clip_by_value(images * brightness, 0.0, 255.0)
+    return images, masks
+
+
+def make_train_dataset(images, masks, batch_size, augment=True, seed=None,
+                       augmentation=AUGMENTATION):
+    """
+    Pipeline tf.data de treinamento: embaralha, aumenta, normaliza e pré-carrega
+
+    Substitui os dois ImageDataGenerator.flow sincronizados pela semente e o
+    `combined_generator` do notebook. O conjunto base fica em memória já
+    decodificado (uint8, 4x menor que float32, sem nova decodificação a cada
+    época); o aumento de dados e a normalização rodam no grafo, por lote, em
+    paralelo (AUTOTUNE) e com prefetch, enquanto o modelo treina o lote
+    anterior. O dataset é infinito: use `steps_per_epoch` no `fit`.
+
+    Args:
+        images: uint8 [N, H, W, 3] (load_raw_segmentation_dataset)
+        masks: uint8 [N, H, W, 1] com valores 0-255
+        batch_size: Tamanho do lote
+        augment: Se False, apenas embaralha e normaliza
+        seed: Semente do embaralhamento
+
+    Returns:
+        tf.data.Dataset de (imagens mobilenet_v2 em [-1, 1], máscaras em [0, 1])
+    """
+    tf = import_tensorflow()
+    autotune = tf.data.AUTOTUNE
+
+    def prepare(image_batch, mask_batch):
+        image_batch = tf.cast(image_batch, tf.float32)
+        mask_batch = tf.cast(mask_batch, tf.float32) / 255.0
+        if augment:
+            image_batch, mask_batch = augment_batch(image_batch, mask_batch, augmentation)
+        # mobilenet_v2.preprocess_input
+        return image_batch / 127.5 - 1.0, mask_batch
+
+    dataset = tf.data.Dataset.from_tensor_slices((images, masks))
+    dataset = dataset.shuffle(len(images), seed=seed, reshuffle_each_iteration=True).repeat()
+    dataset = dataset.batch(batch_size, drop_remainder=True)
+    dataset = dataset.map(prepare, num_parallel_calls=autotune, deterministic=False)
+    return dataset.prefetch(autotune)
@@ -0,0 +1,315 @@
+"""
+Variantes da U-Net por resolução de entrada e largura do MobileNetV2
+
+Constrói a U-Net de `build_unet_with_transfer_learning` em tamanhos menores
+(ex.: 160/192/224) e larguras `alpha` do MobileNetV2, treina cada variante na
+mesma divisão treino/validação do notebook e mede, para cada uma:
+
+- Dice e IoU das máscaras binarizadas na validação (threshold do app);
+- latência TFLite (float16, como o padrão do convert_model.py), tamanho e MACs.
+
+O resultado é uma tabela com a fronteira de Pareto latência x Dice
+(`variants.csv` / `variants.md`) e a variante recomendada: a mais rápida cujo
+Dice fica a no máximo `--max-dice-drop` do melhor. Cada variante é salva em
+.keras e pode ser exportada com o convert_model.py (o comando é impresso).
+
+Uso:
+    python unet_variants.py --images imagens/ --masks mascaras/
+    python unet_variants.py --images imagens/ --masks mascaras/ --sizes 160,192,224 --alphas 0.5,0.75,1.0 --epochs 30 --reference-model melhor_modelo_unet_metricas_completas.keras
+"""
+
+import argparse
+import csv
+import os
+import sys
+
+import numpy as np
+
+from convert_model import (
+    DEFAULT_BENCHMARK_RUNS,
+    SEGMENTATION_THRESHOLD,
+    benchmark_tflite,
+    configure_converter,
+    make_converter,
+)
+from lazy_runtime import import_tensorflow
+from parity_check import score_outputs
+
+# Configurar encoding UTF-8 para Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+DEFAULT_SIZES = (160, 192, 224, 256)
+DEFAULT_ALPHAS = (0.35, 0.5, 0.75, 1.0)
+DEFAULT_EPOCHS = 30
+DEFAULT_FINE_TUNE_EPOCHS = 0
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_PATIENCE = 8
+DEFAULT_MAX_DICE_DROP = 0.02
+
+
+def parse_list(value, cast):
+    """Converte '160,192,224' em uma lista de valores"""
+    return [cast(v) for v in value.split(',') if v.strip()]
+
+
+def variant_name(size, alpha):
+    return f"unet_{size}_a{alpha:g}"
+
+
+def train_variant(size, alpha, X_train, y_train, X_val, y_val, output_path,
+                  epochs=DEFAULT_EPOCHS, fine_tune_epochs=DEFAULT_FINE_TUNE_EPOCHS,
+                  batch_size=DEFAULT_BATCH_SIZE, patience=DEFAULT_PATIENCE, weights='imagenet'):
+    """
+    Treina uma variante como no notebook: decoder com o encoder congelado e,
+    opcionalmente, ajuste fino a partir da camada FINE_TUNE_AT
+
+    O melhor modelo (val_dice_coefficient) é salvo em `output_path`.
+
+    Returns:
+        Modelo Keras com os melhores pesos
+    """
+    from unet_model import (
+        FINE_TUNE_AT, build_unet_with_transfer_learning, dice_coefficient,
+        focal_dice_loss, iou_metric,
+    )
+
+    tf = import_tensorflow()
+    model, base_model = build_unet_with_transfer_learning((size, size, 3), alpha, weights)
+    callbacks = [
+        tf.keras.callbacks.ModelCheckpoint(output_path, monitor='val_dice_coefficient',
+                                           save_best_only=True, mode='max'),
+        tf.keras.callbacks.EarlyStopping(patience=patience, monitor='val_dice_coefficient',
+                                         mode='max', restore_best_weights=True),
+    ]
+
+    base_model.trainable = False
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=1e-4),
+                  loss=focal_dice_loss, metrics=[dice_coefficient, iou_metric])
+    history = model.fit(X_train, y_train, batch_size=batch_size, epochs=epochs,
+                        validation_data=(X_val, y_val), callbacks=callbacks, verbose=2)
+
+    if fine_tune_epochs > 0:
+        base_model.trainable = True
+        for layer in base_model.layers[:FINE_TUNE_AT]:
+            layer.trainable = False
+        model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=1e-5),
+                      loss=focal_dice_loss, metrics=[dice_coefficient, iou_metric])
+        # Novos callbacks: o EarlyStopping anterior guarda o melhor valor da etapa 1
+        callbacks[1] = tf.keras.callbacks.EarlyStopping(
+            patience=patience, monitor='val_dice_coefficient', mode='max', restore_best_weights=True
+        )
+        callbacks[0].best = max(history.history.get('val_dice_coefficient', [-np.inf]))
+        model.fit(X_train, y_train, batch_size=batch_size,
+                  epochs=len(history.epoch) + fine_tune_epochs, initial_epoch=len(history.epoch),
+                  validation_data=(X_val, y_val), callbacks=callbacks, verbose=2)
+
+    if os.path.exists(output_path):
+        model = tf.keras.models.load_model(output_path, compile=False)
+    else:
+        model.save(output_path)
+    return model
+
+
+def evaluate_variant(model, X_val, y_val, runs=DEFAULT_BENCHMARK_RUNS, num_threads=None,
+                     threshold=SEGMENTATION_THRESHOLD):
+    """
+    Mede qualidade na validação e custo do modelo exportado em TFLite float16
+
+    Returns:
+        dict: dice, iou (médias por imagem), latency_ms, tflite_mb, gmacs, params
+    """
+    from model_cost import analyze_model_cost
+
+    predictions = np.asarray(model.predict(X_val, batch_size=DEFAULT_BATCH_SIZE, verbose=0))
+    scores = score_outputs(y_val, predictions, threshold)
+
+    converter = make_converter(model)
+    configure_converter(converter, 'float16')
+    content = converter.convert()
+    return {
+        'dice': float(np.mean(scores['dice'])),
+        'iou': float(np.mean(scores['iou'])),
+        'latency_ms': benchmark_tflite(content, X_val[:1], runs, num_threads),
+        'tflite_mb': len(content) / (1024 * 1024),
+        'gmacs': analyze_model_cost(model)['total_macs'] / 1e9,
+        'params': model.count_params(),
+    }
+
+
+def mark_pareto(rows):
+    """Marca as variantes não dominadas (nenhuma outra é mais rápida e com Dice maior ou igual)"""
+    for row in rows:
+        row['pareto'] = not any(
+            other is not row
+            and other['latency_ms'] <= row['latency_ms'] and other['dice'] >= row['dice']
+            and (other['latency_ms'] < row['latency_ms'] or other['dice'] > row['dice'])
+            for other in rows
+        )
+
+
+def recommend_variant(rows, max_dice_drop=DEFAULT_MAX_DICE_DROP):
+    """A variante mais rápida com Dice até `max_dice_drop` abaixo do melhor"""
+    best_dice = max(row['dice'] for row in rows)
+    eligible = [row for row in rows if row['dice'] >= best_dice - max_dice_drop]
+    return min(eligible, key=lambda row: row['latency_ms'])
+
+
+def write_tables(rows, output_dir, reference_latency=None):
+    """Grava variants.csv e variants.md ordenados por latência"""
+    columns = ['name', 'size', 'alpha', 'dice', 'iou', 'latency_ms', 'speedup',
+               'tflite_mb', 'gmacs', 'params', 'pareto', 'file']
+    rows = sorted(rows, key=lambda row: row['latency_ms'])
+    for row in rows:
+        row['speedup'] = reference_latency / row['latency_ms'] if reference_latency else None
+
+    csv_path = os.path.join(output_dir, 'variants.csv')
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+    def cell(value):
+        if value is None:
+            return '-'
+        if isinstance(value, bool):
+            return 'sim' if value else ''
+        return f"{value:.4g}" if isinstance(value, float) else str(value)
+
+    md_columns = [c for c in columns if c != 'file']
+    md_path = os.path.join(output_dir, 'variants.md')
+    with open(md_path, 'w', encoding='utf-8') as f:
+        f.write("# Variantes da U-Net: latencia x qualidade\n\n")
+        f.write(f"Dice/IoU medios por imagem na validacao (threshold {SEGMENTATION_THRESHOLD}); "
+                "latencia: TFLite float16, 1 imagem, mediana.\n\n")
+        f.write("| " + " | ".join(md_columns) + " |\n")
+        f.write("|" + "---|" * len(md_columns) + "\n")
+        for row in rows:
+            f.write("| " + " | ".join(cell(row.get(c)) for c in md_columns) + " |\n")
+    return csv_path, md_path
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Treina variantes menores da U-Net e compara latencia x Dice/IoU',
+    )
+    parser.add_argument('--images', required=True, help='Diretorio das imagens de treinamento')
+    parser.add_argument('--masks', required=True, help='Diretorio das mascaras (.png)')
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help='Tamanhos de entrada, multiplos de 32 (padrao: 160,192,224,256)')
+    parser.add_argument('--alphas', default=','.join(f'{a:g}' for a in DEFAULT_ALPHAS),
+                        help='Larguras do MobileNetV2 (padrao: 0.35,0.5,0.75,1)')
+    parser.add_argument('--epochs', type=int, default=DEFAULT_EPOCHS,
+                        help=f'Epocas com o encoder congelado (padrao: {DEFAULT_EPOCHS})')
+    parser.add_argument('--fine-tune-epochs', type=int, default=DEFAULT_FINE_TUNE_EPOCHS,
+                        help='Epocas de ajuste fino do encoder (padrao: 0)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'Lote de treinamento (padrao: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--patience', type=int, default=DEFAULT_PATIENCE,
+                        help=f'Paciencia do EarlyStopping (padrao: {DEFAULT_PATIENCE})')
+    parser.add_argument('--no-pretrained', action='store_true',
+                        help='Encoder sem os pesos da ImageNet')
+    parser.add_argument('--reference-model', default=None,
+                        help='Modelo .keras atual, avaliado como referencia de velocidade/qualidade')
+    parser.add_argument('--output-dir', default='unet_variants',
+                        help='Diretorio dos modelos e tabelas (padrao: unet_variants)')
+    parser.add_argument('--retrain', action='store_true',
+                        help='Treina de novo variantes ja salvas no diretorio de saida')
+    parser.add_argument('--runs', type=int, default=DEFAULT_BENCHMARK_RUNS,
+                        help=f'Repeticoes da medida de latencia (padrao: {DEFAULT_BENCHMARK_RUNS})')
+    parser.add_argument('--num-threads', type=int, default=None,
+                        help='Threads do interpretador TFLite na medida de latencia')
+    parser.add_argument('--max-dice-drop', type=float, default=DEFAULT_MAX_DICE_DROP,
+                        help=f'Perda de Dice aceita na recomendacao (padrao: {DEFAULT_MAX_DICE_DROP})')
+    args = parser.parse_args()
+
+    try:
+        sizes = parse_list(args.sizes, int)
+        alphas = parse_list(args.alphas, float)
+    except ValueError:
+        parser.error('--sizes/--alphas invalidos')
+    if not sizes or not alphas or any(s % 32 for s in sizes):
+        parser.error('--sizes devem ser multiplos de 32 e --alphas nao pode ser vazio')
+    for path in (args.images, args.masks):
+        if not os.path.isdir(path):
+            print(f"ERRO: Diretorio nao encontrado: {path}")
+            sys.exit(1)
+    if args.reference_model and not os.path.exists(args.reference_model):
+        print(f"ERRO: Arquivo do modelo nao encontrado: {args.reference_model}")
+        sys.exit(1)
+
+    from unet_model import load_segmentation_dataset, split_indices
+
+    tf = import_tensorflow()
+    os.makedirs(args.output_dir, exist_ok=True)
+    weights = None if args.no_pretrained else 'imagenet'
+
+    datasets = {}
+
+    def dataset(size):
+        if size not in datasets:
+            print(f"\n[INFO] Carregando dados em {size}x{size}...")
+            X, y, _ = load_segmentation_dataset(args.images, args.masks, size, size)
+            train_idx, val_idx = split_indices(len(X))
+            datasets[size] = (X[train_idx], y[train_idx], X[val_idx], y[val_idx])
+            print(f"   {len(train_idx)} para treino, {len(val_idx)} para validacao")
+        return datasets[size]
+
+    rows = []
+    reference_latency = None
+    if args.reference_model:
+        print(f"\n[REFERENCIA] {args.reference_model}")
+        model = tf.keras.models.load_model(args.reference_model, compile=False)
+        size = int(model.input_shape[1])
+        _, _, X_val, y_val = dataset(size)
+        row = evaluate_variant(model, X_val, y_val, args.runs, args.num_threads)
+        row.update({'name': 'referencia', 'size': size, 'alpha': None, 'file': args.reference_model})
+        reference_latency = row['latency_ms']
+        rows.append(row)
+        print(f"   Dice {row['dice']:.4f} | IoU {row['iou']:.4f} | {row['latency_ms']:.2f} ms")
+
+    for size in sizes:
+        X_train, y_train, X_val, y_val = dataset(size)
+        if len(X_val) == 0:
+            print("ERRO: Nenhum par imagem/mascara encontrado")
+            sys.exit(1)
+        for alpha in alphas:
+            name = variant_name(size, alpha)
+            path = os.path.join(args.output_dir, f"{name}.keras")
+            print(f"\n[VARIANTE] {name}")
+            if os.path.exists(path) and not args.retrain:
+                print(f"   Ja treinada: {path} (use --retrain para treinar de novo)")
+                model = tf.keras.models.load_model(path, compile=False)
+            else:
+                model = train_variant(
+                    size, alpha, X_train, y_train, X_val, y_val, path,
+                    args.epochs, args.fine_tune_epochs, args.batch_size, args.patience, weights,
+                )
+            row = evaluate_variant(model, X_val, y_val, args.runs, args.num_threads)
+            row.update({'name': name, 'size': size, 'alpha': alpha, 'file': path})
+            rows.append(row)
+            print(f"   Dice {row['dice']:.4f} | IoU {row['iou']:.4f} | {row['latency_ms']:.2f} ms | "
+                  f"{row['gmacs']:.3f} GMACs")
+            tf.keras.backend.clear_session()
+
+    mark_pareto(rows)
+    csv_path, md_path = write_tables(rows, args.output_dir, reference_latency)
+
+    print(f"\n{'Variante':<18} {'Dice':>7} {'IoU':>7} {'ms':>8} {'GMACs':>7} {'Pareto':>7}")
+    for row in sorted(rows, key=lambda r: r['latency_ms']):
+        print(f"{row['name']:<18} {row['dice']:>7.4f} {row['iou']:>7.4f} {row['latency_ms']:>8.2f} "
+              f"{row['gmacs']:>7.3f} {'*' if row['pareto'] else '':>7}")
+    print(f"\n[OK] Tabelas salvas em: {csv_path} e {md_path}")
+
+    best = recommend_variant(rows, args.max_dice_drop)
+    print(f"\nRecomendada (mais rapida com Dice ate {args.max_dice_drop} abaixo do melhor): {best['name']}")
+    if best['name'] != 'referencia':
+        print("Exportar com:")
+        print(f"   python convert_model.py --input {best['file']} "
+              f"--output assets/model_{best['size']}.tflite --validate-precision --calibration-dir {args.images}")
+
+
+if __name__ == '__main__':
+    main()